@@ -0,0 +1,165 @@
+"""
+This file contains analytics for operators of the habit tracker across all users.
+It shows the most popular predefined habits, the average streak per habit type
+and the distribution of the longest streaks.
+The counter table is split into rowid ranges which are aggregated in parallel worker processes
+on read-only connections. The partial results are merged at the end.
+The analyze functions make use of the pandas, sqlite3 and concurrent.futures libraries.
+"""
+
+import sqlite3
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from db import DELETED_USERS
+
+# Number of rowids aggregated by one worker task
+CHUNK_ROWS = 250_000
+
+# Upper bounds of the buckets for the distribution of the longest streaks
+STREAK_BUCKETS = [0, 1, 7, 30, 90, 365]
+
+
+def connect_read_only(db_path):
+    """Function to open a read-only connection, so the scans never take a write lock"""
+    return sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+
+
+def rowid_ranges(cur, chunk_rows=CHUNK_ROWS):
+    """Function to split the counter table into rowid ranges of at most chunk_rows rowids"""
+    cur.execute("SELECT MIN(rowid), MAX(rowid) FROM counter")
+    low, high = cur.fetchone()
+    if low is None:
+        return []
+    return [(start, min(start + chunk_rows - 1, high)) for start in range(low, high + 1, chunk_rows)]
+
+
+def scan_chunk(db_path, low, high):
+    """
+    Function that aggregates one rowid range of the counter table (runs in a worker process).
+    Returns the partial result as dictionary:
+    - popular: {habit_name: [number of checks, set of user IDs]} of predefined habits
+    - streaks: {habit_type: [sum of streaks, number of checks]}
+    """
+    db = connect_read_only(db_path)
+    try:
+        cur = db.cursor()
+        cur.execute(f"""SELECT c.habit_name, c.user_id, COUNT(*) FROM counter AS c
+                    JOIN habits AS h ON h.user_id = c.user_id AND h.habit_name = c.habit_name
+                    WHERE c.rowid BETWEEN ? AND ? AND h.is_custom = 0 AND c.user_id NOT IN ({DELETED_USERS})
+                    GROUP BY c.habit_name, c.user_id""", (low, high))
+        popular = {}
+        for habit_name, user_id, checks in cur.fetchall():
+            entry = popular.setdefault(habit_name, [0, set()])
+            entry[0] += checks
+            entry[1].add(user_id)
+
+        cur.execute(f"""SELECT COALESCE(h.habit_type, ''), SUM(c.habit_streak), COUNT(*) FROM counter AS c
+                    JOIN habits AS h ON h.user_id = c.user_id AND h.habit_name = c.habit_name
+                    WHERE c.rowid BETWEEN ? AND ? AND c.user_id NOT IN ({DELETED_USERS})
+                    GROUP BY h.habit_type""", (low, high))
+        streaks = {habit_type: [total, checks] for habit_type, total, checks in cur.fetchall()}
+        return {"popular": popular, "streaks": streaks}
+    finally:
+        db.close()
+
+
+def merge_partials(partials):
+    """Function to merge the partial results of all rowid ranges"""
+    merged = {"popular": {}, "streaks": {}}
+    for partial in partials:
+        for habit_name, (checks, users) in partial["popular"].items():
+            entry = merged["popular"].setdefault(habit_name, [0, set()])
+            entry[0] += checks
+            entry[1] |= users
+        for habit_type, (total, checks) in partial["streaks"].items():
+            entry = merged["streaks"].setdefault(habit_type, [0, 0])
+            entry[0] += total
+            entry[1] += checks
+    return merged
+
+
+def scan_counter(db_path, workers=None, chunk_rows=CHUNK_ROWS):
+    """
+    Function to aggregate the whole counter table in parallel worker processes.
+
+    :param db_path: Path of the database file
+    :param workers: Number of worker processes (default: number of CPUs)
+    :param chunk_rows: Number of rowids per task
+    """
+    db = connect_read_only(db_path)
+    try:
+        ranges = rowid_ranges(db.cursor(), chunk_rows)
+    finally:
+        db.close()
+    if workers == 1 or len(ranges) <= 1:
+        # No process overhead for small tables
+        return merge_partials(scan_chunk(db_path, low, high) for low, high in ranges)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(scan_chunk, db_path, low, high) for low, high in ranges]
+        return merge_partials(future.result() for future in futures)
+
+
+def global_stats(db_path, workers=None, chunk_rows=CHUNK_ROWS):
+    """
+    Function to compute the population statistics of all users.
+    Returns three DataFrames: popular predefined habits, average streak per habit type
+    and the distribution of the longest streaks.
+    """
+    merged = scan_counter(db_path, workers, chunk_rows)
+
+    popular = pd.DataFrame(
+        [(name, len(users), checks) for name, (checks, users) in merged["popular"].items()],
+        columns=["Habit", "Users", "Checks"]
+    ).sort_values(["Users", "Checks", "Habit"], ascending=[False, False, True], ignore_index=True)
+
+    # Longest streaks are stored per habit of a user, so the habits table is read directly
+    db = connect_read_only(db_path)
+    try:
+        cur = db.cursor()
+        cur.execute(f"""SELECT COALESCE(habit_type, ''), AVG(max_streak) FROM habits
+                    WHERE user_id IS NOT NULL AND user_id NOT IN ({DELETED_USERS}) GROUP BY habit_type""")
+        longest = dict(cur.fetchall())
+        cur.execute(f"""SELECT max_streak, COUNT(*) FROM habits WHERE user_id IS NOT NULL
+                    AND user_id NOT IN ({DELETED_USERS}) GROUP BY max_streak""")
+        streak_counts = cur.fetchall()
+    finally:
+        db.close()
+
+    streaks = pd.DataFrame(
+        [(habit_type, round(total / checks, 2), round(longest.get(habit_type) or 0, 2), checks)
+         for habit_type, (total, checks) in merged["streaks"].items()],
+        columns=["Type", "Avg Streak", "Avg Longest Streak", "Checks"]
+    ).sort_values("Type", ignore_index=True)
+
+    labels = [f"{low + 1}-{high}" if high > low + 1 else str(high)
+              for low, high in zip(STREAK_BUCKETS, STREAK_BUCKETS[1:])]
+    labels = ["0"] + labels + [f"{STREAK_BUCKETS[-1] + 1}+"]
+    buckets = dict.fromkeys(labels, 0)
+    for max_streak, count in streak_counts:
+        max_streak = max_streak or 0
+        index = next((i for i, bound in enumerate(STREAK_BUCKETS) if max_streak <= bound), len(STREAK_BUCKETS))
+        buckets[labels[index]] += count
+    distribution = pd.DataFrame(list(buckets.items()), columns=["Longest Streak", "Habits"])
+    return popular, streaks, distribution
+
+
+def show_global_stats(db_path="main_db.db", workers=None):
+    """Function to display the population statistics of all users"""
+    try:
+        popular, streaks, distribution = global_stats(db_path, workers)
+    except sqlite3.Error as e:
+        print(f"An error occurred while computing the global statistics: {e}")
+        return None
+    print("\n======================Most Popular Predefined Habits=====================")
+    print(popular.to_string(index=False) if not popular.empty else "No check-ins of predefined habits.")
+    print("\n=========================Streaks per Habit Type==========================")
+    print(streaks.to_string(index=False) if not streaks.empty else "No check-ins available.")
+    print("\n=====================Distribution of Longest Streaks=====================")
+    print(distribution.to_string(index=False))
+    return popular, streaks, distribution
+
+
+# Operators can run the module directly on the database file
+if __name__ == "__main__":
+    show_global_stats()
@@ -3,11 +3,17 @@ This file contains functions for the logged-in user to analyze their data.
 The user will be able to view all, all custom, and all predefined habits.
 They can filter for daily and for weekly habits.
 The user can also view their streaks and the repetition counte.
+Completion rates over rolling windows and the adherence per ISO week can be displayed as well.
+The year heatmap is derived from the calendar bitmaps (see heatmap.py).
+Measurement statistics of quantity-tracked habits are read from the rollups per day, week and month.
 The analyze file makes use of the pandas and sqlite libraries.
 """
 
 import sqlite3
 import pandas as pd
+from datetime import date
+import heatmap
+from periods import parse_interval
 
 #### Functions to show habits according to creator and periodicity
 
@@ -249,3 +255,198 @@ def show_rep_number(cur, user_id):
         print(f"An error occurred while retrieving the number of repetitions: {e}")
         return pd.DataFrame()
     
+
+# Columns of the completion rates and of the adherence per ISO week
+RATE_COLUMNS = ["Habit", "Interval", "7 Days", "30 Days", "90 Days", "365 Days", "Trend"]
+WEEK_COLUMNS = ["Week", "Completed", "Expected", "Adherence"]
+
+
+def habit_periods(interval, dates, first, today):
+    """
+    Function to return the end date, the expected and the completed checks of every period of a habit
+    from the period of the first date to the running period (see periods.py).
+    A period is completed by interval.times check days; the running period only counts its checks.
+    """
+    counts = pd.Series([interval.period_of(day) for day in dates], dtype="int64").value_counts()
+    current = interval.period_of(today)
+    rows = []
+    for period in range(interval.period_of(first), current + 1):
+        done = min(int(counts.get(period, 0)), interval.times)
+        rows.append((pd.Timestamp(interval.period_end(period)), interval.times if period < current else done, done))
+    return rows
+
+
+def get_completion_rates(cur, user_id, today=None, weeks=12):
+    """
+    Function to compute completion rates over the last 7/30/90/365 days,
+    the adherence per ISO week and the trend (7 days vs. 30 days) of all habits.
+    All habits are fetched at once; the check days are bucketed into the periods of the interval of every habit
+    (interval code and week start, see periods.py), a window or week contains the periods that end in it.
+    Returns the two DataFrames (rates, adherence).
+    """
+    windows = [7, 30, 90, 365]
+    today = pd.Timestamp(today or pd.Timestamp.now().date()).normalize()
+    start = today - pd.Timedelta(days=max(windows[-1], weeks * 7) - 1)
+    # Single fetch: every habit of the user with its check dates inside the largest window
+    cur.execute("""SELECT h.habit_name, h.habit_interval, h.interval_code, h.week_start, h.habit_date, c.check_date
+                FROM habits AS h LEFT JOIN counter AS c
+                ON c.user_id = h.user_id AND c.habit_name = h.habit_name
+                AND c.check_date BETWEEN ? AND ?
+                WHERE h.user_id = ?""",
+                (start.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'), user_id)
+               )
+    rows = cur.fetchall()
+    if not rows:
+        return pd.DataFrame(columns=RATE_COLUMNS), pd.DataFrame(columns=WEEK_COLUMNS)
+
+    df = pd.DataFrame(rows, columns=["habit", "interval", "code", "week_start", "created", "date"])
+    df["date"] = pd.to_datetime(df["date"])
+    df["created"] = pd.to_datetime(df["created"], errors="coerce")
+    habits = df.groupby("habit", sort=False).agg(interval=("interval", "first"), code=("code", "first"),
+                                                 week_start=("week_start", "first"), created=("created", "first"))
+    periods = []
+    for habit, entry in habits.iterrows():
+        interval = parse_interval(entry["code"] or entry["interval"],
+                                  None if pd.isna(entry["week_start"]) else int(entry["week_start"]))
+        # Habits without creation date count as old habits
+        first = start if pd.isna(entry["created"]) else min(max(entry["created"], start), today)
+        dates = df.loc[(df["habit"] == habit) & df["date"].notna(), "date"].dt.date.unique()
+        periods += [(habit,) + row for row in habit_periods(interval, dates, first.date(), today.date())]
+    periods = pd.DataFrame(periods, columns=["habit", "end", "expected", "done"])
+
+    rates = pd.DataFrame({"Habit": habits.index, "Interval": habits["interval"].values})
+    for window in windows:
+        inside = periods[periods["end"] > today - pd.Timedelta(days=window)].groupby("habit")[["expected", "done"]].sum()
+        inside = inside.reindex(habits.index, fill_value=0)
+        # Habits without an expected check yet (e.g. created today, not checked) count as complete
+        rate = (inside["done"] / inside["expected"].where(inside["expected"] > 0)).fillna(1).clip(upper=1)
+        rates[f"{window} Days"] = (rate * 100).round(1).values
+    rates["Trend"] = (rates["7 Days"] - rates["30 Days"]).round(1)
+    rates = rates.sort_values("30 Days", ascending=False, ignore_index=True)
+
+    # Adherence per ISO week over the last weeks: the periods that end in the week (daily habits: 7 per week)
+    iso = periods["end"].dt.isocalendar()
+    periods["week"] = iso["year"].astype("string") + "-W" + iso["week"].astype("string").str.zfill(2)
+    week_starts = pd.date_range(end=today, periods=weeks, freq="W-MON", normalize=True)
+    week_iso = week_starts.isocalendar()
+    labels = week_iso["year"].astype(str) + "-W" + week_iso["week"].astype(str).str.zfill(2)
+    totals = periods.groupby("week")[["expected", "done"]].sum().reindex(labels.values, fill_value=0)
+    adherence = pd.DataFrame({"Week": labels.values, "Completed": totals["done"].values.astype(int),
+                              "Expected": totals["expected"].values.astype(int)})
+    # Weeks without an expected check (e.g. only monthly habits) count as complete, like the rates
+    adherence["Adherence"] = (adherence["Completed"] / adherence["Expected"].where(adherence["Expected"] > 0)
+                              * 100).fillna(100.0).round(1)
+    return rates, adherence
+
+
+def show_completion_rates(cur, user_id, today=None, weeks=12):
+    """Function to display the completion rates, the trend and the adherence per ISO week of all habits"""
+    try:
+        rates, adherence = get_completion_rates(cur, user_id, today, weeks)
+        if rates.empty:
+            print("\nNo completion data available.")
+            return rates, adherence
+        print("\nHere are your completion rates (in %) and the trend (7 vs. 30 days):")
+        print(rates.to_string(index=False))
+        print("\nHere is your adherence (in %) per ISO week:")
+        print(adherence.to_string(index=False))
+        return rates, adherence
+    except sqlite3.Error as e:
+        print(f"An error occurred while retrieving completion rates: {e}")
+        return pd.DataFrame(columns=RATE_COLUMNS), pd.DataFrame(columns=WEEK_COLUMNS)
+
+
+def show_heatmap(cur, user_id, year=None, habit_name=None, today=None):
+    """
+    Function to display a year heatmap of all habits (or one habit) together with
+    the checked days, the longest and the current streak in days derived from the calendar bitmaps
+    """
+    columns = ["Habit", "Days Checked", "Longest Streak", "Current Streak"]
+    today = today or date.today()
+    year = year or today.year
+    try:
+        # Select the bitmaps of all years (needed for streaks over the turn of the year)
+        query = "SELECT habit_name, year, days FROM habit_calendar WHERE user_id = ?"
+        params = [user_id]
+        if habit_name:
+            query += " AND habit_name = ?"
+            params.append(habit_name)
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        if not rows:
+            print("\nNo check-ins available for a heatmap.")
+            return pd.DataFrame(columns=columns)
+
+        bitmaps = {}
+        for name, row_year, days in rows:
+            bitmaps.setdefault(name, {})[row_year] = days
+
+        stats = []
+        for name, years in bitmaps.items():
+            bits, first = heatmap.join_years(years)
+            # Position of today within the chained bitmaps
+            index = (today - date(first, 1, 1)).days
+            current = heatmap.current_run(bits, index)
+            if current == 0:
+                # The streak is still alive if the habit was checked yesterday
+                current = heatmap.current_run(bits, index - 1)
+            stats.append((name, heatmap.popcount(years.get(year)), heatmap.longest_run(bits), current))
+        df = pd.DataFrame(stats, columns=columns).sort_values("Habit", ignore_index=True)
+
+        counts = heatmap.counts_per_day([years[year] for years in bitmaps.values() if year in years], year)
+        title = f"Heatmap {year}" + (f" for '{habit_name}'" if habit_name else " for all habits")
+        print("\n" + heatmap.render_heatmap(counts, year, title))
+        print("\nHere are your checked days and streaks (in days):")
+        print(df.to_string(index=False))
+        return df
+    except sqlite3.Error as e:
+        print(f"An error occurred while retrieving the heatmap: {e}")
+        return pd.DataFrame(columns=columns)
+
+
+def show_measure_stats(cur, user_id, grain="W", last=None):
+    """
+    Function to display the measurements of quantity-tracked habits per day ('D'), week ('W') or month ('M'):
+    sum, mean per check-in, mean, median and 90th percentile per period and the share of reached goals.
+    Only the rollup rows are read, never the single check-ins.
+
+    :param grain: 'D', 'W' or 'M'
+    :param last: Only the last N periods (optional)
+    """
+    columns = ["Habit", "Unit", "Periods", "Total", "Mean per Check", "Mean per Period",
+               "Median per Period", "P90 per Period", "Goal", "Goal Reached (%)"]
+    if grain not in ("D", "W", "M"):
+        raise ValueError("Unknown grain. Please choose 'D', 'W' or 'M'.")
+    try:
+        cur.execute("""SELECT h.habit_name, h.unit, h.goal, r.bucket, r.n, r.total, r.goal_hits
+                    FROM measure_rollup AS r JOIN habits AS h
+                    ON h.user_id = r.user_id AND h.habit_name = r.habit_name
+                    WHERE r.user_id = ? AND r.grain = ?""", (user_id, grain))
+        rows = cur.fetchall()
+        if not rows:
+            print("\nNo measurements available.")
+            return pd.DataFrame(columns=columns)
+
+        df = pd.DataFrame(rows, columns=["habit", "unit", "goal", "bucket", "n", "total", "hits"])
+        if last:
+            df = df[df["bucket"] > df.groupby("habit")["bucket"].transform("max") - last]
+        per_habit = df.groupby("habit")
+        stats = pd.DataFrame({
+            "Unit": per_habit["unit"].first(),
+            "Periods": per_habit["bucket"].count(),
+            "Total": per_habit["total"].sum(),
+            "Mean per Check": per_habit["total"].sum() / per_habit["n"].sum(),
+            "Mean per Period": per_habit["total"].mean(),
+            "Median per Period": per_habit["total"].median(),
+            "P90 per Period": per_habit["total"].quantile(0.9),
+            "Goal": per_habit["goal"].first(),
+            "Goal Reached (%)": (per_habit["hits"].sum() / per_habit["n"].sum() * 100).where(per_habit["goal"].first().notna()),
+        }).round(2).rename_axis("Habit").reset_index()
+
+        period = {"D": "day", "W": "week", "M": "month"}[grain]
+        print(f"\nHere are your measurements per {period}:")
+        print(stats.to_string(index=False))
+        return stats
+    except sqlite3.Error as e:
+        print(f"An error occurred while retrieving the measurements: {e}")
+        return pd.DataFrame(columns=columns)
@@ -0,0 +1,258 @@
+"""
+This file contains the async data access API of the habit tracker for asyncio applications, e.g.:
+    async with AsyncTracker("main_db.db") as tracker:
+        user_id = await tracker.authenticate(token)
+        result = await tracker.check(user_id, "Yoga")
+        habits = await tracker.list_habits(user_id)
+        streaks = await tracker.streaks(user_id)
+The blocking sqlite3 calls never run on the event loop: all changes run on one dedicated writer thread
+with its own connection (the writes of the application are serialized and never wait for each other's locks),
+queries run on a pool of reader threads with read-only connections (WAL mode, readers do not block the writer).
+Opening and closing the connections run on these threads as well.
+Every call has a timeout (default: timeout of the tracker). A call that times out or whose task is cancelled
+is removed from the queue of its thread, or its running SQL statement is interrupted
+(sqlite3.Connection.interrupt); the open transaction of an interrupted change is rolled back when its connection
+is returned to the pool (see db_pool.py).
+Other service functions with the signature func(cur, db, ...) can be run with read() and write().
+The benchmark (python async_api.py) measures the throughput and the lag of the event loop during the calls.
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import sessions
+from cli import check_habit, get_stats, get_streaks, list_habits
+from db_pool import ConnectionPool
+from due import get_due_habits
+
+# Seconds until a call is cancelled
+DEFAULT_TIMEOUT = 10.0
+
+
+class AsyncTracker:
+    """
+    Async access to the database of the habit tracker.
+
+    :param db_path: Path of the database file
+    :param readers: Number of reader threads (and read-only connections)
+    :param timeout: Default seconds until a call is cancelled with TimeoutError
+    """
+
+    def __init__(self, db_path="main_db.db", readers=4, timeout=DEFAULT_TIMEOUT):
+        self.db_path = db_path
+        self.reader_count = readers
+        self.timeout = timeout
+        self.writer = None
+        self.readers = None
+        self.write_executor = None
+        self.read_executor = None
+
+    ### Start and shutdown
+
+    def open_pools(self):
+        """Method to open the writer connection and the read-only reader connections (runs on the writer thread)"""
+        writer = ConnectionPool(self.db_path, 1)
+        readers = ConnectionPool(self.db_path, self.reader_count)
+        for db in readers.connections:
+            db.execute("PRAGMA query_only = ON")
+        return writer, readers
+
+    async def open(self):
+        """Method to start the threads and open the connections"""
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="habit-writer")
+        self.read_executor = ThreadPoolExecutor(max_workers=self.reader_count, thread_name_prefix="habit-reader")
+        loop = asyncio.get_running_loop()
+        self.writer, self.readers = await loop.run_in_executor(self.write_executor, self.open_pools)
+        return self
+
+    def close_pools(self):
+        """Method to wait for the running calls and close all connections"""
+        self.write_executor.shutdown(wait=True)
+        self.read_executor.shutdown(wait=True)
+        self.writer.close()
+        self.readers.close()
+
+    async def close(self):
+        """Method to complete the running calls, stop the threads and close the connections"""
+        if self.writer is not None:
+            await asyncio.to_thread(self.close_pools)
+            self.writer = self.readers = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    ### Calls
+
+    async def run(self, pool, executor, func, *args, timeout=None):
+        """
+        Method to run func(cur, db, *args) on a thread of the executor with a connection of the pool.
+        On a timeout or a cancellation the call is dropped from the queue or its SQL statement is interrupted.
+        """
+        loop = asyncio.get_running_loop()
+        lock = threading.Lock()
+        call = {"db": None, "cancelled": False}
+
+        def work():
+            with pool.connection() as db:
+                with lock:
+                    if call["cancelled"]:
+                        return None
+                    call["db"] = db
+                try:
+                    return func(db.cursor(), db, *args)
+                finally:
+                    with lock:
+                        call["db"] = None  # the connection is returned: no interrupt of the next call
+
+        future = loop.run_in_executor(executor, work)
+        try:
+            return await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError, TimeoutError):
+            with lock:
+                call["cancelled"] = True
+                if call["db"] is not None:
+                    call["db"].interrupt()
+            raise
+
+    async def read(self, func, *args, timeout=None):
+        """Method to run a query func(cur, db, *args) on a reader thread"""
+        return await self.run(self.readers, self.read_executor, func, *args, timeout=timeout)
+
+    async def write(self, func, *args, timeout=None):
+        """Method to run a change func(cur, db, *args) on the writer thread"""
+        return await self.run(self.writer, self.write_executor, func, *args, timeout=timeout)
+
+    ### Core operations
+
+    async def authenticate(self, token, timeout=None):
+        """Method to return the user of a session token (None if it is invalid or expired)"""
+        return await self.read(lambda cur, db: sessions.validate_session(cur, token), timeout=timeout)
+
+    async def check(self, user_id, habit_name, quantity=None, timeout=None):
+        """Method to check a habit now (see cli.check_habit); raises CommandError for an unknown habit"""
+        return await self.write(check_habit, user_id, habit_name, quantity, timeout=timeout)
+
+    async def list_habits(self, user_id, timeout=None):
+        """Method to return the habits of the user (own habits and the predefined habits not used yet)"""
+        return await self.read(lambda cur, db: list_habits(cur, user_id), timeout=timeout)
+
+    async def streaks(self, user_id, timeout=None):
+        """Method to return the current and the longest streak of every habit of the user"""
+        return await self.read(lambda cur, db: get_streaks(cur, user_id), timeout=timeout)
+
+    async def stats(self, user_id, habit_name=None, timeout=None):
+        """Method to return the statistics of the habits of the user (optional one habit)"""
+        return await self.read(lambda cur, db: get_stats(cur, user_id, habit_name), timeout=timeout)
+
+    async def due(self, user_id, risk_days=0, timeout=None):
+        """Method to return the due habits of the user and the streaks at risk within risk_days"""
+        return await self.read(lambda cur, db: get_due_habits(cur, user_id, risk_days=risk_days), timeout=timeout)
+
+
+### Benchmark
+
+class LoopMonitor:
+    """
+    Measures the lag of the event loop: a task sleeps for interval seconds again and again,
+    every delay beyond the interval is time in which the loop could not run callbacks (blocked).
+    """
+
+    def __init__(self, interval=0.0005):
+        self.interval = interval
+        self.lags = []
+        self.task = None
+
+    async def watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(loop.time() - start - self.interval)
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.watch())
+
+    async def stop(self):
+        """Method to stop the monitor; returns the maximum and the p99 lag in ms"""
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        lags = sorted(self.lags) or [0.0]
+        return {"max_lag_ms": round(lags[-1] * 1000, 3),
+                "p99_lag_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 3)}
+
+
+async def benchmark(tracker, user_id, habit_name, calls=1000, concurrency=10):
+    """
+    Function to run concurrent calls (one check-in per 10 calls, the others alternate between
+    habit list, streaks and statistics) while the event loop lag is measured.
+    Returns the number of calls and errors, the throughput, the p50/p99 latency and the loop lag in ms,
+    together with the lag of the idle loop (timer and scheduler jitter of the machine) as baseline.
+    """
+    monitor = LoopMonitor()
+    monitor.start()
+    await asyncio.sleep(0.2)
+    idle = await monitor.stop()
+    latencies, errors = [], 0
+    operations = [lambda: tracker.list_habits(user_id), lambda: tracker.streaks(user_id),
+                  lambda: tracker.stats(user_id)]
+
+    async def run_client(number, count):
+        nonlocal errors
+        for index in range(count):
+            begin = time.perf_counter()
+            try:
+                if (number + index) % 10 == 0:
+                    await tracker.check(user_id, habit_name)
+                else:
+                    await operations[(number + index) % len(operations)]()
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - begin) * 1000)
+
+    monitor = LoopMonitor()
+    monitor.start()
+    shares = [calls // concurrency + (number < calls % concurrency) for number in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(number, count) for number, count in enumerate(shares) if count))
+    seconds = time.perf_counter() - start
+    lag = await monitor.stop()
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "errors": errors,
+        "calls_per_second": round(len(latencies) / seconds, 1) if seconds else 0,
+        "p50_ms": round(latencies[len(latencies) // 2], 3) if latencies else 0,
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3) if latencies else 0,
+        **lag,
+        "idle_max_lag_ms": idle["max_lag_ms"],
+        "idle_p99_lag_ms": idle["p99_lag_ms"],
+    }
+
+
+# Operators run the benchmark directly (uses the session of the last login)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the async data access API.")
+    parser.add_argument("--db", default="main_db.db")
+    parser.add_argument("--habit", default="Yoga", help="habit of the check-ins")
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    async def main():
+        async with AsyncTracker(args.db, args.readers) as tracker:
+            user_id = await tracker.authenticate(sessions.load_token())
+            if not user_id:
+                raise SystemExit("Not logged in. Please run 'cli.py login <user name>' or start main.py.")
+            return await benchmark(tracker, user_id, args.habit, args.calls, args.concurrency)
+
+    print(json.dumps(asyncio.run(main())))
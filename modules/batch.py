@@ -0,0 +1,301 @@
+"""
+This file contains the batch mode of the habit tracker: a file of commands (or stdin) is executed in one process
+for bulk operations such as seeding habits for a team, mass resets or corrections, e.g.:
+    # user   habit      interval / date
+    create-habit test0123 "Cold Shower" D Physical "A cold shower every morning"
+    check test0123 Yoga 2025-04-01
+    check test0123 Jogging 2025-04-02 5.2
+    reset-rep test0123 Yoga
+    reset-streak test0123 PMR
+Users are identified by their user ID or login ID, habits by their name (case-insensitive).
+All lines are parsed and validated first against an index of the users and habits that is loaded once
+(habits created in the same batch are added to the index). The valid commands are then applied in transactions of
+transaction_size commands; the streaks, calendar bitmaps, rollups and goals of the checked habits are
+recomputed and the data versions of the users are incremented once per transaction
+(like a bulk import, checks of a batch do not create outbox events).
+The report contains the status and the duration of every line.
+Run: python batch.py commands.txt (or - for stdin), see --help for the options.
+"""
+
+import argparse
+import shlex
+import sqlite3
+import sys
+import time
+from datetime import date, datetime
+from db import create_tables, pause_data_version, rebuild_calendar, rebuild_rollup, resume_data_version
+from habit_manager import ensure_user_habit
+from counter_manager import recompute_streaks, reset_current_streak
+from goal_manager import refresh_goals
+from importer import INSERT_CHECK
+from periods import parse_interval
+import hooks
+
+# Number of commands per transaction
+DEFAULT_TRANSACTION_SIZE = 1000
+
+# Commands with their number of required and optional arguments
+COMMANDS = {
+    "create-habit": (3, 2),  # user, habit, interval [, type [, description]]
+    "check": (3, 1),         # user, habit, date [, quantity]
+    "reset-rep": (2, 0),     # user, habit
+    "reset-streak": (2, 0),  # user, habit
+}
+
+
+### Index of users and habits (loaded once per batch)
+
+def load_index(cur):
+    """
+    Function to load the index of a batch: the active users by user ID and login ID,
+    the habits of the users and the predefined habits (lower-case names to stored names)
+    """
+    cur.execute("SELECT user_id, login_id FROM user WHERE deleted_at IS NULL")
+    users = {}
+    for user_id, login_id in cur.fetchall():
+        users[user_id.lower()] = user_id
+        if login_id:
+            users.setdefault(login_id.lower(), user_id)
+    cur.execute("SELECT user_id, habit_name FROM habits WHERE user_id IS NOT NULL")
+    habits = {(user_id, name.lower()): name for user_id, name in cur.fetchall()}
+    cur.execute("SELECT habit_name FROM habits WHERE is_custom = 0 AND user_id IS NULL")
+    predefined = {name.lower(): name for (name,) in cur.fetchall()}
+    return {"users": users, "habits": habits, "predefined": predefined}
+
+
+### Parsing and validation
+
+def parse_line(line_no, line, index):
+    """
+    Function to parse and validate one line of a batch against the index.
+    Returns a command dictionary (None for blank lines and comments) with a status
+    'valid' or 'rejected' and the reason of a rejection.
+    """
+    try:
+        tokens = shlex.split(line, comments=True)
+    except ValueError as e:
+        return {"line": line_no, "command": line.strip(), "status": "rejected", "message": f"invalid line ({e})"}
+    if not tokens:
+        return None
+    command = {"line": line_no, "command": " ".join(tokens), "op": tokens[0].lower(), "status": "valid", "message": ""}
+    args = tokens[1:]
+    if command["op"] not in COMMANDS:
+        return dict(command, status="rejected", message=f"unknown command '{tokens[0]}'")
+    required, optional = COMMANDS[command["op"]]
+    if not required <= len(args) <= required + optional:
+        return dict(command, status="rejected", message="wrong number of arguments")
+    user_id = index["users"].get(args[0].lower())
+    if user_id is None:
+        return dict(command, status="rejected", message=f"unknown user '{args[0]}'")
+    command["user_id"] = user_id
+    key = (user_id, args[1].strip().lower())
+
+    if command["op"] == "create-habit":
+        name = args[1].strip().title()
+        if not name or key in index["habits"]:
+            return dict(command, status="rejected", message=f"habit '{name}' already exists")
+        try:
+            interval = parse_interval(args[2])
+        except ValueError:
+            return dict(command, status="rejected", message=f"invalid interval '{args[2]}'")
+        index["habits"][key] = name
+        command.update(habit_name=name, interval=interval,
+                       habit_type=args[3] if len(args) > 3 else "Custom",
+                       habit_def=args[4] if len(args) > 4 else "")
+        return command
+
+    habit_name = index["habits"].get(key) or index["predefined"].get(key[1])
+    if habit_name is None:
+        return dict(command, status="rejected", message=f"unknown habit '{args[1]}'")
+    command["habit_name"] = habit_name
+    if command["op"] == "check":
+        try:
+            if len(args[2]) != 10:
+                raise ValueError
+            date.fromisoformat(args[2])
+        except ValueError:
+            return dict(command, status="rejected", message=f"invalid date '{args[2]}'")
+        try:
+            quantity = float(args[3]) if len(args) > 3 else None
+        except ValueError:
+            quantity = -1
+        if quantity is not None and not quantity >= 0:
+            return dict(command, status="rejected", message=f"invalid quantity '{args[3]}'")
+        command.update(check_date=args[2], quantity=quantity)
+    return command
+
+
+def parse_batch(lines, index):
+    """Function to parse and validate all lines of a batch; returns the list of commands"""
+    commands = []
+    for line_no, line in enumerate(lines, start=1):
+        command = parse_line(line_no, line, index)
+        if command is not None:
+            commands.append(command)
+    return commands
+
+
+### Operations (no commit; the checked habits are collected in touched and recomputed per transaction)
+
+def op_create_habit(cur, db, command, touched):
+    """Operation to create a custom habit"""
+    interval = command["interval"]
+    cur.execute("""INSERT INTO habits (user_id, habit_name, habit_def, habit_type, habit_date, habit_interval,
+                interval_code, is_custom) VALUES (?, ?, ?, ?, ?, ?, ?, 1)""",
+                (command["user_id"], command["habit_name"], command["habit_def"], command["habit_type"],
+                 datetime.now().strftime('%Y-%m-%d'), interval.label, interval.code))
+
+
+def op_check(cur, db, command, touched):
+    """Operation to add a check-in on a date"""
+    key = (command["user_id"], command["habit_name"])
+    if key not in touched:
+        ensure_user_habit(cur, *key)
+        touched.add(key)
+    cur.execute(INSERT_CHECK, key + (command["check_date"], "00:00:00", 1, command["quantity"]))
+
+
+def op_reset_rep(cur, db, command, touched):
+    """Operation to reset the repetition counter of a habit"""
+    cur.execute("UPDATE counter SET habit_rep = 0 WHERE habit_name = ? AND user_id = ?",
+                (command["habit_name"], command["user_id"]))
+
+
+def op_reset_streak(cur, db, command, touched):
+    """
+    Operation to reset the current streak of a habit (earlier checks of the batch are recomputed first).
+    The last check-in is marked with streak_reset, so later checks (of this or a later batch) start a new streak.
+    """
+    key = (command["user_id"], command["habit_name"])
+    if key in touched:
+        recompute_habit(cur, db, *key)
+        touched.discard(key)
+    reset_current_streak(cur, *key)
+
+
+OPERATIONS = {
+    "create-habit": op_create_habit,
+    "check": op_check,
+    "reset-rep": op_reset_rep,
+    "reset-streak": op_reset_streak,
+}
+
+# Hooks emitted after the commit of a transaction (see hooks.py)
+HOOK_EVENTS = {"reset-rep": "reset_rep", "reset-streak": "reset_streak"}
+
+
+def recompute_habit(cur, db, user_id, habit_name):
+    """Function to recompute streaks, calendar bitmaps, rollups and goals of a checked habit (no commit)"""
+    recompute_streaks(cur, db, user_id, habit_name, commit=False)
+    rebuild_calendar(cur, db, user_id, habit_name, commit=False)
+    rebuild_rollup(cur, db, user_id, habit_name, commit=False)
+    refresh_goals(cur, user_id, habit_name)
+
+
+### Execution
+
+def apply_batch(cur, db, commands, transaction_size=DEFAULT_TRANSACTION_SIZE):
+    """
+    Function to apply the valid commands of a batch in transactions of transaction_size commands.
+    A failed transaction is rolled back and all its commands are marked as 'failed'; the next transaction continues.
+    Sets status, message and duration (ms) of every command and returns the number of transactions.
+    """
+    valid = [command for command in commands if command["status"] == "valid"]
+    transactions = 0
+    for start in range(0, len(valid), transaction_size):
+        chunk = valid[start:start + transaction_size]
+        touched = set()
+        try:
+            # The data version of every user of the transaction is incremented once
+            pause_data_version(cur, sorted({command["user_id"] for command in chunk}))
+            for command in chunk:
+                begin = time.perf_counter()
+                OPERATIONS[command["op"]](cur, db, command, touched)
+                command["ms"] = (time.perf_counter() - begin) * 1000
+            for key in sorted(touched):
+                recompute_habit(cur, db, *key)
+            resume_data_version(cur)
+            db.commit()
+        except sqlite3.Error as e:
+            db.rollback()
+            for command in chunk:
+                command.update(status="failed", message=f"transaction rolled back: {e}")
+            continue
+        finally:
+            transactions += 1
+        for command in chunk:
+            command["status"] = "ok"
+            if command["op"] in HOOK_EVENTS:
+                hooks.emit(HOOK_EVENTS[command["op"]], user_id=command["user_id"], habit_name=command["habit_name"])
+    return transactions
+
+
+def run_batch(cur, db, lines, transaction_size=DEFAULT_TRANSACTION_SIZE, dry_run=False, strict=False):
+    """
+    Function to run a batch of command lines.
+
+    :param lines: Iterable of command lines (e.g. an opened file)
+    :param transaction_size: Number of commands per transaction
+    :param dry_run: Only parse and validate the lines
+    :param strict: Apply nothing if a line is rejected
+    :return: Dictionary with the number of lines per status, the number of transactions, the duration
+             and the report (one dictionary per line with line, command, status, message and ms)
+    """
+    start = time.perf_counter()
+    commands = parse_batch(lines, load_index(cur))
+    parse_seconds = time.perf_counter() - start
+    rejected = sum(1 for command in commands if command["status"] == "rejected")
+    transactions = 0
+    if not dry_run and not (strict and rejected):
+        transactions = apply_batch(cur, db, commands, transaction_size)
+    counts = {status: 0 for status in ("ok", "valid", "rejected", "failed")}
+    for command in commands:
+        counts[command["status"]] += 1
+    return {
+        **counts,
+        "transactions": transactions,
+        "parse_seconds": parse_seconds,
+        "seconds": time.perf_counter() - start,
+        "report": [{"line": c["line"], "command": c["command"], "status": c["status"],
+                    "message": c["message"], "ms": round(c.get("ms", 0.0), 3)} for c in commands],
+    }
+
+
+def write_report(result, out):
+    """Function to write the report of a batch as TSV"""
+    out.write("line\tcommand\tstatus\tmessage\tms\n")
+    for row in result["report"]:
+        out.write(f"{row['line']}\t{row['command']}\t{row['status']}\t{row['message']}\t{row['ms']}\n")
+
+
+# Operators run a command file directly on the database file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a file of habit tracker commands in one process.")
+    parser.add_argument("path", help="command file or - for stdin")
+    parser.add_argument("--db", default="main_db.db", help="database file (default: %(default)s)")
+    parser.add_argument("--transaction-size", type=int, default=DEFAULT_TRANSACTION_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only validate the commands")
+    parser.add_argument("--strict", action="store_true", help="apply nothing if a line is rejected")
+    parser.add_argument("--report", help="TSV file for the report (default: stdout)")
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.db, timeout=30)
+    try:
+        connection.execute("PRAGMA foreign_keys = ON")
+        cursor = connection.cursor()
+        create_tables(cursor, connection)
+        source = sys.stdin if args.path == "-" else open(args.path, "r", encoding="utf-8")
+        with source:
+            result = run_batch(cursor, connection, source, args.transaction_size, args.dry_run, args.strict)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as report:
+                write_report(result, report)
+        else:
+            write_report(result, sys.stdout)
+        print(f"{result['ok']} ok, {result['valid']} valid (not applied), {result['rejected']} rejected, "
+              f"{result['failed']} failed in {result['transactions']} transaction(s), {result['seconds']:.2f} s",
+              file=sys.stderr)
+    finally:
+        connection.close()
+    if result["rejected"] or result["failed"]:
+        sys.exit(1)
@@ -0,0 +1,327 @@
+"""
+This file contains a non-interactive command line interface of the habit tracker for scripts, cron jobs and
+shell aliases, next to the menus of main.py, e.g.:
+    python cli.py login testuser
+    python cli.py check Yoga
+    python cli.py check Jogging --quantity 5.2
+    python cli.py backfill Yoga 2025-04-01 2025-04-02
+    python cli.py list --tsv
+    python cli.py stats --json
+    python cli.py export history.csv.gz
+    python cli.py import history.jsonl
+The user is identified by the session of the last login (see sessions.py; scripts can set HABIT_SESSION_TOKEN).
+The output is JSON (default) or TSV with a header line; errors are printed to stderr with a non-zero exit code.
+Only the modules a command needs are imported, so a check-in does not load pandas or the export libraries.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import sessions
+from db import SCHEMA_VERSION, create_tables
+
+# Exit codes (argparse exits with 2 on invalid arguments)
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_NOT_LOGGED_IN = 3
+
+# Database file of the CLI (same file as the menus of main.py)
+DEFAULT_DB = os.environ.get("HABIT_DB", "main_db.db")
+
+
+class CommandError(Exception):
+    """Error of a command that is reported to the caller with its exit code"""
+
+    def __init__(self, message, code=EXIT_FAILED):
+        super().__init__(message)
+        self.code = code
+
+
+### Output
+
+def tsv_value(value):
+    """Function to format one value of a TSV line"""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(item) for item in value)
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def write_output(result, fmt="json", out=None):
+    """Function to print the result of a command (a dictionary or a list of dictionaries) as JSON or TSV"""
+    out = out or sys.stdout
+    if fmt == "json":
+        out.write(json.dumps(result, default=str) + "\n")
+        return
+    rows = result if isinstance(result, list) else [result]
+    if not rows:
+        return
+    columns = list(rows[0])
+    out.write("\t".join(columns) + "\n")
+    for row in rows:
+        out.write("\t".join(tsv_value(row.get(column)) for column in columns) + "\n")
+
+
+### Helpers
+
+def open_db(path):
+    """
+    Function to open the database of the CLI and add missing tables of newer program versions
+    (only if the schema version of the database is older, so a command usually runs no DDL)
+    """
+    db = sqlite3.connect(path, timeout=30)
+    db.execute("PRAGMA foreign_keys = ON")
+    cur = db.cursor()
+    cur.execute("PRAGMA user_version")
+    if cur.fetchone()[0] < SCHEMA_VERSION:
+        create_tables(cur, db)
+    return db, cur
+
+
+def session_user(cur):
+    """Function to return the user of the stored session or raise an error if nobody is logged in"""
+    user_id = sessions.validate_session(cur, sessions.load_token())
+    if not user_id:
+        raise CommandError("Not logged in. Please run 'cli.py login <user name>' or start main.py.",
+                           EXIT_NOT_LOGGED_IN)
+    return user_id
+
+
+def resolve_habit(cur, user_id, name):
+    """Function to return the stored name of a habit of the user (case-insensitive) or raise an error"""
+    cur.execute("""SELECT habit_name FROM habits WHERE lower(habit_name) = lower(?)
+                AND (user_id = ? OR (is_custom = 0 AND user_id IS NULL)) ORDER BY user_id IS NULL LIMIT 1""",
+                (name.strip(), user_id))
+    row = cur.fetchone()
+    if not row:
+        raise CommandError(f"Habit '{name}' not found.")
+    return row[0]
+
+
+def rows_as_dicts(cur):
+    """Function to return the result rows of the last query as dictionaries"""
+    columns = [column[0] for column in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+### Commands (every command gets the cursor, the connection and the parsed arguments)
+
+def cmd_login(cur, db, args):
+    """Command to log in with user name or user ID and password; the session is stored for the next commands"""
+    from user_manager import verify_login
+    if args.password_stdin:
+        password = sys.stdin.readline().rstrip("\n")
+    else:
+        import pwinput
+        password = pwinput.pwinput("Please enter your password: ")
+    user_id = verify_login(cur, db, args.identifier, password, "cli")
+    if not user_id:
+        raise CommandError("Login failed.")
+    token = sessions.create_session(cur, db, user_id)
+    sessions.save_token(token)
+    return {"user_id": user_id}
+
+
+def cmd_logout(cur, db, args):
+    """Command to end the stored session"""
+    token = sessions.load_token()
+    revoked = sessions.revoke_session(cur, db, token) if token else False
+    sessions.clear_token()
+    return {"logged_out": revoked}
+
+
+def check_habit(cur, db, user_id, name, quantity=None):
+    """Function to check a habit of a user now (name case-insensitive); returns the result of the check"""
+    from counter_manager import record_check
+    from habit_manager import ensure_user_habit
+    habit_name = resolve_habit(cur, user_id, name)
+    ensure_user_habit(cur, user_id, habit_name)
+    result = record_check(cur, db, user_id, habit_name, quantity=quantity)
+    if result["status"] in ("not found", "error"):
+        raise CommandError(f"The check of '{habit_name}' failed ({result['status']}).")
+    return {"habit_name": habit_name, **result}
+
+
+def cmd_check(cur, db, args):
+    """Command to check a habit now"""
+    return check_habit(cur, db, session_user(cur), args.habit, args.quantity)
+
+
+def cmd_backfill(cur, db, args):
+    """Command to add check-ins of past dates (streaks, calendar, rollups and goals are recomputed once)"""
+    from importer import import_history
+    user_id = session_user(cur)
+    habit_name = resolve_habit(cur, user_id, args.habit)
+    records = ((number, {"habit_name": habit_name, "check_date": check_date, "quantity": args.quantity})
+               for number, check_date in enumerate(args.dates, start=1))
+    result = import_history(cur, db, user_id, records=records)
+    if result["error"]:
+        raise CommandError(result["error"])
+    return {key: value for key, value in result.items() if key not in ("rows_per_minute", "error")}
+
+
+def list_habits(cur, user_id):
+    """Function to return the habits of a user (own habits and the predefined habits not used yet)"""
+    cur.execute("""SELECT habit_name, habit_type, habit_interval, is_custom, unit, goal,
+                cur_streak, max_streak, last_check, next_due FROM habits
+                WHERE user_id = ? OR (is_custom = 0 AND user_id IS NULL
+                AND habit_name NOT IN (SELECT habit_name FROM habits WHERE user_id = ?))
+                ORDER BY habit_name""", (user_id, user_id))
+    return rows_as_dicts(cur)
+
+
+def cmd_list(cur, db, args):
+    """Command to list the habits of the user (own habits and the predefined habits not used yet)"""
+    return list_habits(cur, session_user(cur))
+
+
+def get_stats(cur, user_id, habit_name=None):
+    """Function to return the statistics of the habits of a user (one aggregate query)"""
+    query = """SELECT h.habit_name, h.habit_interval, COALESCE(h.cur_streak, 0) AS cur_streak,
+               COALESCE(h.max_streak, 0) AS max_streak, COUNT(c.check_date) AS checks,
+               COALESCE(SUM(c.habit_rep), 0) AS repetitions, MIN(c.check_date) AS first_check,
+               MAX(c.check_date) AS last_check, h.streak_deadline, h.next_due,
+               SUM(c.quantity) AS quantity, h.unit
+               FROM habits AS h LEFT JOIN counter AS c ON c.user_id = h.user_id AND c.habit_name = h.habit_name
+               WHERE h.user_id = ?"""
+    params = [user_id]
+    if habit_name:
+        query += " AND h.habit_name = ?"
+        params.append(habit_name)
+    cur.execute(query + " GROUP BY h.habit_name ORDER BY h.habit_name", params)
+    return rows_as_dicts(cur)
+
+
+def get_streaks(cur, user_id):
+    """Function to return the current and the longest streak of every habit of a user (longest first)"""
+    cur.execute("""SELECT habit_name, habit_interval, COALESCE(cur_streak, 0) AS cur_streak,
+                COALESCE(max_streak, 0) AS max_streak, streak_deadline, last_check FROM habits
+                WHERE user_id = ? ORDER BY max_streak DESC, habit_name""", (user_id,))
+    return rows_as_dicts(cur)
+
+
+def cmd_stats(cur, db, args):
+    """Command to show the statistics of the habits of the user"""
+    user_id = session_user(cur)
+    return get_stats(cur, user_id, resolve_habit(cur, user_id, args.habit) if args.habit else None)
+
+
+def cmd_export(cur, db, args):
+    """Command to export the check-in history into a file (format from the option or the file name)"""
+    from export import export_history
+    user_id = session_user(cur)
+    name = args.path.lower()
+    compress = args.gzip or name.endswith(".gz")
+    name = name[:-3] if name.endswith(".gz") else name
+    fmt = args.file_format or ("jsonl" if name.endswith(".jsonl") else "parquet" if name.endswith(".parquet") else "csv")
+    habit_name = resolve_habit(cur, user_id, args.habit) if args.habit else None
+    try:
+        rows = export_history(cur, user_id, args.path, fmt, compress, habit_name=habit_name,
+                              start_date=args.start, end_date=args.end)
+    except (ValueError, OSError) as e:
+        raise CommandError(str(e))
+    return {"path": args.path, "format": fmt, "compressed": compress, "rows": rows}
+
+
+def cmd_import(cur, db, args):
+    """Command to import a check-in history from a CSV or JSON Lines file"""
+    from importer import import_history
+    user_id = session_user(cur)
+    if not os.path.exists(args.path):
+        raise CommandError(f"File '{args.path}' not found.")
+    try:
+        result = import_history(cur, db, user_id, args.path, chunk_size=args.chunk_size, rejected_path=args.rejected)
+    except ValueError as e:
+        raise CommandError(str(e))
+    if result["error"]:
+        raise CommandError(result["error"])
+    del result["error"]
+    return result
+
+
+### Argument parser
+
+def build_parser():
+    """Function to build the argument parser with one subcommand per command"""
+    output = argparse.ArgumentParser(add_help=False)
+    formats = output.add_mutually_exclusive_group()
+    formats.add_argument("--json", dest="output", action="store_const", const="json", help="JSON output (default)")
+    formats.add_argument("--tsv", dest="output", action="store_const", const="tsv", help="TSV output")
+
+    parser = argparse.ArgumentParser(prog="habit", description="Command line interface of 'My Habit Tracker'.")
+    parser.add_argument("--db", default=DEFAULT_DB, help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    login = commands.add_parser("login", parents=[output], help="log in and store the session")
+    login.add_argument("identifier", help="user name or user ID")
+    login.add_argument("--password-stdin", action="store_true", help="read the password from stdin")
+    login.set_defaults(handler=cmd_login)
+
+    logout = commands.add_parser("logout", parents=[output], help="end the stored session")
+    logout.set_defaults(handler=cmd_logout)
+
+    check = commands.add_parser("check", parents=[output], help="check a habit now")
+    check.add_argument("habit")
+    check.add_argument("--quantity", type=float, help="measurement of the check-in, e.g. km")
+    check.set_defaults(handler=cmd_check)
+
+    backfill = commands.add_parser("backfill", parents=[output], help="add check-ins of past dates")
+    backfill.add_argument("habit")
+    backfill.add_argument("dates", nargs="+", metavar="YYYY-MM-DD")
+    backfill.add_argument("--quantity", type=float, help="measurement of every check-in")
+    backfill.set_defaults(handler=cmd_backfill)
+
+    habits = commands.add_parser("list", parents=[output], help="list the habits")
+    habits.set_defaults(handler=cmd_list)
+
+    stats = commands.add_parser("stats", parents=[output], help="show streaks and check-in statistics")
+    stats.add_argument("habit", nargs="?")
+    stats.set_defaults(handler=cmd_stats)
+
+    export = commands.add_parser("export", parents=[output], help="export the check-in history")
+    export.add_argument("path")
+    export.add_argument("--file-format", choices=["csv", "jsonl", "parquet"])
+    export.add_argument("--gzip", action="store_true")
+    export.add_argument("--habit")
+    export.add_argument("--from", dest="start", metavar="YYYY-MM-DD")
+    export.add_argument("--to", dest="end", metavar="YYYY-MM-DD")
+    export.set_defaults(handler=cmd_export)
+
+    history = commands.add_parser("import", parents=[output], help="import a check-in history (.csv, .jsonl, .gz)")
+    history.add_argument("path")
+    history.add_argument("--rejected", help="CSV report of the rejected records")
+    history.add_argument("--chunk-size", type=int, default=10000)
+    history.set_defaults(handler=cmd_import)
+    return parser
+
+
+def main(argv=None):
+    """Function to run one command; returns the exit code"""
+    args = build_parser().parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+    db = None
+    try:
+        db, cur = open_db(args.db)
+        result = args.handler(cur, db, args)
+    except CommandError as e:
+        print(e, file=sys.stderr)
+        return e.code
+    except sqlite3.Error as e:
+        if db is not None:
+            db.rollback()
+        print(f"An error occurred while running '{args.command}': {e}", file=sys.stderr)
+        return EXIT_FAILED
+    finally:
+        if db is not None:
+            db.close()
+    write_output(result, args.output or "json")
+    return EXIT_OK
+
+
+# Entry point for scripts, e.g. alias habit="python /path/to/modules/cli.py"
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,11 +5,40 @@ Functions will be called in the counter class.
 """
 
 import sqlite3
-from datetime import datetime, timedelta
-from analyze import show_predef_habits, show_custom_habits
-from db import add_counter
+from datetime import datetime
+from db import add_counter, mark_calendar_day, habit_period_key, add_measurement, rebuild_rollup, enqueue_event
+from habit_manager import ensure_user_habit
+from goal_manager import update_goal_progress, refresh_goals
+from periods import parse_interval, check_step
+import hooks
 
 ### Functions defining the update of the repetition and the streak counters
+
+# Streak lengths that create a milestone event in the outbox
+STREAK_MILESTONES = (7, 30, 100, 365)
+
+# Interval and streak state of a habit: interval code, week start, freeze allowance,
+# the state tuple (last period, checks in the last period, streak, freeze tokens, month of the last refill),
+# the goal per check-in of quantity-tracked habits and the date of the last check
+STATE_QUERY = """SELECT COALESCE(interval_code, habit_interval), week_start, freeze_allowance,
+                 last_period, period_count, cur_streak, freeze_tokens, freeze_month, goal, last_check FROM habits"""
+
+
+def save_streak_state(cur, user_id, habit_name, interval, check_date, state):
+    """
+    Function to store the streak state of a habit after a check (does not commit):
+    current and longest streak, last check, last period, checks in the last period, freeze tokens,
+    the last date on which a check keeps the streak alive and the first date on which the habit is due again
+    """
+    period, count, streak, tokens, refill_month = state
+    cur.execute("""UPDATE habits SET max_streak = MAX(COALESCE(max_streak, 0), ?), cur_streak = ?,
+                last_check = ?, last_period = ?, period_count = ?, streak_deadline = ?, next_due = ?,
+                freeze_tokens = ?, freeze_month = ?
+                WHERE user_id = ? AND habit_name = ?""",
+                (streak, streak, check_date, period, count, interval.deadline(period, count, tokens),
+                 interval.next_due(period, count), tokens, refill_month, user_id, habit_name))
+
+
 def increment_streak(cur, db, habit_name, user_id, manual=True):
     """
     Function that increments the streak counter of a habit with 
@@ -21,6 +50,7 @@ def increment_streak(cur, db, habit_name, user_id, manual=True):
         print("Note: Use this option only if a habit check was forgotten.")
        
         # Display all habits
+        from analyze import show_predef_habits, show_custom_habits  # pandas is only loaded for the menus
         predef_df = show_predef_habits(cur)           
         custom_df = show_custom_habits(cur, user_id) 
         if predef_df.empty and custom_df.empty:
@@ -48,41 +78,30 @@ def increment_streak(cur, db, habit_name, user_id, manual=True):
     check_date = now.strftime('%Y-%m-%d')  # Current date
     check_time = now.strftime('%H:%M:%S')  # Current time
 
-    # Get last streak value for manual=TRUE (incl. today), else: date < today
+    # Find out the habit's interval, its streak state and the period of today
+    cur.execute(STATE_QUERY + " WHERE habit_name = ? AND (user_id = ? OR is_custom = 0) ORDER BY user_id IS NULL LIMIT 1",
+                (habit_name, user_id))
+    row = cur.fetchone()
+    interval = parse_interval(row[0] if row else "D", row[1] if row else None)
+    allowance, state = (row[2], row[3:8]) if row else (0, (None, 0, 0, 0, None))
+    period = interval.period_of(now)
+
+    # Update streak counter according to the habit's interval
+    # Manual: Multiple streak increments at the same day possible, the period counts as completed
     if manual:
-        cur.execute("""SELECT habit_streak, check_date FROM counter WHERE habit_name = ? AND user_id = ?
+        cur.execute("""SELECT habit_streak FROM counter WHERE habit_name = ? AND user_id = ?
                     AND check_date <= date('now') ORDER BY check_date DESC LIMIT 1""", 
                     (habit_name, user_id)
                     )
+        last_record = cur.fetchone()
+        new_streak = (last_record[0] if last_record else 0) + 1
+        state = (period, interval.times, new_streak) + tuple(state[3:])
+    # Automatic increment: Continue in the following period (or bridge missed periods with freezes), else start again
+    # (a habit counts one check per day, like the rebuild from the history)
     else:
-        cur.execute("""SELECT habit_streak, check_date FROM counter WHERE habit_name = ? 
-                    AND user_id = ? AND check_date < ? ORDER BY check_date DESC LIMIT 1""",
-                    (habit_name, user_id, check_date)
-                    )
-
-    last_record = cur.fetchone()
-
-    if last_record:
-        last_streak, last_date = last_record
-        last_date = datetime.strptime(last_date, "%Y-%m-%d").date()
-    else:
-        last_streak, last_date = 0, None
-
-    # Find out the habit's interval
-    cur.execute("SELECT habit_interval FROM habits WHERE habit_name = ? AND (user_id = ? OR is_custom = 0)", (habit_name, user_id))
-    interval = cur.fetchone()
-
-    # Update streak counter according to the habit's interval
-    # Manual: Multiple streak increments at the same day possible:
-    if manual:
-         new_streak = last_streak + 1
-    # Automatic increment: Interval (daily vs. weekly) check:
-    elif interval and interval[0] == "Weekly" and last_date and last_date >= now.date() - timedelta(days=7):
-        new_streak = last_streak + 1
-    elif interval and interval[0] == "Daily"  and last_date and last_date >= now.date() - timedelta(days=1):
-        new_streak = last_streak + 1
-    else:
-        new_streak = 1
+        if not (row and row[9] == check_date):
+            _, state, _ = check_step(interval, allowance, state, now)
+        new_streak = state[2]
     
     # Update streak counter directly if manual or call add_counter function from db.py if automatic
     try:
@@ -90,35 +109,28 @@ def increment_streak(cur, db, habit_name, user_id, manual=True):
             # Manual Increment: streak +=1
             cur.execute(
                 """
-                INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak) 
-                VALUES (?, ?, ?, ?, 0, ?) ON CONFLICT(user_id, habit_name, check_date) DO UPDATE
+                INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak, period_key) 
+                VALUES (?, ?, ?, ?, 0, ?, ?) ON CONFLICT(user_id, habit_name, check_date) DO UPDATE
                 SET habit_streak = excluded.habit_streak
-                """, (user_id, habit_name, check_date, check_time, new_streak)
+                """, (user_id, habit_name, check_date, check_time, new_streak, period)
             )
+            mark_calendar_day(cur, user_id, habit_name, check_date)
             db.commit()
             print(f"***The streak for '{habit_name}' has been manually set to {new_streak}.***")
             
-            # Manual Increment: Update max streak
-            cur.execute(
-                "UPDATE habits "
-                "   SET max_streak = CASE WHEN max_streak < ? THEN ? ELSE max_streak END "
-                " WHERE user_id = ? AND habit_name = ?",
-                (new_streak, new_streak, user_id, habit_name)
-            )
+            # Manual Increment: Update max streak and current streak (and the goals of the new check day)
+            save_streak_state(cur, user_id, habit_name, interval, check_date, state)
+            refresh_goals(cur, user_id, habit_name)
             db.commit()            
             
         else:
-            # Automatic Increment: Called in check_habit and in increment_counter
-            add_counter(cur, db, user_id, habit_name, check_date, check_time, 0, new_streak)
+            # Automatic Increment: Called in increment_counter
+            add_counter(cur, db, user_id, habit_name, check_date, check_time, 0, new_streak, period_key=period)
             print(f"***The streak for '{habit_name}' has been incremented to {new_streak}.***")
             
-            # Automatic Increment: Update max streak
-            cur.execute(
-                "UPDATE habits "
-                "   SET max_streak = CASE WHEN max_streak < ? THEN ? ELSE max_streak END "
-                " WHERE user_id = ? AND habit_name = ?",
-                (new_streak, new_streak, user_id, habit_name)
-            )
+            # Automatic Increment: Update max streak and current streak (and the goals of the new check day)
+            save_streak_state(cur, user_id, habit_name, interval, check_date, state)
+            refresh_goals(cur, user_id, habit_name)
             db.commit()
             
     except sqlite3.Error as e:
@@ -136,6 +148,7 @@ def increment_counter(cur, db, habit_name, user_id, manual=True):
         print("Note: Use this option only if a habit check was forgotten.")
 
         #Display all habits
+        from analyze import show_predef_habits, show_custom_habits  # pandas is only loaded for the menus
         predef_df = show_predef_habits(cur)           
         custom_df = show_custom_habits(cur, user_id) 
         if predef_df.empty and custom_df.empty:
@@ -190,11 +203,14 @@ def increment_counter(cur, db, habit_name, user_id, manual=True):
         if manual:
             # Manual Increment: repetition counter +=1
             cur.execute("""
-                INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak) 
-                VALUES (?, ?, ?, ?, ?, 0) ON CONFLICT(user_id, habit_name, check_date) DO UPDATE
+                INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak, period_key) 
+                VALUES (?, ?, ?, ?, ?, 0, ?) ON CONFLICT(user_id, habit_name, check_date) DO UPDATE
                 SET habit_rep = excluded.habit_rep
-                """,(user_id, habit_name, check_date, check_time, new_rep)
+                """,(user_id, habit_name, check_date, check_time, new_rep,
+                     habit_period_key(cur, user_id, habit_name, check_date))
             )
+            mark_calendar_day(cur, user_id, habit_name, check_date)
+            refresh_goals(cur, user_id, habit_name)
             db.commit()
             print(f"***The number of repetitions of '{habit_name}' has been manually set to {new_rep}.***")
         else:
@@ -208,6 +224,156 @@ def increment_counter(cur, db, habit_name, user_id, manual=True):
         print(f"Error while incrementing counter for '{habit_name}': {e}")
 
 
+### Function to recompute the streaks of a habit from its history (e.g. after a bulk import)
+def recompute_streaks(cur, db, user_id, habit_name, commit=True):
+    """
+    Function that walks through all check dates of a habit in chronological order and
+    recomputes the period key and habit_streak of every counter record and max_streak of the habit
+    (e.g. after a bulk import or a change of the interval).
+    A new streak starts after a check-in with a manual streak reset (see reset_current_streak).
+    Returns the current streak. With commit=False an error is raised to the caller, which owns the transaction.
+    """
+    cur.execute(STATE_QUERY + " WHERE user_id = ? AND habit_name = ?", (user_id, habit_name))
+    row = cur.fetchone()
+    if not row:
+        return 0
+    interval = parse_interval(row[0], row[1])
+    allowance = row[2]
+
+    cur.execute("""SELECT check_date, streak_reset FROM counter WHERE user_id = ? AND habit_name = ?
+                ORDER BY check_date""", (user_id, habit_name))
+    updates, last_rows = [], []
+    state, max_streak, last_date = (None, 0, 0, 0, None), 0, None
+    for check_date, streak_reset in cur.fetchall():
+        # Same step as a check-in (record_check), including the freeze tokens
+        last_period = state[0]
+        status, state, _ = check_step(interval, allowance, state, check_date)
+        period = interval.period_of(check_date)
+        if status == "broken":
+            # The last checks of the previous streak are reset to 0
+            for index in last_rows:
+                updates[index] = (updates[index][0], 0) + updates[index][2:]
+        if status != "duplicate" and period != last_period:
+            last_rows = []
+        last_rows.append(len(updates))
+        max_streak = max(max_streak, state[2])
+        last_date = check_date
+        if streak_reset:
+            # Manual reset after this check-in: the streak continues from 0
+            state = state[:2] + (0,) + state[3:]
+        updates.append((period, state[2], user_id, habit_name, check_date))
+    streak = state[2]
+    try:
+        cur.executemany("""UPDATE counter SET period_key = ?, habit_streak = ?
+                        WHERE user_id = ? AND habit_name = ? AND check_date = ?""", updates)
+        cur.execute("UPDATE habits SET max_streak = MAX(COALESCE(max_streak, 0), ?) WHERE user_id = ? AND habit_name = ?",
+                    (max_streak, user_id, habit_name))
+        save_streak_state(cur, user_id, habit_name, interval, last_date, state)
+        if commit:
+            db.commit()
+    except sqlite3.Error as e:
+        if not commit:
+            raise
+        db.rollback()
+        print(f"An error occurred while recomputing the streaks of '{habit_name}': {e}")
+    return streak
+
+
+### Function to record a check-in in a single transaction
+def record_check(cur, db, user_id, habit_name, now=None, commit=True, quantity=None):
+    """
+    Function that records a check of a habit with one lookup of the habit state:
+    The check is rejected if the habit was already checked today (a day counts once, also for habits
+    with several checks per period, so the streaks can be rebuilt from the history, see recompute_streaks)
+    or often enough in the current period.
+    The streak continues if the previous period was completed or the missed periods can be bridged
+    with the freeze tokens of the habit, else the streak of the last checks is reset to 0 and a new streak starts.
+    Returns a dictionary with the status ('checked', 'duplicate', 'error' or 'not found'), the streak,
+    whether the streak was broken, the period key and the number of used freeze tokens
+    (for a successful check also the new streak deadline, e.g. to reschedule reminders).
+    The optional quantity (e.g. km or minutes) is stored with the check-in and added to the measurement rollups.
+    The progress of the open goals of the habit is updated in the same transaction,
+    which also writes a 'check' event (and a 'milestone' event for the streaks in STREAK_MILESTONES) into the outbox.
+    After the commit, the 'check' hooks are called (callers with commit=False emit the hook themselves
+    and receive database errors as exceptions, so they can roll back their whole transaction).
+    """
+    now = now or datetime.now()
+    check_date = now.strftime('%Y-%m-%d')
+    check_time = now.strftime('%H:%M:%S')
+
+    cur.execute(STATE_QUERY + " WHERE user_id = ? AND habit_name = ?", (user_id, habit_name))
+    row = cur.fetchone()
+    if not row:
+        return {"status": "not found", "streak": 0, "broken": False, "period": None, "freezes_used": 0}
+    interval = parse_interval(row[0], row[1])
+    last_period, cur_streak = row[3], row[5]
+    period = interval.period_of(now)
+    if row[9] == check_date:
+        return {"status": "duplicate", "streak": cur_streak or 0, "broken": False, "period": period,
+                "freezes_used": 0, "same_day": True}
+
+    # Period check, freeze tokens and streak continuation from the stored state of the habit
+    status, state, used = check_step(interval, row[2], row[3:8], now)
+    new_streak = state[2]
+    if status == "duplicate":
+        return {"status": "duplicate", "streak": new_streak, "broken": False, "period": period, "freezes_used": 0}
+    broken = status == "broken"
+    try:
+        # A counter record of today without a check-in (manual counter increment) is updated: its day is
+        # already counted by the goals, and it receives the quantity as well
+        cur.execute("SELECT quantity FROM counter WHERE user_id = ? AND habit_name = ? AND check_date = ?",
+                    (user_id, habit_name, check_date))
+        existing = cur.fetchone()
+        merged = existing[0] if existing and quantity is not None else None
+        if broken:
+            # Streak break: the last checks of the previous streak are reset to 0
+            cur.execute("UPDATE counter SET habit_streak = 0 WHERE user_id = ? AND habit_name = ? AND period_key = ?",
+                        (user_id, habit_name, last_period))
+        add_counter(cur, db, user_id, habit_name, check_date, check_time, 1, new_streak,
+                    period_key=period, commit=False, quantity=quantity)
+        if merged is not None:
+            # The rollups count one measurement (the sum) per day, like rebuild_rollup
+            rebuild_rollup(cur, db, user_id, habit_name, commit=False)
+        elif quantity is not None:
+            add_measurement(cur, user_id, habit_name, check_date, quantity, row[8], row[1])
+        update_goal_progress(cur, user_id, habit_name, check_date, new_streak, quantity, new_day=existing is None)
+        save_streak_state(cur, user_id, habit_name, interval, check_date, state)
+        event = {"habit_name": habit_name, "check_date": check_date, "check_time": check_time,
+                 "streak": new_streak, "broken": broken, "freezes_used": used, "quantity": quantity}
+        enqueue_event(cur, user_id, "check", event, now)
+        if new_streak in STREAK_MILESTONES and new_streak != (0 if broken else cur_streak or 0):
+            enqueue_event(cur, user_id, "milestone", {"habit_name": habit_name, "streak": new_streak}, now)
+        if commit:
+            db.commit()
+    except sqlite3.Error as e:
+        if not commit:
+            raise
+        db.rollback()
+        print(f"An error occurred while checking '{habit_name}': {e}")
+        return {"status": "error", "streak": cur_streak or 0, "broken": False, "period": period, "freezes_used": 0}
+    deadline = interval.deadline(state[0], state[1], state[3])
+    if commit:
+        hooks.emit("check", user_id=user_id, habit_name=habit_name, check_date=check_date, check_time=check_time,
+                   streak=new_streak, broken=broken, freezes_used=used, quantity=quantity, deadline=deadline)
+    return {"status": "checked", "streak": new_streak, "broken": broken, "period": period, "freezes_used": used,
+            "deadline": deadline}
+
+
+def ask_quantity(habit_name, unit):
+    """Function to ask for the measurement of a quantity-tracked habit; returns None if skipped"""
+    while True:
+        value = input(f"How many {unit} did you do for '{habit_name}'? Enter a number or press enter to skip: ").strip()
+        if not value:
+            return None
+        try:
+            quantity = float(value.replace(",", "."))
+            if quantity >= 0:
+                return quantity
+        except ValueError:
+            pass
+        print("Invalid input. Please enter a positive number.")
+
+
 ### Function to mark a habit as checked & automatically update counters
 def check_habit(cur, db, user_id):
     """
@@ -220,6 +386,7 @@ def check_habit(cur, db, user_id):
 
     try:
         # 1. Display all habits
+        from analyze import show_predef_habits, show_custom_habits  # pandas is only loaded for the menus
         predef_df = show_predef_habits(cur)           
         custom_df = show_custom_habits(cur, user_id) 
         if predef_df.empty and custom_df.empty:
@@ -244,93 +411,56 @@ def check_habit(cur, db, user_id):
 
         # 4. Fetch habit interval from database
         cur.execute(
-            "SELECT habit_interval FROM habits WHERE habit_name = ? AND (user_id = ? OR is_custom = 0)",
+            """SELECT COALESCE(interval_code, habit_interval), week_start, unit FROM habits
+            WHERE habit_name = ? AND (user_id = ? OR is_custom = 0) ORDER BY user_id IS NULL LIMIT 1""",
             (habit_name, user_id)
         )
         row = cur.fetchone()
         if not row:
             print(f"Habit '{habit_name}' not found in database.")
             return
-        habit_interval = row[0]
+        interval = parse_interval(row[0], row[1])
+        unit = row[2]
 
         # 5. Setup current date
         now = datetime.now()
         check_date = now.strftime('%Y-%m-%d')  # Current date
-        check_time = now.strftime('%H:%M:%S')  # Current time
         
         # 6. Make counter entry only when habit entry exists (foreign key check)
-        cur.execute(
-            "SELECT 1 FROM habits WHERE user_id = ? AND habit_name = ?",
-            (user_id, habit_name)
-        )
-        if not cur.fetchone():
-            cur.execute(       
-                """
-                INSERT INTO habits (
-                    user_id, habit_name, habit_def,
-                    habit_type, habit_interval, is_custom
-                )
-                SELECT ?, habit_name, habit_def,
-                       habit_type, habit_interval, 0
-                  FROM habits
-                 WHERE is_custom = 0
-                   AND habit_name = ?
-                """,
-                (user_id, habit_name)
-            )
-            db.commit()
+        ensure_user_habit(cur, user_id, habit_name)
+        db.commit()
 
         # 7. Ask user for confirmation of habit period
-        if habit_interval == "Daily":
+        if interval.code == "D":
             print(f"Did you practice '{habit_name}' today ({check_date})?") 
-            check_input = input("Please type 'Y' for yes or 'N' for no: ").lower()
-        elif habit_interval == "Weekly":
-            print(f"Did you practice '{habit_name}' in the past week or today ({check_date})?")
-            check_input = input("Please type 'Y' for yes or 'N' for no: ").lower()
+        elif interval.code == "W":
+            print(f"Did you practice '{habit_name}' this week ({check_date})?")
         else:
-            raise ValueError("Invalid periodicity. Neither 'Daily' nor 'Weekly'.")
-
-
-        if check_input == "y": 
-        # 8. Make sure: Only 1 check per day/week
-            cur.execute(
-            "SELECT check_date FROM counter WHERE user_id = ? AND habit_name = ? "
-            "ORDER BY check_date DESC LIMIT 1",
-            (user_id, habit_name)
-            )
-            last = cur.fetchone()
-            if last:
-                last_date = datetime.strptime(last[0], "%Y-%m-%d").date()
-                if habit_interval == "Daily" and last_date == now.date():
+            print(f"Did you practice '{habit_name}' ({interval.label}) today ({check_date})?")
+        check_input = input("Please type 'Y' for yes or 'N' for no: ").lower()
+
+        if check_input == "y":
+        # 8. Record the check: duplicate period check, streak-break detection and counter update
+            quantity = ask_quantity(habit_name, unit) if unit else None
+            result = record_check(cur, db, user_id, habit_name, now, quantity=quantity)
+            if result["status"] == "duplicate":
+                if interval.code == "D" or result.get("same_day"):
                     print(f"You've already checked '{habit_name}' today. "
                           "It is not possible to check it more than once per day.")
-                    return
-                if habit_interval == "Weekly" and last_date >= now.date() - timedelta(days=7):
+                elif interval.code == "W":
                     print(f"You've already checked '{habit_name}' this week. "
                           "If you need more granularity, please change the habit interval in menu 2-3.")
-                    return
-
-        # 9. Automatic streak‑break detection with eventual streak reset to 0
-            cur.execute(
-                "SELECT check_date FROM counter WHERE habit_name = ? AND user_id = ? "
-                "ORDER BY check_date DESC LIMIT 1",
-                (habit_name, user_id)
-            )
-            last = cur.fetchone()
-            if last:
-                last_date = datetime.strptime(last[0], '%Y-%m-%d').date()
-                if ((habit_interval == "Daily" and last_date < now.date() - timedelta(days=1)) or
-                    (habit_interval == "Weekly" and last_date < now.date() - timedelta(days=7))):
-                    print(f"The streak for '{habit_name}' was broken. Resetting streak counter to 0.")
-                    cur.execute(
-                        "UPDATE counter SET habit_streak = 0 "
-                        "WHERE habit_name = ? AND user_id = ? AND check_date = ?",
-                        (habit_name, user_id, last[0])
-                    )
-                    db.commit()
-
-        # 10. Call increment_counter function to increment counter & streak
-            increment_counter(cur, db, habit_name, user_id, manual=False)
+                else:
+                    print(f"You've already checked '{habit_name}' as often as needed in the current period "
+                          f"({interval.label}).")
+                return
+            if result["status"] != "checked":
+                return
+            if result["broken"]:
+                print(f"The streak for '{habit_name}' was broken. Resetting streak counter to 0.")
+            if result["freezes_used"]:
+                print(f"{result['freezes_used']} streak freeze(s) of '{habit_name}' were used to keep your streak.")
+            print(f"***The streak for '{habit_name}' has been incremented to {result['streak']}.***")
             print(f"***The habit '{habit_name}' was successfully marked as checked.***")
 
         else:
@@ -342,6 +472,28 @@ def check_habit(cur, db, user_id):
 
 
 ### Functions to manually reset the streak or repetion counter of a given habit
+def reset_current_streak(cur, user_id, habit_name):
+    """
+    Function to reset the current streak of a habit to 0 (does not commit).
+    The most recent check-in is marked with streak_reset, so the next check starts a new streak
+    and recompute_streaks starts a new streak after it as well.
+    """
+    cur.execute(
+        """
+        UPDATE counter
+           SET habit_streak = 0, streak_reset = 1
+         WHERE rowid = (
+             SELECT rowid
+               FROM counter
+              WHERE user_id = ? AND habit_name = ?
+              ORDER BY check_date DESC, check_time DESC
+              LIMIT 1
+         )
+        """, (user_id, habit_name)
+    )
+    cur.execute("UPDATE habits SET cur_streak = 0 WHERE user_id = ? AND habit_name = ?", (user_id, habit_name))
+
+
 def reset_streak(cur, db, habit_name, user_id):
     """
         Function to allow manual reset of the streak of a given habit by the user
@@ -349,6 +501,7 @@ def reset_streak(cur, db, habit_name, user_id):
     print("\nWith this option you can reset a habit's streak counter to 0")
     try:
         # Display habits
+        from analyze import show_predef_habits, show_custom_habits  # pandas is only loaded for the menus
         predef_df = show_predef_habits(cur)           
         custom_df = show_custom_habits(cur, user_id) 
         if predef_df.empty and custom_df.empty:
@@ -374,20 +527,9 @@ def reset_streak(cur, db, habit_name, user_id):
                     habit_name = names[idx] 
                     
                     # Reset the most recent record, keep history
-                    cur.execute(
-                        """
-                        UPDATE counter
-                           SET habit_streak = 0
-                         WHERE rowid = (
-                             SELECT rowid
-                               FROM counter
-                              WHERE user_id = ? AND habit_name = ?
-                              ORDER BY check_date DESC, check_time DESC
-                              LIMIT 1
-                         )
-                        """, (user_id, habit_name)
-                    )
+                    reset_current_streak(cur, user_id, habit_name)
                     db.commit()                   
+                    hooks.emit("reset_streak", user_id=user_id, habit_name=habit_name)
                     
                     print(f"***The streak for '{habit_name}' has been successfully reset to 0.***")
                     return
@@ -411,6 +553,7 @@ def reset_rep(cur, db, user_id):
     print("\nWith this option you can reset a habit's repetition counter to 0.")
     try:
         # Display habits
+        from analyze import show_predef_habits, show_custom_habits  # pandas is only loaded for the menus
         predef_df = show_predef_habits(cur)           
         custom_df = show_custom_habits(cur, user_id) 
         if predef_df.empty and custom_df.empty:
@@ -444,6 +587,7 @@ def reset_rep(cur, db, user_id):
                         (habit_name, user_id)
                     )
                     db.commit()
+                    hooks.emit("reset_rep", user_id=user_id, habit_name=habit_name)
                     print(f"***The repetition counter for '{habit_name}' has been successfully reset to 0.***")
                     return
                 else:
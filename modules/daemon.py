@@ -0,0 +1,441 @@
+"""
+This file contains the habit tracker daemon: a long-running asyncio server on a Unix domain socket for kiosks and
+automation. In contrast to a call of cli.py per command, the daemon keeps its modules loaded, a pool of open
+database connections (see db_pool.py) and caches of the validated sessions and habit names.
+The protocol is JSON Lines: every request is one JSON object on one line, e.g.
+    {"id": 1, "op": "auth", "token": "<session token>"}
+    {"id": 2, "op": "check", "habit": "Yoga"}
+    {"id": 3, "op": "stats"}
+    {"id": 4, "op": "due", "risk_days": 1}
+and every response is one line with the id of its request, ok, the result (or the error) and the duration in ms:
+    {"id": 2, "ok": true, "result": {"habit_name": "Yoga", "status": "checked", ...}, "ms": 1.8}
+A client authenticates once per connection (auth with a session token or login with user name and password);
+a request can also carry its own token. The requests of one connection are answered in order.
+Blocking SQLite work runs on a bounded thread pool (one database connection per thread) and at most
+max_pending requests wait for it or run. A request that times out cannot be stopped on its worker thread: it keeps
+its place in max_pending until it is done, the response says that it is still running (running: true) and the next
+request of the connection waits for its outcome, so a retry sees a check-in that was committed late.
+The late outcomes are counted in server_stats under 'late'.
+SIGINT and SIGTERM shut the daemon down gracefully: no new connections are accepted, running requests are completed
+and the socket file is removed.
+Run: python daemon.py serve, load test: python daemon.py loadtest (uses the session of the last login).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+import sessions
+from cli import CommandError, resolve_habit, get_stats
+from counter_manager import record_check
+from db_pool import ConnectionPool
+from due import get_due_habits
+from habit_manager import ensure_user_habit
+from user_manager import verify_login
+
+# Socket file of the daemon
+DEFAULT_SOCKET = os.environ.get("HABIT_SOCKET", "habit.sock")
+
+# Seconds a validated session is trusted without a new lookup (a revocation takes effect after this time)
+SESSION_CACHE_SECONDS = 60
+
+# Longest accepted request line in bytes
+MAX_LINE = 64 * 1024
+
+
+### Operations (run on a worker thread with a connection of the pool)
+
+def op_ping(daemon, db, user_id, request):
+    """Operation to check that the daemon is alive"""
+    return "pong"
+
+
+def op_check(daemon, db, user_id, request):
+    """Operation to check a habit now (optional quantity)"""
+    cur = db.cursor()
+    quantity = request.get("quantity")
+    quantity = None if quantity is None else float(quantity)
+    habit_name = daemon.habit_name(cur, user_id, request.get("habit"))
+    ensure_user_habit(cur, user_id, habit_name)
+    result = record_check(cur, db, user_id, habit_name, quantity=quantity)
+    if result["status"] in ("not found", "error"):
+        daemon.habit_names.pop((user_id, str(request.get("habit")).strip().lower()), None)
+        raise CommandError(f"The check of '{habit_name}' failed ({result['status']}).")
+    return {"habit_name": habit_name, **result}
+
+
+def op_stats(daemon, db, user_id, request):
+    """Operation to return the statistics of the habits of the user (optional habit)"""
+    cur = db.cursor()
+    habit_name = daemon.habit_name(cur, user_id, request["habit"]) if request.get("habit") else None
+    return get_stats(cur, user_id, habit_name)
+
+
+def op_due(daemon, db, user_id, request):
+    """Operation to return the due habits of the user (optional risk_days)"""
+    return get_due_habits(db.cursor(), user_id, risk_days=int(request.get("risk_days") or 0))
+
+
+# Operations that need an authenticated user
+OPERATIONS = {"ping": op_ping, "check": op_check, "stats": op_stats, "due": op_due}
+
+# All operations of the protocol (the timings are collected per operation)
+KNOWN_OPERATIONS = set(OPERATIONS) | {"auth", "login", "server_stats"}
+
+
+class HabitDaemon:
+    """
+    Asyncio server of the habit tracker on a Unix domain socket.
+
+    :param db_path: Path of the database file
+    :param socket_path: Path of the Unix domain socket
+    :param workers: Number of worker threads (and database connections)
+    :param max_pending: Maximum number of requests that wait for or run on a worker thread
+    :param request_timeout: Seconds until a request is answered with a timeout error
+    :param reminders: Optional ReminderScheduler (see reminders.py): loaded at the start and
+                      rescheduled by the check-ins of the daemon
+    """
+
+    NAME = "habit tracker daemon"
+
+    def __init__(self, db_path="main_db.db", socket_path=DEFAULT_SOCKET, workers=4, max_pending=64,
+                 request_timeout=10.0, reminders=None):
+        self.db_path = db_path
+        self.socket_path = socket_path
+        self.address = socket_path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.reminders = reminders
+        self.pool = None
+        self.executor = None
+        self.server = None
+        self.pending = None
+        self.stopped = None
+        self.closing = False
+        self.clients = {}  # task -> client state
+        self.sessions = {}  # token -> (user ID, monotonic time of the validation)
+        self.habit_names = {}  # (user ID, lower-case name) -> stored habit name
+        self.timings = {}  # operation -> [requests, errors, total ms, max ms]
+        self.late = {"running": 0, "completed": 0, "failed": 0}  # requests that timed out
+
+    ### Caches (used on the worker threads)
+
+    def session_user(self, cur, token):
+        """Method to return the user of a session token (cached for SESSION_CACHE_SECONDS)"""
+        cached = self.sessions.get(token)
+        if cached and time.monotonic() - cached[1] < SESSION_CACHE_SECONDS:
+            return cached[0]
+        user_id = sessions.validate_session(cur, token)
+        if user_id:
+            self.sessions[token] = (user_id, time.monotonic())
+        else:
+            self.sessions.pop(token, None)
+        return user_id
+
+    def habit_name(self, cur, user_id, name):
+        """Method to return the stored name of a habit of the user (cached)"""
+        if not name:
+            raise CommandError("The request needs a habit.")
+        key = (user_id, str(name).strip().lower())
+        if key not in self.habit_names:
+            self.habit_names[key] = resolve_habit(cur, user_id, str(name))
+        return self.habit_names[key]
+
+    ### Requests
+
+    def run_request(self, state, request):
+        """Method that runs one request on a worker thread; returns the result"""
+        op = request.get("op")
+        with self.pool.connection() as db:
+            if op == "login":
+                user_id = verify_login(db.cursor(), db, str(request.get("identifier", "")),
+                                       str(request.get("password", "")), "daemon")
+                if not user_id:
+                    raise CommandError("Login failed.")
+                token = sessions.create_session(db.cursor(), db, user_id)
+                state["user_id"] = user_id
+                return {"user_id": user_id, "token": token}
+            if op == "auth" or request.get("token"):
+                user_id = self.session_user(db.cursor(), str(request.get("token", "")))
+                if not user_id:
+                    raise CommandError("Invalid or expired session.")
+                state["user_id"] = user_id
+                if op == "auth":
+                    return {"user_id": user_id}
+            if op not in OPERATIONS:
+                raise CommandError(f"Unknown operation '{op}'.")
+            if not state.get("user_id"):
+                raise CommandError("Not authenticated. Please send 'auth' with a session token first.")
+            return OPERATIONS[op](self, db, state["user_id"], request)
+
+    def finish_late(self, future):
+        """Method to count the outcome of a request that timed out (called when its worker is done)"""
+        self.late["running"] -= 1
+        self.late["failed" if future.cancelled() or future.exception() else "completed"] += 1
+
+    async def run_worker(self, state, func, *args):
+        """
+        Method to run func(*args) on a worker thread for a client within the bound of max_pending requests.
+        A request that times out (asyncio.TimeoutError) keeps its place until its worker is done and is stored
+        as state["late"]: the next request of the client waits for it first. Returns the result of func.
+        """
+        late = state.get("late")
+        if late is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(late), self.request_timeout)
+            except asyncio.TimeoutError:
+                raise CommandError("An earlier request that timed out is still running. "
+                                   "Please try again later.") from None
+            except Exception:
+                pass  # the outcome of the earlier request is counted in self.late
+            state["late"] = None
+        loop = asyncio.get_running_loop()
+        await self.pending.acquire()
+        future = loop.run_in_executor(self.executor, func, *args)
+        future.add_done_callback(lambda done: self.pending.release())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.request_timeout)
+        except asyncio.TimeoutError:
+            self.late["running"] += 1
+            future.add_done_callback(self.finish_late)
+            state["late"] = future
+            raise
+
+    async def handle_request(self, state, line):
+        """Method to answer one request line; returns the response dictionary"""
+        start = time.perf_counter()
+        request_id, op = None, "invalid"
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("The request must be a JSON object.")
+            request_id, op = request.get("id"), str(request.get("op"))
+            if op == "server_stats":
+                result = self.server_stats()
+            else:
+                result = await self.run_worker(state, self.run_request, state, request)
+            response = {"id": request_id, "ok": True, "result": result}
+        except asyncio.TimeoutError:
+            response = {"id": request_id, "ok": False, "running": True,
+                        "error": "The request timed out. It is still running and may still be applied."}
+        except (CommandError, ValueError, TypeError) as e:
+            response = {"id": request_id, "ok": False, "error": str(e)}
+        except sqlite3.Error as e:
+            response = {"id": request_id, "ok": False, "error": f"A database error occurred: {e}"}
+        ms = (time.perf_counter() - start) * 1000
+        timing = self.timings.setdefault(op if op in KNOWN_OPERATIONS else "invalid", [0, 0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += not response["ok"]
+        timing[2] += ms
+        timing[3] = max(timing[3], ms)
+        response["ms"] = round(ms, 3)
+        return response
+
+    async def handle_client(self, reader, writer):
+        """Method that serves one client connection until it is closed or the daemon shuts down"""
+        state = {"user_id": None, "busy": False, "writer": writer}
+        self.clients[asyncio.current_task()] = state
+        try:
+            while not self.closing:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break  # line longer than MAX_LINE or connection reset
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                state["busy"] = True
+                response = await self.handle_request(state, line)
+                writer.write((json.dumps(response, default=str) + "\n").encode("utf-8"))
+                await writer.drain()
+                state["busy"] = False
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(asyncio.current_task(), None)
+            writer.close()
+
+    def server_stats(self):
+        """
+        Method to return the number of requests, errors and the mean and maximum duration per operation
+        (and the outcomes of the requests that timed out under 'late')
+        """
+        stats = {op: {"requests": count, "errors": errors, "mean_ms": round(total / count, 3), "max_ms": round(peak, 3)}
+                 for op, (count, errors, total, peak) in self.timings.items()}
+        if any(self.late.values()):
+            stats["late"] = dict(self.late)
+        return stats
+
+    ### Start and shutdown
+
+    def open_resources(self):
+        """Method to open the connection pool and the worker threads (and to start the reminders)"""
+        self.pool = ConnectionPool(self.db_path, self.workers)
+        if self.reminders is not None:
+            with self.pool.connection() as db:
+                self.reminders.load(db.cursor())
+            self.reminders.subscribe()
+            self.reminders.start()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="habit-daemon")
+        self.pending = asyncio.Semaphore(self.max_pending)
+        self.stopped = asyncio.Event()
+        self.closing = False
+
+    async def start(self):
+        """Method to open the connection pool and listen on the socket"""
+        self.open_resources()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # socket file of a daemon that was not shut down
+        self.server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path, limit=MAX_LINE)
+        os.chmod(self.socket_path, 0o600)
+
+    def stop(self):
+        """Method to request the shutdown (e.g. from a signal handler)"""
+        if self.stopped is not None:
+            self.stopped.set()
+
+    async def shutdown(self, grace=5.0):
+        """Method to stop accepting connections, complete the running requests and release all resources"""
+        self.closing = True
+        self.server.close()
+        for state in list(self.clients.values()):
+            if not state["busy"]:
+                state["writer"].close()  # idle clients get EOF, busy clients close after their response
+        tasks = list(self.clients)
+        if tasks:
+            done, running = await asyncio.wait(tasks, timeout=grace)
+            for task in running:
+                task.cancel()
+        await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+        if self.reminders is not None:
+            self.reminders.stop()
+            self.reminders.unsubscribe()
+        self.pool.close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    async def serve(self):
+        """Method to run the daemon until SIGINT or SIGTERM"""
+        await self.start()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stop)
+        print(f"The {self.NAME} is listening on '{self.address}'.")
+        await self.stopped.wait()
+        await self.shutdown()
+        print(f"The {self.NAME} was shut down.")
+
+
+### Clients
+
+class DaemonClient:
+    """Asyncio client of the daemon (one connection, requests are answered in order)"""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self.reader = None
+        self.writer = None
+        self.next_id = 0
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_unix_connection(self.socket_path, limit=MAX_LINE)
+        return self
+
+    async def request(self, op, **fields):
+        """Method to send one request and return the response dictionary"""
+        self.next_id += 1
+        self.writer.write((json.dumps({"id": self.next_id, "op": op, **fields}) + "\n").encode("utf-8"))
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("The daemon closed the connection.")
+        return json.loads(line)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+def call(op, socket_path=DEFAULT_SOCKET, **fields):
+    """Function to send one request without asyncio (e.g. from a shell script); returns the response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall((json.dumps({"id": 1, "op": op, **fields}) + "\n").encode("utf-8"))
+        with client.makefile("r", encoding="utf-8") as answer:
+            return json.loads(answer.readline())
+
+
+async def load_test(socket_path, token, requests=1000, concurrency=10, op="stats", **fields):
+    """
+    Function to measure the daemon with concurrent clients: every client authenticates once and sends
+    its share of the requests one after the other.
+    Returns the number of requests and errors, the throughput and the p50/p99/max latency in ms.
+    """
+    latencies, errors = [], 0
+
+    async def run_client(count):
+        nonlocal errors
+        client = await DaemonClient(socket_path).connect()
+        try:
+            if not (await client.request("auth", token=token))["ok"]:
+                raise ConnectionError("The session token was rejected.")
+            for _ in range(count):
+                begin = time.perf_counter()
+                response = await client.request(op, **fields)
+                latencies.append((time.perf_counter() - begin) * 1000)
+                errors += not response["ok"]
+        finally:
+            await client.close()
+
+    shares = [requests // concurrency + (number < requests % concurrency) for number in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(count) for count in shares if count))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(latencies) / seconds, 1) if seconds else 0,
+        "p50_ms": round(latencies[len(latencies) // 2], 3) if latencies else 0,
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3) if latencies else 0,
+        "max_ms": round(latencies[-1], 3) if latencies else 0,
+    }
+
+
+# Operators start the daemon or a load test directly
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Habit tracker daemon on a Unix domain socket.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="socket file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the daemon until SIGINT or SIGTERM")
+    serve.add_argument("--db", default="main_db.db")
+    serve.add_argument("--workers", type=int, default=4)
+    serve.add_argument("--max-pending", type=int, default=64)
+    serve.add_argument("--reminders", nargs="?", const="stdout", metavar="SINK",
+                       help="send streak reminders to a sink: 'stdout' (default), a .jsonl file, 'host:port' or a socket")
+    test = commands.add_parser("loadtest", help="send requests with concurrent clients")
+    test.add_argument("--requests", type=int, default=1000)
+    test.add_argument("--concurrency", type=int, default=10)
+    test.add_argument("--op", default="stats", choices=sorted(OPERATIONS))
+    test.add_argument("--habit", help="habit of the check or stats requests")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        from reminders import ReminderScheduler, make_sink
+        scheduler = ReminderScheduler(make_sink(args.reminders)) if args.reminders else None
+        asyncio.run(HabitDaemon(args.db, args.socket, args.workers, args.max_pending, reminders=scheduler).serve())
+    else:
+        extra = {"habit": args.habit} if args.habit else {}
+        report = asyncio.run(load_test(args.socket, sessions.load_token(), args.requests, args.concurrency,
+                                       args.op, **extra))
+        print(json.dumps(report))
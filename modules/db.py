@@ -4,16 +4,44 @@ User - Habit - Counter. It is initialized in the main.py.
 The habit and the counter tables will make use of foreign keys to reference data of the other two respective tables. 
 The counter table uses a UNIQUE constraint. In combination with INSERT INTO... ON CONFLICT... DO UPDATE... in add_counter
 duplicates are avoided and automatic updates encouraged. Furthermore, there will be various functions that involve the database.
+The habit_calendar table stores one 366-bit bitmap per user, habit and year which is updated on every check-in.
+Every counter record stores the key of its calendar period (see periods.py), which is indexed for
+duplicate-period checks and streak continuation.
+Habits with a unit store a measurement per check-in (counter.quantity). The measure_rollup table keeps
+the count, sum, minimum, maximum and the number of reached goals per day, week and month,
+which is updated with every measurement. The goals table stores the goals of the users with their progress.
+The user table separates the immutable internal key (user_id, referenced by all other tables) from the
+visible login ID (login_id), so a change of the login ID only updates one row.
+Deleted accounts are only marked (user.deleted_at) and hidden from login and analytics;
+their data is deleted in small batches by the background purger (see purger.py).
+Every change of the habits, check-ins or goals of a user increments user.data_version (triggers),
+which identifies the state of the data of a user, e.g. for the ETags of the HTTP API (see http_api.py).
+Bulk changes (import, batch, purge) pause the triggers of their users (data_version_pause) and
+increment the version once per transaction instead of once per row.
+The sessions table stores the hashes of the signed session tokens of logged-in users (see sessions.py).
+The outbox table is a transactional outbox: events (e.g. check-ins and streak milestones) are written
+in the same transaction as the check-in and delivered later by a background worker (see outbox.py).
+create_tables stores the schema version in PRAGMA user_version, so short-lived processes (e.g. the CLI)
+only run the migration if the database is older than the program.
 """
 
 import sqlite3
 import logging
 import os
+import json
 from datetime import datetime
+from heatmap import day_index, set_day, bitmap_from_dates
+from periods import period_key as compute_period_key, parse_interval
 
 # Log configuration for error handling
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Users whose accounts were deleted but not purged yet (excluded from analytics across users)
+DELETED_USERS = "SELECT user_id FROM user WHERE deleted_at IS NOT NULL"
+
+# Version of the schema of create_tables and upgrade_tables (increment with every change of the tables)
+SCHEMA_VERSION = 1
+
 # Central variable for database connection
 db_connection = None  
 
@@ -29,6 +57,8 @@ def get_db(name="main_db.db"):
             db_connection = sqlite3.connect(name)
             # Activate use of foreign key constraints 
             db_connection.execute("PRAGMA foreign_keys = ON")
+            # Write-ahead log: readers (e.g. admin_analyze workers) do not block writers
+            db_connection.execute("PRAGMA journal_mode = WAL")
             logging.info(f"Database '{name}' connection was successful")
         except sqlite3.Error as e:
             logging.error(f"The database connection failed: {e}")
@@ -55,7 +85,11 @@ def create_tables(cur, db):
         cur.execute("""CREATE TABLE IF NOT EXISTS user (
                         user_id TEXT PRIMARY KEY,
                         user_name TEXT NOT NULL,
-                        user_pwd TEXT NOT NULL)
+                        user_pwd TEXT NOT NULL,
+                        login_id TEXT,
+                        deleted_at TEXT,
+                        data_version INTEGER NOT NULL DEFAULT 0,
+                        week_start INTEGER)
                     """)
 
         # Create Habits Table
@@ -68,6 +102,19 @@ def create_tables(cur, db):
                         habit_interval TEXT,
                         is_custom BOOLEAN DEFAULT 1,
                         max_streak   INTEGER DEFAULT 0,
+                        cur_streak   INTEGER DEFAULT 0,
+                        last_check   TEXT,
+                        last_period  INTEGER,
+                        week_start   INTEGER,
+                        interval_code TEXT,
+                        period_count INTEGER DEFAULT 0,
+                        streak_deadline TEXT,
+                        next_due TEXT,
+                        freeze_allowance INTEGER DEFAULT 0,
+                        freeze_tokens INTEGER DEFAULT 0,
+                        freeze_month INTEGER,
+                        unit TEXT,
+                        goal REAL,
                         PRIMARY KEY (user_id, habit_name),
                         FOREIGN KEY (user_id) REFERENCES user (user_id) ON DELETE CASCADE)
                     """)
@@ -80,11 +127,100 @@ def create_tables(cur, db):
                        check_time TEXT,
                        habit_rep INTEGER DEFAULT 0,
                        habit_streak INTEGER DEFAULT 0,
+                       period_key INTEGER,
+                       quantity REAL,
+                       streak_reset INTEGER DEFAULT 0,
                        PRIMARY KEY (user_id, habit_name, check_date, check_time),
                        UNIQUE (user_id, habit_name, check_date),
                        FOREIGN KEY (user_id) REFERENCES user (user_id) ON DELETE CASCADE,
                        FOREIGN KEY (user_id, habit_name) REFERENCES habits (user_id, habit_name) ON DELETE CASCADE)
                    """)
+
+        # Create Calendar Table (one bitmap with a bit per day of the year)
+        cur.execute("""CREATE TABLE IF NOT EXISTS habit_calendar (
+                       user_id TEXT,
+                       habit_name TEXT,
+                       year INTEGER,
+                       days BLOB NOT NULL,
+                       PRIMARY KEY (user_id, habit_name, year),
+                       FOREIGN KEY (user_id, habit_name) REFERENCES habits (user_id, habit_name) ON DELETE CASCADE)
+                   """)
+        # Create Measurement Rollup Table (aggregates of the measurements per day 'D', week 'W' and month 'M')
+        cur.execute("""CREATE TABLE IF NOT EXISTS measure_rollup (
+                       user_id TEXT,
+                       habit_name TEXT,
+                       grain TEXT,
+                       bucket INTEGER,
+                       n INTEGER NOT NULL,
+                       total REAL NOT NULL,
+                       min_value REAL,
+                       max_value REAL,
+                       goal_hits INTEGER DEFAULT 0,
+                       PRIMARY KEY (user_id, habit_name, grain, bucket),
+                       FOREIGN KEY (user_id, habit_name) REFERENCES habits (user_id, habit_name) ON DELETE CASCADE)
+                       WITHOUT ROWID
+                   """)
+        # Create Goals Table (progress is updated with every check-in)
+        cur.execute("""CREATE TABLE IF NOT EXISTS goals (
+                       goal_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       user_id TEXT NOT NULL,
+                       habit_name TEXT NOT NULL,
+                       goal_type TEXT NOT NULL,
+                       target REAL NOT NULL,
+                       start_date TEXT NOT NULL,
+                       end_date TEXT,
+                       progress REAL DEFAULT 0,
+                       completed_date TEXT,
+                       FOREIGN KEY (user_id, habit_name) REFERENCES habits (user_id, habit_name) ON DELETE CASCADE)
+                   """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_goals_habit ON goals (user_id, habit_name)")
+        # Create Outbox Table (status: 'pending', 'processing', 'done' or 'failed'; times as 'YYYY-MM-DD HH:MM:SS')
+        cur.execute("""CREATE TABLE IF NOT EXISTS outbox (
+                       event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       user_id TEXT,
+                       event_type TEXT NOT NULL,
+                       payload TEXT NOT NULL,
+                       created_at TEXT NOT NULL,
+                       available_at TEXT NOT NULL,
+                       status TEXT NOT NULL DEFAULT 'pending',
+                       attempts INTEGER DEFAULT 0,
+                       claimed_at TEXT,
+                       processed_at TEXT,
+                       last_error TEXT)
+                   """)
+        # Outbox index: the worker claims the oldest available events and purges old ones by range scans
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status, available_at)")
+        # Outbox user index: the events of a deleted account are purged with it
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_outbox_user ON outbox (user_id)")
+        # Create Sessions Table (only the SHA-256 hash of a session token is stored)
+        cur.execute("""CREATE TABLE IF NOT EXISTS sessions (
+                       token_hash TEXT PRIMARY KEY,
+                       user_id TEXT NOT NULL,
+                       created_at TEXT NOT NULL,
+                       expires_at TEXT NOT NULL,
+                       revoked_at TEXT,
+                       FOREIGN KEY (user_id) REFERENCES user (user_id) ON DELETE CASCADE)
+                   """)
+        # Create Data Version Pause Table (users whose bulk change increments the data version once, see
+        # pause_data_version; the rows only exist within the transaction of the bulk change)
+        cur.execute("CREATE TABLE IF NOT EXISTS data_version_pause (user_id TEXT PRIMARY KEY)")
+        # Session indexes: revocation per user and the sweep of expired sessions are range scans
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions (expires_at)")
+        upgrade_tables(cur, db)
+
+        # Leaderboard indexes: top-k reads are index range scans (per habit and over all habits)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_habits_max_streak ON habits (habit_name, max_streak DESC, user_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_habits_cur_streak ON habits (habit_name, cur_streak DESC, user_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_habits_max_streak_all ON habits (max_streak DESC, user_id, habit_name)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_habits_cur_streak_all ON habits (cur_streak DESC, user_id, habit_name)")
+
+        # Due index: habits that are due at a date are one range scan (all users or one user)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_habits_due ON habits (next_due, user_id)")
+
+        # Period index: duplicate check (same period) and streak continuation (previous period)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_counter_period ON counter (user_id, habit_name, period_key)")
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         db.commit()
         logging.info("The tables were successfully created.")
     except sqlite3.Error as e:
@@ -92,6 +228,127 @@ def create_tables(cur, db):
         logging.error(f"An error occurred while creating tables: {e}")
         
 
+def add_missing_columns(cur, table, columns):
+    """
+    Function to add columns to an existing table if they do not exist yet.
+    Returns the names of the added columns.
+
+    :param table: Name of the table
+    :param columns: Dictionary of column names and their definitions
+    """
+    cur.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cur.fetchall()}
+    added = []
+    for name, definition in columns.items():
+        if name not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            added.append(name)
+    return added
+
+
+def upgrade_tables(cur, db):
+    """
+    Function to bring the data of an existing database up to date.
+    Called in create_tables, so it must be safe to run on every start.
+    """
+    # Add the streak state of a habit (current streak and date of the last check)
+    added = add_missing_columns(cur, "habits", {"cur_streak": "INTEGER DEFAULT 0", "last_check": "TEXT"})
+    if "last_check" in added:
+        cur.execute("""UPDATE habits SET 
+                    last_check = (SELECT MAX(check_date) FROM counter AS c
+                                  WHERE c.user_id = habits.user_id AND c.habit_name = habits.habit_name),
+                    cur_streak = COALESCE((SELECT habit_streak FROM counter AS c
+                                  WHERE c.user_id = habits.user_id AND c.habit_name = habits.habit_name
+                                  ORDER BY check_date DESC, check_time DESC LIMIT 1), 0)
+                    WHERE user_id IS NOT NULL""")
+
+    # Add the visible login ID of the users (the internal user_id never changes)
+    if "login_id" in add_missing_columns(cur, "user", {"login_id": "TEXT"}):
+        cur.execute("UPDATE user SET login_id = user_id WHERE login_id IS NULL")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_user_login ON user (login_id)")
+    # New users log in with their internal key until they change their login ID
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS user_default_login AFTER INSERT ON user WHEN NEW.login_id IS NULL
+                BEGIN UPDATE user SET login_id = NEW.user_id WHERE user_id = NEW.user_id; END""")
+
+    # Add the deletion mark of the users (partial index: only the few deleted accounts are indexed)
+    add_missing_columns(cur, "user", {"deleted_at": "TEXT"})
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_user_deleted ON user (deleted_at) WHERE deleted_at IS NOT NULL")
+
+    # Add the data version of the users: every change of their habits, check-ins or goals increments it,
+    # so clients can tell from one row whether their cached data is still valid (ETags of http_api.py)
+    add_missing_columns(cur, "user", {"data_version": "INTEGER NOT NULL DEFAULT 0"})
+    for table in ("counter", "habits", "goals"):
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            name = f"{table}_{event.lower()}_version"
+            cur.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,))
+            existing = cur.fetchone()
+            if existing and "data_version_pause" not in existing[0]:
+                cur.execute(f"DROP TRIGGER {name}")  # trigger of an older version without the bulk pause
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table}
+                        WHEN NOT EXISTS (SELECT 1 FROM data_version_pause WHERE user_id = {row}.user_id)
+                        BEGIN UPDATE user SET data_version = data_version + 1 WHERE user_id = {row}.user_id; END""")
+
+    # Add the compact interval code of every habit
+    if "interval_code" in add_missing_columns(cur, "habits", {"interval_code": "TEXT"}):
+        cur.execute("UPDATE habits SET interval_code = CASE habit_interval WHEN 'Weekly' THEN 'W' ELSE 'D' END")
+
+    # Add the period keys of the check-ins and the last period of every habit
+    add_missing_columns(cur, "habits", {"last_period": "INTEGER", "week_start": "INTEGER"})
+    if add_missing_columns(cur, "counter", {"period_key": "INTEGER"}):
+        cur.execute("""SELECT c.rowid, c.check_date, COALESCE(h.interval_code, h.habit_interval), h.week_start
+                    FROM counter AS c JOIN habits AS h ON h.user_id = c.user_id AND h.habit_name = c.habit_name""")
+        cur.executemany("UPDATE counter SET period_key = ? WHERE rowid = ?",
+                        [(compute_period_key(check_date, interval, week_start), rowid)
+                         for rowid, check_date, interval, week_start in cur.fetchall()])
+        cur.execute("""UPDATE habits SET last_period = (SELECT MAX(period_key) FROM counter AS c
+                    WHERE c.user_id = habits.user_id AND c.habit_name = habits.habit_name)
+                    WHERE user_id IS NOT NULL""")
+
+    # Add the first day of the week of the users (see habit_manager.set_week_start): new habits of a user get it
+    # on insert, whatever path inserts them (custom habits, bound predefined habits, imports, batches)
+    if "week_start" in add_missing_columns(cur, "user", {"week_start": "INTEGER"}):
+        cur.execute("""UPDATE user SET week_start = (SELECT MAX(h.week_start) FROM habits AS h
+                    WHERE h.user_id = user.user_id)""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS habits_default_week_start AFTER INSERT ON habits
+                WHEN NEW.week_start IS NULL AND (SELECT week_start FROM user WHERE user_id = NEW.user_id) IS NOT NULL
+                BEGIN UPDATE habits SET week_start = (SELECT week_start FROM user WHERE user_id = NEW.user_id)
+                WHERE user_id = NEW.user_id AND habit_name = NEW.habit_name; END""")
+
+    # Add the number of checks in the last period and the date until which the current streak is alive
+    added = add_missing_columns(cur, "habits", {"period_count": "INTEGER DEFAULT 0", "streak_deadline": "TEXT"})
+    if "streak_deadline" in added:
+        cur.execute("UPDATE habits SET period_count = 1 WHERE last_period IS NOT NULL")
+        cur.execute("""SELECT user_id, habit_name, COALESCE(interval_code, habit_interval), week_start, last_period
+                    FROM habits WHERE last_period IS NOT NULL""")
+        cur.executemany("UPDATE habits SET streak_deadline = ? WHERE user_id = ? AND habit_name = ?",
+                        [(parse_interval(code, week_start).deadline(last_period, 1), user_id, habit_name)
+                         for user_id, habit_name, code, week_start, last_period in cur.fetchall()])
+
+    # Add the first date on which a habit is due again (see due.py)
+    if add_missing_columns(cur, "habits", {"next_due": "TEXT"}):
+        cur.execute("""SELECT user_id, habit_name, COALESCE(interval_code, habit_interval), week_start, last_period,
+                    period_count FROM habits WHERE last_period IS NOT NULL""")
+        cur.executemany("UPDATE habits SET next_due = ? WHERE user_id = ? AND habit_name = ?",
+                        [(parse_interval(code, week_start).next_due(last_period, count), user_id, habit_name)
+                         for user_id, habit_name, code, week_start, last_period, count in cur.fetchall()])
+
+    # Add the streak freezes (tokens per month, remaining tokens and month of the last refill)
+    add_missing_columns(cur, "habits", {"freeze_allowance": "INTEGER DEFAULT 0", "freeze_tokens": "INTEGER DEFAULT 0",
+                                        "freeze_month": "INTEGER"})
+
+    # Add the measurements of quantity-tracked habits
+    add_missing_columns(cur, "habits", {"unit": "TEXT", "goal": "REAL"})
+    add_missing_columns(cur, "counter", {"quantity": "REAL"})
+
+    # Add the mark of a manual streak reset (the next check starts a new streak, also in recompute_streaks)
+    add_missing_columns(cur, "counter", {"streak_reset": "INTEGER DEFAULT 0"})
+
+    # Fill the calendar bitmaps from the counter history of databases created before the calendar table
+    cur.execute("SELECT EXISTS (SELECT 1 FROM habit_calendar)")
+    if not cur.fetchone()[0]:
+        rebuild_calendar(cur, db, commit=False)
+
+
 def initialize_db(cur, db):
     """
     Function that initializes the database by creating tables and 
@@ -112,7 +369,8 @@ def initialize_db(cur, db):
         logging.error(f"Failed to initialize the database: {e}")     
         
         
-def add_counter(cur, db, user_id, habit_name, check_date, check_time, habit_rep, habit_streak):
+def add_counter(cur, db, user_id, habit_name, check_date, check_time, habit_rep, habit_streak,
+                period_key=None, commit=True, quantity=None):
     """
     Function to increment the counter data. Used in counter_manager.py.
 
@@ -124,18 +382,186 @@ def add_counter(cur, db, user_id, habit_name, check_date, check_time, habit_rep,
     :param check_time: Time of the check (format: HH:MM:SS)
     :param habit_rep: Number of repetitions
     :param habit_streak: Current streak value
+    :param period_key: Key of the period of the check (looked up from the habit if not given)
+    :param commit: Commit the changes (False if called within the transaction of a check-in:
+                   an error is then raised to the caller, which rolls back the whole transaction)
+    :param quantity: Measurement of the check-in, e.g. km or minutes (optional, added to the measurement of the day)
     """
     try:
+        if period_key is None:
+            period_key = habit_period_key(cur, user_id, habit_name, check_date)
         # Insert counter data into counter table using INSERT INTO... ON CONFLICT... DO UPDATE... clause
         cur.execute("""INSERT INTO counter 
-            (user_id, habit_name, check_date, check_time, habit_rep, habit_streak) 
-            VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(user_id, habit_name, check_date) DO UPDATE
+            (user_id, habit_name, check_date, check_time, habit_rep, habit_streak, period_key, quantity) 
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(user_id, habit_name, check_date) DO UPDATE
             SET habit_rep = habit_rep + excluded.habit_rep,
-            habit_streak = excluded.habit_streak
-            """, (user_id, habit_name, check_date, check_time, habit_rep, habit_streak))
-        db.commit()
+            habit_streak = excluded.habit_streak,
+            quantity = CASE WHEN excluded.quantity IS NULL THEN quantity
+                            ELSE COALESCE(quantity, 0) + excluded.quantity END
+            """, (user_id, habit_name, check_date, check_time, habit_rep, habit_streak, period_key, quantity))
+        mark_calendar_day(cur, user_id, habit_name, check_date)
+        if commit:
+            db.commit()
         logging.info("Counter data was successfully inserted.")
     
     except sqlite3.Error as e:
+        if not commit:
+            raise
         db.rollback()
         logging.error(f"An error occurred while inserting counter data: {e}")
+
+
+def habit_period_key(cur, user_id, habit_name, check_date):
+    """Function to return the period key of a check date according to the interval of the habit"""
+    cur.execute("""SELECT COALESCE(interval_code, habit_interval), week_start FROM habits
+                WHERE user_id = ? AND habit_name = ?""", (user_id, habit_name))
+    row = cur.fetchone()
+    return compute_period_key(check_date, *row) if row else compute_period_key(check_date, "D")
+
+
+def mark_calendar_day(cur, user_id, habit_name, check_date):
+    """
+    Function to set the bit of a check date in the calendar bitmap of a habit.
+    It does not commit, so it becomes part of the transaction of the check-in.
+
+    :param cur: Cursor for database operations
+    :param user_id: ID of the user
+    :param habit_name: Name of the habit
+    :param check_date: Date of the check (format: YYYY-MM-DD)
+    """
+    index, year = day_index(check_date)
+    cur.execute("SELECT days FROM habit_calendar WHERE user_id = ? AND habit_name = ? AND year = ?",
+                (user_id, habit_name, year))
+    row = cur.fetchone()
+    cur.execute("""INSERT INTO habit_calendar (user_id, habit_name, year, days) VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, habit_name, year) DO UPDATE SET days = excluded.days
+        """, (user_id, habit_name, year, set_day(row[0] if row else None, index)))
+
+
+def rollup_buckets(check_date, week_start=None):
+    """Function to return the rollup buckets (grain, bucket) of a check date: its day, week and month"""
+    return [(grain, compute_period_key(check_date, grain, week_start)) for grain in ("D", "W", "M")]
+
+
+def add_measurement(cur, user_id, habit_name, check_date, quantity, goal=None, week_start=None):
+    """
+    Function to add a measurement to the day, week and month rollups of a habit. Does not commit.
+    One measurement per counter record (check day): a habit is checked once per day (see record_check).
+
+    :param quantity: Measured value (e.g. km or minutes)
+    :param goal: Goal of the habit per check-in (counted in goal_hits if reached)
+    """
+    hit = int(goal is not None and quantity >= goal)
+    cur.executemany(
+        """INSERT INTO measure_rollup (user_id, habit_name, grain, bucket, n, total, min_value, max_value, goal_hits)
+        VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?) ON CONFLICT(user_id, habit_name, grain, bucket) DO UPDATE
+        SET n = n + 1, total = total + excluded.total,
+        min_value = MIN(min_value, excluded.min_value), max_value = MAX(max_value, excluded.max_value),
+        goal_hits = goal_hits + excluded.goal_hits""",
+        [(user_id, habit_name, grain, bucket, quantity, quantity, quantity, hit)
+         for grain, bucket in rollup_buckets(check_date, week_start)]
+    )
+
+
+def rebuild_rollup(cur, db, user_id, habit_name, commit=True):
+    """
+    Function to rebuild the measurement rollups of a habit from the counter table (e.g. after a bulk import).
+    Every counter record counts as one measurement (the quantity of the day), like in add_measurement.
+    With commit=False an error is raised to the caller (the transaction belongs to the caller).
+    """
+    try:
+        cur.execute("SELECT goal, week_start FROM habits WHERE user_id = ? AND habit_name = ?", (user_id, habit_name))
+        goal, week_start = cur.fetchone() or (None, None)
+        cur.execute("""SELECT check_date, quantity FROM counter
+                    WHERE user_id = ? AND habit_name = ? AND quantity IS NOT NULL""", (user_id, habit_name))
+        rollup = {}
+        for check_date, quantity in cur.fetchall():
+            for key in rollup_buckets(check_date, week_start):
+                n, total, low, high, hits = rollup.get(key, (0, 0.0, quantity, quantity, 0))
+                rollup[key] = (n + 1, total + quantity, min(low, quantity), max(high, quantity),
+                               hits + int(goal is not None and quantity >= goal))
+        cur.execute("DELETE FROM measure_rollup WHERE user_id = ? AND habit_name = ?", (user_id, habit_name))
+        cur.executemany(
+            """INSERT INTO measure_rollup (user_id, habit_name, grain, bucket, n, total, min_value, max_value, goal_hits)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(user_id, habit_name, grain, bucket) + values for (grain, bucket), values in rollup.items()]
+        )
+        if commit:
+            db.commit()
+    except sqlite3.Error as e:
+        if not commit:
+            raise
+        db.rollback()
+        logging.error(f"An error occurred while rebuilding the measurement rollups: {e}")
+
+
+def rebuild_calendar(cur, db, user_id=None, habit_name=None, commit=True):
+    """
+    Function to rebuild the calendar bitmaps from the counter table, 
+    e.g. for existing databases or after a bulk import.
+
+    :param user_id: Only rebuild the bitmaps of this user (optional)
+    :param habit_name: Only rebuild the bitmaps of this habit (optional)
+    :param commit: Commit the changes (False if called within another transaction: errors are raised to the caller)
+    """
+    try:
+        query = "SELECT user_id, habit_name, check_date FROM counter WHERE 1 = 1"
+        params = []
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        if habit_name is not None:
+            query += " AND habit_name = ?"
+            params.append(habit_name)
+        cur.execute(query, params)
+        dates = {}
+        for row_user, row_habit, check_date in cur.fetchall():
+            dates.setdefault((row_user, row_habit), []).append(check_date)
+
+        # Replace the bitmaps of the selected habits
+        cur.execute(query.replace("SELECT user_id, habit_name, check_date FROM counter",
+                                  "DELETE FROM habit_calendar"), params)
+        cur.executemany(
+            "INSERT INTO habit_calendar (user_id, habit_name, year, days) VALUES (?, ?, ?, ?)",
+            [(row_user, row_habit, year, days)
+             for (row_user, row_habit), habit_dates in dates.items()
+             for year, days in bitmap_from_dates(habit_dates).items()]
+        )
+        if commit:
+            db.commit()
+        logging.info("The calendar bitmaps were successfully rebuilt.")
+    except sqlite3.Error as e:
+        if not commit:
+            raise
+        db.rollback()
+        logging.error(f"An error occurred while rebuilding the calendar bitmaps: {e}")
+
+
+def pause_data_version(cur, user_ids):
+    """
+    Function to pause the data version triggers of users within the current transaction (does not commit),
+    e.g. for a bulk change of thousands of rows. resume_data_version must be called before the commit.
+    """
+    cur.executemany("INSERT OR IGNORE INTO data_version_pause (user_id) VALUES (?)", [(u,) for u in user_ids])
+
+
+def resume_data_version(cur):
+    """Function to increment the data version of the paused users once and resume their triggers (does not commit)"""
+    cur.execute("""UPDATE user SET data_version = data_version + 1
+                WHERE user_id IN (SELECT user_id FROM data_version_pause)""")
+    cur.execute("DELETE FROM data_version_pause")
+
+
+def enqueue_event(cur, user_id, event_type, payload, now=None):
+    """
+    Function to write an event into the outbox (does not commit).
+    Called within the transaction of a check-in, so the event exists if and only if the check-in was committed.
+
+    :param event_type: Type of the event, e.g. 'check' or 'milestone'
+    :param payload: Dictionary with the data of the event (stored as JSON)
+    :param now: Time of the event (default: now)
+    """
+    created_at = (now or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    cur.execute("""INSERT INTO outbox (user_id, event_type, payload, created_at, available_at)
+                VALUES (?, ?, ?, ?, ?)""", (user_id, event_type, json.dumps(payload), created_at, created_at))
+    return cur.lastrowid
@@ -0,0 +1,63 @@
+"""
+This file contains a pool of SQLite connections for long-running processes (e.g. the daemon, see daemon.py).
+The connections are opened once and reused by the worker threads, so a request does not pay for
+opening the database and preparing the schema. Every connection runs in WAL mode (readers do not block the writer)
+and waits for locks up to busy_timeout seconds instead of failing at once.
+A connection is used by only one thread at a time.
+"""
+
+import queue
+import sqlite3
+from contextlib import contextmanager
+from db import create_tables
+
+
+class PoolTimeout(TimeoutError):
+    """No connection of the pool became idle within the timeout"""
+
+
+class ConnectionPool:
+    """
+    Fixed number of SQLite connections to one database file.
+
+    :param db_path: Path of the database file
+    :param size: Number of connections (the number of threads that can work on the database at once)
+    :param busy_timeout: Seconds a connection waits for a lock of another connection
+    """
+
+    def __init__(self, db_path, size=4, busy_timeout=30.0):
+        self.db_path = db_path
+        self.size = size
+        self.idle = queue.LifoQueue()  # most recently used connection first (warm page cache)
+        self.connections = []
+        for _ in range(size):
+            db = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=False)
+            db.execute("PRAGMA foreign_keys = ON")
+            db.execute("PRAGMA journal_mode = WAL")
+            self.connections.append(db)
+            self.idle.put(db)
+        # Add the tables of newer program versions once
+        create_tables(self.connections[0].cursor(), self.connections[0])
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Method to borrow a connection (blocks until one is idle, at most timeout seconds: PoolTimeout);
+        uncommitted changes are rolled back on return
+        """
+        try:
+            db = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolTimeout("No database connection is available.") from None
+        try:
+            yield db
+        finally:
+            if db.in_transaction:
+                db.rollback()
+            self.idle.put(db)
+
+    def close(self):
+        """Method to close all connections"""
+        for db in self.connections:
+            db.close()
+        self.connections = []
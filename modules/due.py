@@ -0,0 +1,111 @@
+"""
+This file contains the "due now" sweep: which habits a user (or every user) still owes in the current period.
+Every check-in stores the first date on which the habit is due again (habits.next_due) together with
+the date until which the current streak is alive (habits.streak_deadline), so the due habits of one user
+or of all users are a single range scan of the due index without reading the counter table.
+- due: the habit was not checked (often enough) in its current period or was never checked
+- at risk: the habit is due and its current streak breaks if it is not checked by the deadline
+Only the habits of a user are swept (custom habits and predefined habits the user has checked).
+"""
+
+import sqlite3
+import pandas as pd
+from datetime import date, timedelta
+from periods import parse_interval
+from db import DELETED_USERS
+
+# Due habits of one user or of all users (the OR of both ranges is answered by the due index)
+DUE_QUERY = """SELECT h.user_id, h.habit_name, h.habit_interval, COALESCE(h.interval_code, h.habit_interval),
+               h.week_start, h.last_period, h.period_count, h.cur_streak, h.streak_deadline,
+               h.cur_streak > 0 AND h.streak_deadline BETWEEN :today AND :risk_until AS at_risk
+               FROM habits AS h
+               WHERE (h.next_due IS NULL OR h.next_due <= :today) AND {scope}"""
+
+
+def due_entry(row, periods):
+    """
+    Function to convert one row of the due query into a dictionary incl. the checks left in the period.
+
+    :param periods: Dictionary of (interval code, week start) to (checks per period, current period, end of the
+                    period), filled on demand, so every interval is evaluated only once per sweep
+    """
+    user_id, habit_name, label, code, week_start, last_period, count, streak, deadline, at_risk = row
+    times, period, period_end = periods[code, week_start]
+    done = (count or 0) if last_period == period else 0
+    return {
+        "user_id": user_id, "habit_name": habit_name, "interval": label,
+        "checks_left": times - done, "period_end": period_end,
+        "streak": streak or 0, "deadline": deadline if at_risk else None,
+        "status": "at risk" if at_risk else "due",
+    }
+
+
+def due_query(user_id=None, today=None, risk_days=0):
+    """Function to return the due query of one user or of all users (user_id=None) and its parameters"""
+    today = today or date.today()
+    params = {"today": today.isoformat(), "risk_until": (today + timedelta(days=risk_days)).isoformat()}
+    if user_id is None:
+        scope = f"h.user_id IS NOT NULL AND h.user_id NOT IN ({DELETED_USERS})"
+    else:
+        scope = "h.user_id = :user_id"
+        params["user_id"] = user_id
+    return DUE_QUERY.format(scope=scope), params
+
+
+def iter_due(cur, user_id=None, today=None, risk_days=0, batch_size=10000):
+    """
+    Generator that yields the due habits of one user or of all users (user_id=None).
+
+    :param today: Reference date (default: today)
+    :param risk_days: A streak is at risk if its deadline is at most risk_days after today
+    :param batch_size: Number of rows fetched at once (the sweep over all users is streamed)
+    """
+    today = today or date.today()
+    cur.execute(*due_query(user_id, today, risk_days))
+    periods = {}
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            key = (row[3], row[4])
+            if key not in periods:
+                interval = parse_interval(*key)
+                period = interval.period_of(today)
+                periods[key] = (interval.times, period, interval.period_end(period))
+            yield due_entry(row, periods)
+
+
+def get_due_habits(cur, user_id, today=None, risk_days=0):
+    """Function to return the due habits of one user; habits at risk first, then by name"""
+    entries = list(iter_due(cur, user_id, today, risk_days))
+    return sorted(entries, key=lambda e: (e["status"] != "at risk", e["habit_name"]))
+
+
+def sweep_due(cur, today=None, risk_days=0):
+    """
+    Function to collect the due habits of all users at once, e.g. for a nightly reminder job.
+    Returns a dictionary of user IDs to their lists of due habits.
+    """
+    due = {}
+    for entry in iter_due(cur, None, today, risk_days):
+        due.setdefault(entry["user_id"], []).append(entry)
+    return due
+
+
+def show_due_habits(cur, user_id, today=None):
+    """Function to display the habits the user still has to check in the current period"""
+    columns = ["Habit", "Interval", "Checks Left", "Period Ends", "Streak", "Status"]
+    try:
+        entries = get_due_habits(cur, user_id, today)
+    except sqlite3.Error as e:
+        print(f"An error occurred while retrieving your due habits: {e}")
+        return pd.DataFrame(columns=columns)
+    if not entries:
+        print("\nAll your habits are checked for the current period.")
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame([(e["habit_name"], e["interval"], e["checks_left"], e["period_end"].isoformat(),
+                        e["streak"], e["status"]) for e in entries], columns=columns)
+    print("\nThese habits are still due in the current period:")
+    print(df.to_string(index=False))
+    return df
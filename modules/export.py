@@ -0,0 +1,173 @@
+"""
+This file contains functions to export the tracking data of a user.
+The counter table is joined with the habits table and streamed in batches (fetchmany),
+so the memory usage stays the same no matter how long the tracking history is.
+Supported formats are CSV, JSON Lines and Parquet (only if the optional library pyarrow is installed).
+CSV and JSON Lines files can be compressed with gzip.
+"""
+
+import csv
+import gzip
+import json
+import sqlite3
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Columns of every exported record
+EXPORT_COLUMNS = ["user_id", "habit_name", "habit_type", "habit_interval",
+                  "check_date", "check_time", "habit_rep", "habit_streak", "quantity"]
+
+EXPORT_FORMATS = ["csv", "jsonl", "parquet"]
+
+
+def iter_history_batches(cur, user_id, habit_name=None, start_date=None, end_date=None,
+                         interval=None, batch_size=1000):
+    """
+    Generator that yields the counter history of a user in lists of at most batch_size rows.
+
+    :param cur: Cursor of the database connection (a separate cursor is used for streaming)
+    :param user_id: ID of the user
+    :param habit_name: Only export this habit (optional)
+    :param start_date: First check date to export (format: YYYY-MM-DD, optional)
+    :param end_date: Last check date to export (format: YYYY-MM-DD, optional)
+    :param interval: Only export habits with this interval, e.g. 'Daily' (optional)
+    :param batch_size: Number of rows fetched at once
+    """
+    query = """SELECT c.user_id, c.habit_name, h.habit_type, h.habit_interval,
+               c.check_date, c.check_time, c.habit_rep, c.habit_streak, c.quantity
+               FROM counter AS c JOIN habits AS h
+               ON h.user_id = c.user_id AND h.habit_name = c.habit_name
+               WHERE c.user_id = ?"""
+    params = [user_id]
+    if habit_name:
+        query += " AND c.habit_name = ?"
+        params.append(habit_name)
+    if start_date:
+        query += " AND c.check_date >= ?"
+        params.append(start_date)
+    if end_date:
+        query += " AND c.check_date <= ?"
+        params.append(end_date)
+    if interval:
+        query += " AND h.habit_interval = ?"
+        params.append(interval)
+    # Same order as the primary key of the counter table --> no sorting of the whole history
+    query += " ORDER BY c.user_id, c.habit_name, c.check_date, c.check_time"
+
+    stream = cur.connection.cursor()
+    try:
+        stream.execute(query, params)
+        while True:
+            rows = stream.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        stream.close()
+
+
+def iter_history(cur, user_id, **filters):
+    """Generator that yields the counter history of a user row by row (see iter_history_batches)"""
+    for rows in iter_history_batches(cur, user_id, **filters):
+        yield from rows
+
+
+def open_text(path, compress=False):
+    """Function to open a text file for writing, optionally gzip-compressed"""
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def write_csv(batches, path, compress=False):
+    """Function to write batches of rows into a CSV file; returns the number of rows"""
+    count = 0
+    with open_text(path, compress) as file:
+        writer = csv.writer(file)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in batches:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def write_jsonl(batches, path, compress=False):
+    """Function to write batches of rows into a JSON Lines file; returns the number of rows"""
+    count = 0
+    with open_text(path, compress) as file:
+        for rows in batches:
+            file.writelines(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows)
+            count += len(rows)
+    return count
+
+
+def write_parquet(batches, path, compress=False):
+    """Function to write batches of rows into a Parquet file (one row group per batch); returns the number of rows"""
+    if pa is None:
+        raise ImportError("Parquet export requires the optional library 'pyarrow'.")
+    schema = pa.schema([
+        ("user_id", pa.string()), ("habit_name", pa.string()), ("habit_type", pa.string()),
+        ("habit_interval", pa.string()), ("check_date", pa.string()), ("check_time", pa.string()),
+        ("habit_rep", pa.int64()), ("habit_streak", pa.int64()), ("quantity", pa.float64()),
+    ])
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="gzip" if compress else "snappy") as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_batch(pa.record_batch([list(column) for column in columns], schema=schema))
+            count += len(rows)
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+
+
+def export_history(cur, user_id, path, fmt="csv", compress=False, batch_size=1000, **filters):
+    """
+    Function to export the counter history of a user into a file.
+
+    :param path: Path of the output file
+    :param fmt: 'csv', 'jsonl' or 'parquet'
+    :param compress: gzip-compression of the output
+    :param filters: habit_name, start_date, end_date, interval (see iter_history_batches)
+    :return: Number of exported rows
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format '{fmt}'. Please choose one of {', '.join(EXPORT_FORMATS)}.")
+    batches = iter_history_batches(cur, user_id, batch_size=batch_size, **filters)
+    return WRITERS[fmt](batches, path, compress)
+
+
+def export_menu(cur, user_id):
+    """Function to let the user export their tracking data in the CLI"""
+    print("\nWith this option you can export your tracking data.")
+    formats = EXPORT_FORMATS if pa is not None else EXPORT_FORMATS[:2]
+    while True:
+        fmt = input(f"\nPlease choose a format ({', '.join(formats)}) or type 'x' to cancel: ").strip().lower()
+        if fmt == "x":
+            print("Action was cancelled. Returning to menu.")
+            return None
+        if fmt in formats:
+            break
+        print("Invalid format. Please try again.")
+    compress = False
+    if fmt != "parquet":
+        compress = input("Do you want to compress the file with gzip? Type 'Y' for yes and 'N' for no: ").strip().lower() == "y"
+    habit_name = input("Only export one habit? Enter its name or press enter for all habits: ").strip() or None
+    start_date = input("First date (YYYY-MM-DD) or press enter for the whole history: ").strip() or None
+    end_date = input("Last date (YYYY-MM-DD) or press enter for the whole history: ").strip() or None
+
+    path = f"habit_export_{user_id}.{fmt}" + (".gz" if compress else "")
+    try:
+        count = export_history(cur, user_id, path, fmt, compress,
+                               habit_name=habit_name, start_date=start_date, end_date=end_date)
+        print(f"***{count} records were exported to '{path}'.***")
+        return count
+    except (sqlite3.Error, OSError, ImportError) as e:
+        print(f"An error occurred while exporting your data: {e}")
+        return None
@@ -0,0 +1,39 @@
+"""
+This file contains the goal class.
+It allows the user to set goals for their habits and to view the progress of their goals.
+For this purpose, the methods call the respective functions from 'goal_manager.py'
+"""
+
+from goal_manager import goal_menu, show_goals, delete_goal
+
+class Goal:
+    def __init__(self, db_connection, user_id):
+
+        """
+        A class that represents the goals of a user.
+
+        :param db_connection: sqlite3.Connection
+            The database connection object that is used to interact with the database.
+        :param user_id: str
+            A unique identification of the user; used to associate goals with their account.
+        """
+
+        self.user_id = user_id
+        #Database connection
+        self.db = db_connection
+        self.cur = self.db.cursor()
+
+
+    def create_goal(self):
+        """Method to create a goal for a habit"""
+        return goal_menu(self.cur, self.db, self.user_id)
+
+
+    def show_goals(self):
+        """Method to display all goals with their progress"""
+        return show_goals(self.cur, self.user_id)
+
+
+    def delete_goal(self, goal_id):
+        """Method to delete a goal"""
+        return delete_goal(self.cur, self.db, self.user_id, goal_id)
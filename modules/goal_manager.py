@@ -0,0 +1,258 @@
+"""
+File that contains helper functions to manage the goals of a user, e.g.
+- "Yoga 20 times this month" (count goal)
+- "reach a 30-day PMR streak" (streak goal)
+- "run 100 km this month" (quantity goal of a quantity-tracked habit)
+The progress of every goal is stored in the goals table and updated incrementally
+within the transaction of a check-in (see record_check), so the goal view never aggregates the counter table.
+A check day counts once: the progress of a count goal is the number of counter records (check days) since its start,
+also after a reset of the repetition counter.
+Functions will be called in the goal class.
+"""
+
+import math
+import sqlite3
+from datetime import date, timedelta
+from habit_manager import ensure_user_habit
+from periods import parse_interval
+
+GOAL_TYPES = {"count": "Checks", "streak": "Streak", "quantity": "Quantity"}
+
+
+def create_goal(cur, db, user_id, habit_name, goal_type, target, start_date=None, end_date=None):
+    """
+    Function to create a goal for a habit of the user. The progress is initialized once from the history.
+
+    :param goal_type: 'count', 'streak' or 'quantity'
+    :param target: Number of checks, streak length (in periods of the habit) or quantity
+    :param start_date: First day counted for count and quantity goals (default: today)
+    :param end_date: Last day of the goal (optional)
+    :return: ID of the new goal
+    """
+    if goal_type not in GOAL_TYPES:
+        raise ValueError(f"Unknown goal type '{goal_type}'. Please choose one of {', '.join(GOAL_TYPES)}.")
+    if not target or target <= 0:
+        raise ValueError("The target of a goal must be a positive number.")
+    start_date = start_date or date.today().isoformat()
+    try:
+        ensure_user_habit(cur, user_id, habit_name)
+        cur.execute("""INSERT INTO goals (user_id, habit_name, goal_type, target, start_date, end_date)
+                    VALUES (?, ?, ?, ?, ?, ?)""", (user_id, habit_name, goal_type, target, start_date, end_date))
+        goal_id = cur.lastrowid
+        refresh_goals(cur, user_id, habit_name, goal_id)
+        db.commit()
+        return goal_id
+    except sqlite3.Error as e:
+        db.rollback()
+        print(f"An error occurred while creating the goal: {e}")
+        return None
+
+
+def refresh_goals(cur, user_id, habit_name, goal_id=None):
+    """
+    Function to compute the progress of the open goals of a habit from the counter table (does not commit).
+    Used when a goal is created and after a bulk import or a manual increment; check-ins update the progress
+    incrementally with the same result (one check per counter record, see update_goal_progress).
+    """
+    query = """UPDATE goals SET progress = CASE goal_type
+                   WHEN 'streak' THEN MAX(progress, (SELECT COALESCE(cur_streak, 0) FROM habits AS h
+                                                     WHERE h.user_id = goals.user_id AND h.habit_name = goals.habit_name))
+                   ELSE (SELECT COALESCE(SUM(CASE goals.goal_type WHEN 'count' THEN 1 ELSE c.quantity END), 0)
+                         FROM counter AS c
+                         WHERE c.user_id = goals.user_id AND c.habit_name = goals.habit_name
+                         AND c.check_date >= goals.start_date
+                         AND (goals.end_date IS NULL OR c.check_date <= goals.end_date))
+               END
+               WHERE user_id = ? AND habit_name = ? AND completed_date IS NULL"""
+    params = [user_id, habit_name]
+    if goal_id is not None:
+        query += " AND goal_id = ?"
+        params.append(goal_id)
+    cur.execute(query, params)
+    # Completed goals get the date of their last check
+    cur.execute("""UPDATE goals SET completed_date = (SELECT last_check FROM habits AS h
+                                                      WHERE h.user_id = goals.user_id AND h.habit_name = goals.habit_name)
+                WHERE user_id = ? AND habit_name = ? AND completed_date IS NULL AND progress >= target""",
+                (user_id, habit_name))
+
+
+def update_goal_progress(cur, user_id, habit_name, check_date, streak, quantity=None, new_day=True):
+    """
+    Function to add one check-in to the open goals of a habit (does not commit).
+    Called in the transaction of the check-in, which adds or updates the counter record of its day.
+
+    :param check_date: Date of the check-in (format: YYYY-MM-DD)
+    :param streak: Streak of the habit after the check-in
+    :param quantity: Measured quantity of the check-in (optional)
+    :param new_day: False if a counter record of the day already existed (count goals count check days)
+    """
+    cur.execute(
+        """UPDATE goals SET
+               progress = CASE goal_type
+                   WHEN 'count' THEN progress + ?
+                   WHEN 'quantity' THEN progress + COALESCE(?, 0)
+                   ELSE MAX(progress, ?) END,
+               completed_date = CASE WHEN CASE goal_type
+                   WHEN 'count' THEN progress + ?
+                   WHEN 'quantity' THEN progress + COALESCE(?, 0)
+                   ELSE MAX(progress, ?) END >= target THEN ? END
+           WHERE user_id = ? AND habit_name = ? AND completed_date IS NULL
+           AND start_date <= ? AND (end_date IS NULL OR end_date >= ?)""",
+        (int(new_day), quantity, streak, int(new_day), quantity, streak, check_date,
+         user_id, habit_name, check_date, check_date)
+    )
+
+
+def projected_date(goal_type, target, progress, start_date, today, habit_state=None):
+    """
+    Function to project the completion date of an open goal:
+    count and quantity goals continue with their average progress per day since the start,
+    streak goals need one more check per period of the habit.
+    Returns None if no projection is possible.
+
+    :param habit_state: Tuple (interval, last period, current streak, streak deadline) for streak goals
+    """
+    remaining = target - progress
+    if remaining <= 0:
+        return today
+    if goal_type == "streak":
+        if habit_state is None:
+            return None
+        interval, last_period, streak, deadline = habit_state
+        if last_period is not None and deadline and deadline >= today.isoformat():
+            # The current streak is alive: one more check in each of the following periods
+            first, periods = last_period + 1, math.ceil(target - (streak or 0))
+        else:
+            first, periods = interval.period_of(today), math.ceil(target)
+        return max(interval.period_start(first + periods - 1), today)
+    days = (today - date.fromisoformat(start_date)).days + 1
+    if days <= 0 or progress <= 0:
+        return None
+    return today + timedelta(days=math.ceil(remaining / (progress / days)))
+
+
+def get_goals(cur, user_id, today=None):
+    """
+    Function to read the goals of a user with their progress (one query, no aggregation of the counter table).
+    Returns a list of dictionaries incl. the percent complete and the projected completion date.
+    """
+    today = today or date.today()
+    cur.execute("""SELECT g.goal_id, g.habit_name, g.goal_type, g.target, g.progress, g.start_date, g.end_date,
+                g.completed_date, h.unit, COALESCE(h.interval_code, h.habit_interval), h.week_start, h.last_period,
+                h.cur_streak, h.streak_deadline
+                FROM goals AS g JOIN habits AS h ON h.user_id = g.user_id AND h.habit_name = g.habit_name
+                WHERE g.user_id = ? ORDER BY g.completed_date IS NOT NULL, g.end_date IS NULL, g.end_date, g.goal_id""",
+                (user_id,))
+    goals = []
+    for (goal_id, habit_name, goal_type, target, progress, start_date, end_date,
+         completed_date, unit, code, week_start, last_period, streak, deadline) in cur.fetchall():
+        if completed_date:
+            projected, status = date.fromisoformat(completed_date), "Completed"
+        else:
+            projected = projected_date(goal_type, target, progress, start_date, today,
+                                       (parse_interval(code, week_start), last_period, streak, deadline))
+            if end_date and today > date.fromisoformat(end_date):
+                status = "Missed"
+            elif end_date and (projected is None or projected > date.fromisoformat(end_date)):
+                status = "Behind"
+            else:
+                status = "On track"
+        goals.append({
+            "goal_id": goal_id, "habit_name": habit_name, "goal_type": goal_type, "target": target,
+            "progress": progress, "unit": unit, "start_date": start_date, "end_date": end_date,
+            "percent": round(min(progress / target, 1) * 100, 1), "projected": projected, "status": status,
+        })
+    return goals
+
+
+def show_goals(cur, user_id, today=None):
+    """Function to display the goals of a user with percent complete and projected completion date"""
+    import pandas as pd  # pandas is only loaded for the menus
+    columns = ["ID", "Habit", "Goal", "Progress", "Complete (%)", "Until", "Projected", "Status"]
+    try:
+        goals = get_goals(cur, user_id, today)
+    except sqlite3.Error as e:
+        print(f"An error occurred while retrieving your goals: {e}")
+        return pd.DataFrame(columns=columns)
+    if not goals:
+        print("\nNo goals were found.")
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame([(
+        g["goal_id"], g["habit_name"],
+        f"{GOAL_TYPES[g['goal_type']]} {g['target']:g}" + (f" {g['unit']}" if g["goal_type"] == "quantity" and g["unit"] else ""),
+        f"{g['progress']:g}", g["percent"], g["end_date"] or "-",
+        g["projected"].isoformat() if g["projected"] else "-", g["status"],
+    ) for g in goals], columns=columns)
+    print("\nHere are your goals:")
+    print(df.to_string(index=False))
+    return df
+
+
+def delete_goal(cur, db, user_id, goal_id):
+    """Function to delete a goal of the user; returns True if a goal was deleted"""
+    try:
+        cur.execute("DELETE FROM goals WHERE user_id = ? AND goal_id = ?", (user_id, goal_id))
+        db.commit()
+        return cur.rowcount > 0
+    except sqlite3.Error as e:
+        db.rollback()
+        print(f"An error occurred while deleting the goal: {e}")
+        return False
+
+
+def goal_menu(cur, db, user_id):
+    """Function to let the user create a goal in the CLI"""
+    print("\nWith this option you can set a goal for a habit, e.g. 'Yoga 20 times this month' or a 30-day PMR streak.")
+    from analyze import show_predef_habits, show_custom_habits  # pandas is only loaded for the menus
+    predef_df = show_predef_habits(cur)
+    custom_df = show_custom_habits(cur, user_id)
+    names = list(predef_df["Name"].values) + list(custom_df["Name"].values)
+    names_lower = [n.lower() for n in names]
+    if not names:
+        print("No habits available.")
+        return None
+
+    while True:
+        user_input = input("\nPlease enter the name of the habit or type 'x' to cancel: ").strip().lower()
+        if user_input == "x":
+            print("Action was cancelled. Returning to menu.")
+            return None
+        if user_input in names_lower:
+            habit_name = names[names_lower.index(user_input)]
+            break
+        print("Habit does not exist. Please try again.")
+
+    while True:
+        choice = input("Type 'c' for a number of checks, 's' for a streak or 'q' for a quantity (e.g. km): ").strip().lower()
+        goal_type = {"c": "count", "s": "streak", "q": "quantity"}.get(choice)
+        if goal_type:
+            break
+        print("Invalid input. Please type 'c', 's' or 'q'.")
+
+    while True:
+        try:
+            target = float(input("What is your target? ").strip().replace(",", "."))
+            if target > 0:
+                break
+        except ValueError:
+            pass
+        print("Invalid input. Please enter a positive number.")
+
+    today = date.today()
+    start_date, end_date = today.isoformat(), None
+    if goal_type != "streak":
+        period = input("Until when? Type 'w' for this week, 'm' for this month or a number of days: ").strip().lower()
+        if period == "w":
+            start = today - timedelta(days=today.weekday())
+            start_date, end_date = start.isoformat(), (start + timedelta(days=6)).isoformat()
+        elif period == "m":
+            start = today.replace(day=1)
+            next_month = (start + timedelta(days=32)).replace(day=1)
+            start_date, end_date = start.isoformat(), (next_month - timedelta(days=1)).isoformat()
+        elif period.isdigit() and int(period) > 0:
+            end_date = (today + timedelta(days=int(period) - 1)).isoformat()
+
+    goal_id = create_goal(cur, db, user_id, habit_name, goal_type, target, start_date, end_date)
+    if goal_id:
+        print(f"***Your goal for '{habit_name}' was saved.***")
+    return goal_id
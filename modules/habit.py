@@ -5,7 +5,7 @@ Plus, it allows the user to delete and edit habits.
 For this purpose, the functions from "habit_manager.py" are called.
 """
 
-from habit_manager import create_predef_habits, create_custom_habits, delete_custom_habit, edit_custom_habit
+from habit_manager import create_predef_habits, create_custom_habits, delete_custom_habit, edit_custom_habit, set_streak_freezes, set_unit_and_goal, change_week_start
 from datetime import datetime
 
 class Habit:
@@ -60,3 +60,18 @@ class Habit:
     def edit_habit(self, habit_name=None):
         """Method for editing custom habits: Asks for confirmation, then delegates to the manager."""
         edit_custom_habit(self.cur, self.db, self.user_id, habit_name)
+
+
+    def set_streak_freezes(self):
+        """Method for setting the streak freezes per month of a habit"""
+        set_streak_freezes(self.cur, self.db, self.user_id)
+
+
+    def set_unit_and_goal(self):
+        """Method for setting the unit and the goal of a quantity-tracked habit"""
+        set_unit_and_goal(self.cur, self.db, self.user_id)
+
+
+    def set_week_start(self):
+        """Method for setting the first day of the week of the weekly habits"""
+        change_week_start(self.cur, self.db, self.user_id)
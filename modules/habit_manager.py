@@ -4,12 +4,45 @@ File that contains helper functions for the habit class to
 - create custom habits
 - delete habits
 - edit habits
+- bind predefined habits to a user
 Functions will be called in the habit class.
 """
 
 import sqlite3
 from datetime import datetime
-from analyze import show_custom_habits
+from periods import Interval, WEEKDAYS, LABEL_CODES
+import hooks
+
+# Letters of the interval choices in the create and edit menus
+INTERVAL_CHOICES = ("Type 'd' for daily, 'w' for weekly, 'n' for every N days, 't' for N times per week, "
+                    "'m' for monthly or 's' for specific weekdays")
+
+
+def ask_interval(choice):
+    """
+    Function to create the interval model of a menu choice ('d', 'w', 'n', 't', 'm' or 's').
+    Asks for the number of days/times or the weekdays if needed. Returns None for an invalid choice.
+    """
+    try:
+        if choice == "d":
+            return Interval("D")
+        if choice == "w":
+            return Interval("W")
+        if choice == "n":
+            return Interval("D", int(input("Every how many days do you want to practice your habit? ")))
+        if choice == "t":
+            return Interval("W", int(input("How many times per week do you want to practice your habit? ")))
+        if choice == "m":
+            times = input("How many times per month do you want to practice your habit (press enter for once)? ").strip()
+            return Interval("M", int(times or 1))
+        if choice == "s":
+            days = input("On which weekdays do you want to practice your habit (e.g. 'Mon, Wed, Fri')? ")
+            names = [day.strip()[:3].title() for day in days.split(",") if day.strip()]
+            return Interval("S", sum(1 << WEEKDAYS.index(name) for name in set(names)))
+    except ValueError:
+        pass
+    return None
+
 
 ### Functions to create habits
 def create_predef_habits(cur, db):
@@ -25,7 +58,8 @@ def create_predef_habits(cur, db):
     try:
         for habit in predef_habits:
             cur.execute(
-                "INSERT INTO habits (habit_name, habit_def, habit_type, habit_date, habit_interval, is_custom) VALUES (?, ?, ?, ?, ?, ?)", habit
+                "INSERT INTO habits (habit_name, habit_def, habit_type, habit_date, habit_interval, interval_code, is_custom) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                habit[:5] + (LABEL_CODES[habit[4]], habit[5])
             )
         db.commit()
         print("Predefined habits have been successfully inserted.")
@@ -63,19 +97,14 @@ def create_custom_habits(cur, db, user_id):
         habit_date = datetime.now().strftime('%Y-%m-%d')
 
         while True:
-            habit_interval = input("\nDo you want to practice your habit daily or weekly? (Type 'd' for daily and 'w' for weekly):\n").lower()
-            if habit_interval == 'd':
-                habit_interval = 'Daily'
+            interval = ask_interval(input(f"\nHow often do you want to practice your habit? ({INTERVAL_CHOICES}):\n").lower())
+            if interval:
                 break
-            elif habit_interval == 'w':
-                habit_interval = 'Weekly'
-                break
-            else:
-                print("Invalid input. Please type 'd' for daily or 'w' for weekly.")
+            print("Invalid input. Please type 'd', 'w', 'n', 't', 'm' or 's' and a valid number or weekday.")
         
         # Insert custom habit into the database
-        cur.execute("INSERT INTO habits (user_id, habit_name, habit_def, habit_type, habit_date, habit_interval, is_custom) VALUES (?, ?, ?, ?, ?, ?, 1)",
-                    (user_id, habit_name, habit_def, habit_type, habit_date, habit_interval))
+        cur.execute("INSERT INTO habits (user_id, habit_name, habit_def, habit_type, habit_date, habit_interval, interval_code, is_custom) VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+                    (user_id, habit_name, habit_def, habit_type, habit_date, interval.label, interval.code))
         db.commit()
         print(f"The habit '{habit_name}' has been successfully saved.")
         print("Custom habit was successfully created!")
@@ -85,12 +114,44 @@ def create_custom_habits(cur, db, user_id):
             
 
         
+def ensure_user_habit(cur, user_id, habit_name):
+    """
+    Function to make sure that a habit entry of the user exists (foreign key of the counter table).
+    Predefined habits are copied for the user. Does not commit.
+    Returns True if the user has the habit afterwards.
+    """
+    cur.execute("SELECT 1 FROM habits WHERE user_id = ? AND habit_name = ?", (user_id, habit_name))
+    if cur.fetchone():
+        return True
+    cur.execute(
+        """
+        INSERT OR IGNORE INTO habits (
+            user_id, habit_name, habit_def,
+            habit_type, habit_interval, interval_code, is_custom
+        )
+        SELECT ?, habit_name, habit_def,
+               habit_type, habit_interval, interval_code, 0
+          FROM habits
+         WHERE is_custom = 0
+           AND user_id IS NULL
+           AND habit_name = ?
+        """,
+        (user_id, habit_name)
+    )
+    if cur.rowcount > 0:
+        return True
+    # Another connection (e.g. a worker of the daemon) may have copied the habit in the meantime
+    cur.execute("SELECT 1 FROM habits WHERE user_id = ? AND habit_name = ?", (user_id, habit_name))
+    return cur.fetchone() is not None
+
+
 ### Functions to change habits        
 def delete_custom_habit(cur, db, user_id, habit_name=None):
     """Function to delete a custom habit"""    
     print("\nHere you can delete a custom habit.")
     print("\nThese are your custom habits: ")
     # Show custom habits
+    from analyze import show_custom_habits  # pandas is only loaded for the menus
     custom_df = show_custom_habits(cur, user_id)
     if custom_df.empty:
         print("No custom habits available to delete.")
@@ -121,9 +182,7 @@ def delete_custom_habit(cur, db, user_id, habit_name=None):
     if delete_confirm == "y":                           
         # Deletion
         try:
-            cur.execute("DELETE FROM habits WHERE habit_name = ? AND user_id = ?", 
-                        (habit_name, user_id))
-            db.commit()
+            remove_custom_habit(cur, db, user_id, habit_name)
             print(f"The habit '{del_name_input}' was successfully deleted.")
         except sqlite3.Error as e:
             db.rollback()
@@ -136,8 +195,9 @@ def delete_custom_habit(cur, db, user_id, habit_name=None):
         
 def edit_custom_habit(cur, db, user_id, habit_name=None):
     """Function to edit the periodicity of a habit"""    
-    print("\nHere you can change the interval of a custom habit to Weekly or Daily.")
+    print("\nHere you can change the interval of a custom habit (e.g. Daily, Weekly or Monthly).")
     print("\nThese are your custom habits: ")
+    from analyze import show_custom_habits  # pandas is only loaded for the menus
     custom_df = show_custom_habits(cur, user_id)
     if custom_df.empty:
         print("No custom habits available to edit.")
@@ -169,26 +229,20 @@ def edit_custom_habit(cur, db, user_id, habit_name=None):
                 print("Action was cancelled. Returning to menu.")
                 return                
             periodicity_input = input(
-                f"\nDo you want to set the periodicity of '{habit_name}' to 'Weekly' or 'Daily'? "
-                "\nPlease enter 'w' or 'd' to change the periodicity or type 'x' to cancel): "
+                f"\nHow often do you want to practice '{habit_name}'? "
+                f"\n{INTERVAL_CHOICES} to change the periodicity or type 'x' to cancel): "
             ).strip().lower()
-            if periodicity_input == "d":
-                new_interval = "Daily"
-            elif periodicity_input == "w":
-                new_interval = "Weekly"   
-            elif periodicity_input == "x":
+            if periodicity_input == "x":
                 print("Action was cancelled. Returning to menu.")
                 return
-            else:
-                print("Invalid input. Please enter 'w', 'd' or 'x'.")
+            interval = ask_interval(periodicity_input)
+            if not interval:
+                print("Invalid input. Please enter 'd', 'w', 'n', 't', 'm', 's' or 'x'.")
                 continue
+            new_interval = interval.label
 
-            # Update database    
-            cur.execute(
-                "UPDATE habits SET habit_interval = ? WHERE habit_name = ? AND user_id = ?",
-                (new_interval, habit_name, user_id)
-            )
-            db.commit()
+            # Update database
+            update_custom_habit(cur, db, user_id, habit_name, interval=interval)
             print(f"The periodicity of '{habit_name}' was successfully updated to '{new_interval}'.")
             return
         except sqlite3.Error as e:
@@ -197,3 +251,205 @@ def edit_custom_habit(cur, db, user_id, habit_name=None):
         else:
             print("No habits were edited.")    
     
+
+
+
+### Functions to change habits without user interaction (e.g. for the HTTP API)
+def add_custom_habit(cur, db, user_id, habit_name, interval, habit_type="", habit_def=""):
+    """
+    Function to create a custom habit with an interval model (see periods.Interval).
+    Returns the stored habit name or None if the user already has a habit with this name.
+    """
+    habit_name = habit_name.strip().title()
+    cur.execute("SELECT 1 FROM habits WHERE user_id = ? AND LOWER(habit_name) = ?", (user_id, habit_name.lower()))
+    if not habit_name or cur.fetchone():
+        return None
+    cur.execute("INSERT INTO habits (user_id, habit_name, habit_def, habit_type, habit_date, habit_interval, interval_code, is_custom) VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+                (user_id, habit_name, habit_def, habit_type, datetime.now().strftime('%Y-%m-%d'),
+                 interval.label, interval.code))
+    db.commit()
+    return habit_name
+
+
+def update_custom_habit(cur, db, user_id, habit_name, interval=None, habit_type=None, habit_def=None):
+    """
+    Function to change interval, type or definition of a habit of the user.
+    A new interval recomputes the period keys and streaks. Returns True if the habit exists.
+    """
+    cur.execute("""UPDATE habits SET habit_type = COALESCE(?, habit_type), habit_def = COALESCE(?, habit_def)
+                WHERE habit_name = ? AND user_id = ?""", (habit_type, habit_def, habit_name, user_id))
+    if cur.rowcount == 0:
+        return False
+    if interval is not None:
+        cur.execute("UPDATE habits SET habit_interval = ?, interval_code = ? WHERE habit_name = ? AND user_id = ?",
+                    (interval.label, interval.code, habit_name, user_id))
+        # Period keys and streaks depend on the interval
+        from counter_manager import recompute_streaks
+        recompute_streaks(cur, db, user_id, habit_name, commit=False)
+    db.commit()
+    if interval is not None:
+        hooks.emit("habit_edit", user_id=user_id, habit_name=habit_name, interval=interval.label,
+                   interval_code=interval.code)
+    return True
+
+
+def remove_custom_habit(cur, db, user_id, habit_name):
+    """
+    Function to delete a custom habit of the user with its check-ins, calendar bitmaps, rollups and goals
+    in one transaction; returns True if it was deleted
+    """
+    from db import pause_data_version, resume_data_version
+    cur.execute("SELECT 1 FROM habits WHERE habit_name = ? AND user_id = ? AND is_custom = 1", (habit_name, user_id))
+    if cur.fetchone() is None:
+        return False
+    pause_data_version(cur, [user_id])  # the data version is incremented once, not per deleted check-in
+    for table in ("counter", "habit_calendar", "measure_rollup", "goals", "habits"):
+        cur.execute(f"DELETE FROM {table} WHERE user_id = ? AND habit_name = ?", (user_id, habit_name))
+    resume_data_version(cur)
+    db.commit()
+    return True
+
+
+def set_streak_freezes(cur, db, user_id):
+    """
+    Function to set the number of streak freezes per month of a habit.
+    A freeze is used automatically when a check-in detects a missed day/week/month.
+    """
+    print("\nHere you can set the number of streak freezes per month of a habit.")
+    print("Note: A freeze is used automatically for every missed period, so a missed day does not break your streak.")
+    from analyze import show_predef_habits, show_custom_habits  # pandas is only loaded for the menus
+    predef_df = show_predef_habits(cur)
+    custom_df = show_custom_habits(cur, user_id)
+    names = list(predef_df["Name"].values) + list(custom_df["Name"].values)
+    names_lower = [n.lower() for n in names]
+    if not names:
+        print("No habits available.")
+        return
+
+    while True:
+        user_input = input("\nPlease enter the name of the habit or type 'x' to cancel: ").strip().lower()
+        if user_input == "x":
+            print("Action was cancelled. Returning to menu.")
+            return
+        if user_input in names_lower:
+            habit_name = names[names_lower.index(user_input)]
+            break
+        print("Habit does not exist. Please try again.")
+
+    while True:
+        allowance = input(f"How many streak freezes per month do you want for '{habit_name}' (0-31)? ").strip()
+        if allowance.isdigit() and int(allowance) <= 31:
+            allowance = int(allowance)
+            break
+        print("Invalid input. Please enter a number between 0 and 31.")
+
+    try:
+        ensure_user_habit(cur, user_id, habit_name)
+        # The tokens are refilled with the new allowance at the next check-in
+        cur.execute("UPDATE habits SET freeze_allowance = ?, freeze_month = NULL WHERE user_id = ? AND habit_name = ?",
+                    (allowance, user_id, habit_name))
+        db.commit()
+        print(f"***'{habit_name}' now has {allowance} streak freeze(s) per month.***")
+    except sqlite3.Error as e:
+        db.rollback()
+        print(f"An error occurred while setting the streak freezes: {e}")
+
+
+def set_unit_and_goal(cur, db, user_id):
+    """
+    Function to set the unit (e.g. 'km' or 'minutes') and the goal per check-in of a habit.
+    Habits with a unit ask for the measured quantity at every check-in.
+    """
+    print("\nHere you can track a quantity for a habit, e.g. the distance of 'Jogging' in km.")
+    from analyze import show_predef_habits, show_custom_habits  # pandas is only loaded for the menus
+    predef_df = show_predef_habits(cur)
+    custom_df = show_custom_habits(cur, user_id)
+    names = list(predef_df["Name"].values) + list(custom_df["Name"].values)
+    names_lower = [n.lower() for n in names]
+    if not names:
+        print("No habits available.")
+        return
+
+    while True:
+        user_input = input("\nPlease enter the name of the habit or type 'x' to cancel: ").strip().lower()
+        if user_input == "x":
+            print("Action was cancelled. Returning to menu.")
+            return
+        if user_input in names_lower:
+            habit_name = names[names_lower.index(user_input)]
+            break
+        print("Habit does not exist. Please try again.")
+
+    unit = input(f"Which unit do you want to track for '{habit_name}' (e.g. 'km', 'minutes')? "
+                 "Press enter to stop tracking a quantity: ").strip() or None
+    goal = None
+    while unit:
+        goal_input = input(f"What is your goal per check-in in {unit}? Press enter for no goal: ").strip()
+        if not goal_input:
+            break
+        try:
+            goal = float(goal_input.replace(",", "."))
+            if goal > 0:
+                break
+        except ValueError:
+            pass
+        print("Invalid input. Please enter a positive number.")
+        goal = None
+
+    try:
+        ensure_user_habit(cur, user_id, habit_name)
+        cur.execute("UPDATE habits SET unit = ?, goal = ? WHERE user_id = ? AND habit_name = ?",
+                    (unit, goal, user_id, habit_name))
+        db.commit()
+        if unit:
+            print(f"***'{habit_name}' is now tracked in {unit}" + (f" with a goal of {goal:g} {unit}.***" if goal else ".***"))
+        else:
+            print(f"***'{habit_name}' no longer tracks a quantity.***")
+    except sqlite3.Error as e:
+        db.rollback()
+        print(f"An error occurred while setting the unit and goal: {e}")
+
+def set_week_start(cur, db, user_id, week_start):
+    """
+    Function to set the first day of the week (0 = Monday ... 6 = Sunday) for the habits of a user.
+    The setting is stored with the user, so habits that are created or bound later get it as well.
+    The period keys and streaks of the weekly habits and the weekly measurement rollups are recomputed.
+    Returns the number of recomputed weekly habits.
+    """
+    from counter_manager import recompute_streaks
+    from db import rebuild_rollup
+    if week_start not in range(7):
+        raise ValueError("The first day of the week must be between 0 (Monday) and 6 (Sunday).")
+    try:
+        cur.execute("UPDATE user SET week_start = ? WHERE user_id = ?", (week_start, user_id))
+        cur.execute("UPDATE habits SET week_start = ? WHERE user_id = ?", (week_start, user_id))
+        cur.execute("""SELECT habit_name FROM habits
+                    WHERE user_id = ? AND COALESCE(interval_code, habit_interval) LIKE 'W%'""", (user_id,))
+        weekly = [habit_name for (habit_name,) in cur.fetchall()]
+        for habit_name in weekly:
+            recompute_streaks(cur, db, user_id, habit_name, commit=False)
+        cur.execute("SELECT habit_name FROM habits WHERE user_id = ? AND unit IS NOT NULL", (user_id,))
+        for (habit_name,) in cur.fetchall():
+            rebuild_rollup(cur, db, user_id, habit_name, commit=False)
+        db.commit()
+        return len(weekly)
+    except sqlite3.Error as e:
+        db.rollback()
+        print(f"An error occurred while setting the first day of the week: {e}")
+        return 0
+
+
+def change_week_start(cur, db, user_id):
+    """Function to let the user choose the first day of the week of the weekly habits in the CLI"""
+    print("\nHere you can choose the first day of the week for your weekly habits (default: Monday).")
+    print("Note: The streaks of your weekly habits are recomputed with the new weeks.")
+    while True:
+        day = input("Please enter the first day of the week (e.g. 'Sun' or 'Sunday') or type 'x' to cancel: ").strip()
+        if day.lower() == "x":
+            print("Action was cancelled. Returning to menu.")
+            return
+        if len(day) >= 3 and day[:3].title() in WEEKDAYS:
+            break
+        print("Invalid input. Please enter a day of the week.")
+    count = set_week_start(cur, db, user_id, WEEKDAYS.index(day[:3].title()))
+    print(f"***Your weeks now start on {day.title()} ({count} weekly habit(s) recomputed).***")
@@ -0,0 +1,141 @@
+"""
+This file contains helper functions for the calendar heatmap.
+Every (user, habit, year) owns a compact bitmap with 366 bits (46 bytes) stored in the
+habit_calendar table. Bit i is set when the habit was checked on day i of the year (0 = 1st of January).
+Completion counts are derived by popcount, streaks by shifting the bitmap, and the heatmap
+is rendered as text for the CLI.
+"""
+
+from datetime import date
+
+# Number of bytes needed for 366 bits
+BITMAP_SIZE = 46
+
+# Characters for the heatmap intensity (no check ... many checks)
+HEAT_LEVELS = "·░▒▓█"
+
+
+def day_index(check_date):
+    """Function to return the day of the year (0-365) and the year of a date or 'YYYY-MM-DD' string"""
+    if isinstance(check_date, str):
+        check_date = date.fromisoformat(check_date)
+    return check_date.timetuple().tm_yday - 1, check_date.year
+
+
+def to_int(bitmap):
+    """Function to convert a stored bitmap (bytes or None) into an integer"""
+    return int.from_bytes(bitmap, "little") if bitmap else 0
+
+
+def to_bytes(bits):
+    """Function to convert an integer back into a 46-byte bitmap"""
+    return bits.to_bytes(BITMAP_SIZE, "little")
+
+
+def set_day(bitmap, index):
+    """Function to set the bit of a given day index and return the new bitmap"""
+    return to_bytes(to_int(bitmap) | (1 << index))
+
+
+def bitmap_from_dates(dates):
+    """Function to build bitmaps per year from an iterable of dates; returns {year: bytes}"""
+    years = {}
+    for check_date in dates:
+        index, year = day_index(check_date)
+        years[year] = years.get(year, 0) | (1 << index)
+    return {year: to_bytes(bits) for year, bits in years.items()}
+
+
+def popcount(bitmap):
+    """Function to count the checked days of a bitmap"""
+    return bin(to_int(bitmap)).count("1")
+
+
+def days_in_year(year):
+    """Function to return 365 or 366 depending on the year"""
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def join_years(bitmaps):
+    """
+    Function to chain the bitmaps of several years to one integer so that streaks
+    can span the turn of the year. Returns the integer and the first year.
+    """
+    if not bitmaps:
+        return 0, None
+    first, last = min(bitmaps), max(bitmaps)
+    bits, offset = 0, 0
+    for year in range(first, last + 1):
+        bits |= to_int(bitmaps.get(year)) << offset
+        offset += days_in_year(year)
+    return bits, first
+
+
+def longest_run(bits):
+    """Function to find the longest run of set bits (the longest streak in days)"""
+    if isinstance(bits, (bytes, bytearray)):
+        bits = to_int(bits)
+    run = 0
+    # Every shift-and removes the last day of each run
+    while bits:
+        bits &= bits >> 1
+        run += 1
+    return run
+
+
+def current_run(bits, index):
+    """Function to count the set bits ending at a given index (the current streak in days)"""
+    if isinstance(bits, (bytes, bytearray)):
+        bits = to_int(bits)
+    run = 0
+    while index >= 0 and (bits >> index) & 1:
+        run += 1
+        index -= 1
+    return run
+
+
+def render_heatmap(counts, year, title=None):
+    """
+    Function to render a GitHub-style year heatmap as text.
+
+    :param counts: list with the number of checks per day of the year
+    :param year: the displayed year
+    :param title: optional headline
+    """
+    offset = date(year, 1, 1).weekday()
+    weeks = (offset + len(counts) + 6) // 7
+    top = max(counts) if counts and max(counts) > 0 else 1
+    grid = [[" "] * weeks for _ in range(7)]
+    for index, count in enumerate(counts):
+        column, row = divmod(index + offset, 7)
+        level = 0 if count == 0 else 1 + (count * (len(HEAT_LEVELS) - 2)) // top
+        grid[row][column] = HEAT_LEVELS[min(level, len(HEAT_LEVELS) - 1)]
+
+    # Month labels above the first week of every month
+    header = [" "] * (weeks + 3)
+    for month in range(1, 13):
+        first = date(year, month, 1)
+        column = (first.timetuple().tm_yday - 1 + offset) // 7
+        label = first.strftime("%b")
+        if all(c == " " for c in header[column:column + len(label) + 1]):
+            header[column:column + len(label)] = label
+    lines = [title or f"Heatmap {year}", "    " + "".join(header).rstrip()]
+    for row, name in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]):
+        lines.append(f"{name} " + "".join(grid[row]).rstrip())
+    lines.append("    less " + " ".join(HEAT_LEVELS) + " more")
+    return "\n".join(lines)
+
+
+def counts_per_day(bitmaps, year):
+    """Function to sum up several bitmaps of one year to the number of checks per day"""
+    length = days_in_year(year)
+    counts = [0] * length
+    for bitmap in bitmaps:
+        bits = to_int(bitmap)
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            if index < length:
+                counts[index] += 1
+            bits ^= low
+    return counts
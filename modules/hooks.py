@@ -0,0 +1,155 @@
+"""
+This file contains the hook registry of the habit tracker. Own code (metrics, webhooks to local services,
+achievements, ...) can be attached to the following events without changing the managers:
+- 'check': a habit was checked (record_check, also used by check_habit; with the new streak deadline)
+- 'reset_streak': the streak of a habit was reset manually
+- 'reset_rep': the repetition counter of a habit was reset manually
+- 'habit_edit': the interval of a custom habit was changed
+Events are emitted after the commit of the change. Sync handlers run in the emitting thread and should be cheap,
+async handlers run in a thread pool, so a slow handler never delays the caller.
+A failing handler is logged and counted, it never affects the other handlers or the caller.
+Example:
+    import hooks
+    hooks.register("check", lambda event: print(event["habit_name"], event["streak"]), mode="async")
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+EVENTS = ("check", "reset_streak", "reset_rep", "habit_edit")
+
+
+class Hook:
+    """A registered handler with its timing statistics"""
+
+    def __init__(self, event, handler, mode, name):
+        self.event = event
+        self.handler = handler
+        self.mode = mode
+        self.name = name
+        self.calls = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class HookRegistry:
+    """
+    Registry of the handlers per event.
+
+    :param max_workers: Number of threads for the async handlers
+    """
+
+    def __init__(self, max_workers=4):
+        self.hooks = {event: [] for event in EVENTS}
+        self.max_workers = max_workers
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def register(self, event, handler, mode="sync", name=None):
+        """
+        Method to register a handler for an event; returns the name of the hook.
+
+        :param handler: Callable that gets the event as dictionary
+        :param mode: 'sync' (run in the emitting thread) or 'async' (run in the thread pool)
+        :param name: Name of the hook (default: name of the handler)
+        """
+        if event not in self.hooks:
+            raise ValueError(f"Unknown event '{event}'. Please choose one of {', '.join(EVENTS)}.")
+        if mode not in ("sync", "async"):
+            raise ValueError("The mode of a hook must be 'sync' or 'async'.")
+        name = name or getattr(handler, "__name__", repr(handler))
+        with self.lock:
+            self.hooks[event] = [hook for hook in self.hooks[event] if hook.name != name]
+            self.hooks[event].append(Hook(event, handler, mode, name))
+        return name
+
+    def on(self, event, mode="sync"):
+        """Decorator to register a function as handler, e.g. @registry.on('check', mode='async')"""
+        def decorator(handler):
+            self.register(event, handler, mode)
+            return handler
+        return decorator
+
+    def unregister(self, event, name):
+        """Method to remove a hook; returns True if it existed"""
+        with self.lock:
+            hooks = self.hooks.get(event, [])
+            self.hooks[event] = [hook for hook in hooks if hook.name != name]
+            return len(self.hooks[event]) < len(hooks)
+
+    def emit(self, event, **data):
+        """
+        Method to pass an event to all its handlers.
+        Returns the number of handlers that were called or submitted to the thread pool.
+        """
+        hooks = self.hooks.get(event)
+        if not hooks:
+            return 0
+        payload = dict(data, event=event)
+        for hook in list(hooks):
+            if hook.mode == "sync":
+                self.call(hook, payload)
+            else:
+                self.pool().submit(self.call, hook, dict(payload))
+        return len(hooks)
+
+    def call(self, hook, payload):
+        """Method to run one handler with timing and failure isolation"""
+        start = time.perf_counter()
+        failed = False
+        try:
+            hook.handler(payload)
+        except Exception as e:
+            failed = True
+            logging.error(f"The hook '{hook.name}' failed for the event '{hook.event}': {e}")
+        seconds = time.perf_counter() - start
+        with self.lock:
+            hook.calls += 1
+            hook.failures += failed
+            hook.total_seconds += seconds
+            hook.max_seconds = max(hook.max_seconds, seconds)
+
+    def pool(self):
+        """Method to return the thread pool of the async handlers (created on first use)"""
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hook")
+            return self.executor
+
+    def stats(self):
+        """Method to return the timing statistics per hook (calls, failures, mean and max time in ms)"""
+        with self.lock:
+            return [{"event": hook.event, "name": hook.name, "mode": hook.mode, "calls": hook.calls,
+                     "failures": hook.failures,
+                     "mean_ms": round(hook.total_seconds / hook.calls * 1000, 3) if hook.calls else 0.0,
+                     "max_ms": round(hook.max_seconds * 1000, 3)}
+                    for hooks in self.hooks.values() for hook in hooks]
+
+    def shutdown(self, wait=True):
+        """Method to wait for the running async handlers and stop the thread pool"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+# Registry of the program, used by the managers
+registry = HookRegistry()
+
+
+def register(event, handler, mode="sync", name=None):
+    """Function to register a handler in the registry of the program"""
+    return registry.register(event, handler, mode, name)
+
+
+def unregister(event, name):
+    """Function to remove a handler from the registry of the program"""
+    return registry.unregister(event, name)
+
+
+def emit(event, **data):
+    """Function to emit an event to the handlers of the registry of the program"""
+    return registry.emit(event, **data)
@@ -0,0 +1,598 @@
+"""
+This file contains the local HTTP/JSON API of the habit tracker for web frontends, e.g.:
+    POST   /login                  {"identifier": "testuser", "password": "..."} -> {"user_id": ..., "token": ...}
+    GET    /habits                 habits of the user (own habits and the unused predefined habits)
+    POST   /habits                 {"name": "Cold Shower", "interval": "D", "type": "Physical", "description": "..."}
+    GET    /habits/{name}          one habit
+    PATCH  /habits/{name}          {"interval": "W2", "type": ..., "description": ...}
+    DELETE /habits/{name}          delete a custom habit
+    POST   /habits/{name}/check    {"quantity": 5.2} (optional) -> check the habit now
+    GET    /streaks                current and longest streak of every habit
+    GET    /stats[?habit=Yoga]     streaks and check-in statistics
+    GET    /stats/completion       completion rates and adherence per ISO week (see analyze.py)
+    GET    /due[?risk_days=1]      due habits and streaks at risk
+    GET    /export?format=csv      check-in history (csv or jsonl; optional habit, from, to) in chunks
+    GET    /server_stats           number of requests and durations per endpoint
+Every endpoint except /login and /server_stats needs the header 'Authorization: Bearer <session token>'.
+The server is the daemon (see daemon.py) with HTTP/1.1 instead of JSON Lines: the same pool of database
+connections and worker threads, caches and graceful shutdown. Connections are kept alive between requests.
+The GET endpoints return an ETag derived from a hash of the user ID, the data version of the user (see db.py)
+and the current date (due habits and streaks depend on it) with 'Vary: Authorization', so a shared cache never
+answers one user with the data of another; a request with a matching If-None-Match header is answered with
+304 Not Modified without running the query.
+Exports are streamed with chunked transfer encoding batch by batch, so a large history is never held in memory.
+Every export reads on its own read-only connection (not one of the pool) and at most MAX_EXPORTS run at once.
+The server only listens on 127.0.0.1 by default.
+Run: python http_api.py serve, load test: python http_api.py loadtest (uses the session of the last login).
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import re
+import sqlite3
+import time
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+import sessions
+from cli import CommandError, get_streaks, list_habits
+from daemon import HabitDaemon, op_check, op_due, op_stats
+from db_pool import PoolTimeout
+from export import EXPORT_COLUMNS, iter_history_batches
+from habit_manager import add_custom_habit, remove_custom_habit, update_custom_habit
+from periods import parse_interval
+from user_manager import verify_login
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Longest accepted request line or header line and request body in bytes
+MAX_LINE = 16 * 1024
+MAX_BODY = 64 * 1024
+MAX_HEADERS = 64
+
+# Seconds an idle keep-alive connection stays open
+KEEP_ALIVE_SECONDS = 15.0
+
+# Rows per chunk of an export
+EXPORT_BATCH = 1000
+
+# Exports that run at once (each on its own connection, further exports are answered with 503)
+MAX_EXPORTS = 2
+
+
+class HttpError(Exception):
+    """Error that is answered with an HTTP status code and a JSON body {"error": message}"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+### HTTP messages
+
+async def read_request(reader):
+    """Function to read one request (request line, headers and body); returns None at the end of the connection"""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Invalid request line.") from None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+        if len(headers) > MAX_HEADERS:
+            raise HttpError(431, "Too many headers.")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length.") from None
+    if length > MAX_BODY:
+        raise HttpError(413, "The request body is too large.")
+    body = await reader.readexactly(length) if length > 0 else b""
+    url = urlsplit(target)
+    return {"method": method.upper(), "path": unquote(url.path), "query": dict(parse_qsl(url.query)),
+            "version": version.upper(), "headers": headers, "body": body}
+
+
+def keeps_alive(request):
+    """Function to tell whether the connection stays open after the request (default of HTTP/1.1)"""
+    connection = request["headers"].get("connection", "").lower()
+    if request["version"] == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def response_head(status, headers, keep_alive):
+    """Function to build the status line and the headers of a response"""
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", "Connection: " + ("keep-alive" if keep_alive else "close")]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def write_response(writer, status, body=None, headers=None, keep_alive=True):
+    """Function to write a response with a JSON body (no body for 204 and 304)"""
+    headers = dict(headers or {})
+    payload = b"" if body is None or status in (204, 304) else json.dumps(body, default=str).encode("utf-8")
+    if payload:
+        headers["Content-Type"] = "application/json"
+    if status != 304:
+        headers["Content-Length"] = len(payload)
+    writer.write(response_head(status, headers, keep_alive) + payload)
+
+
+def json_body(request):
+    """Function to return the JSON object of the request body (empty body: empty object)"""
+    if not request["body"]:
+        return {}
+    try:
+        body = json.loads(request["body"])
+    except ValueError:
+        raise HttpError(400, "The request body is not valid JSON.") from None
+    if not isinstance(body, dict):
+        raise HttpError(400, "The request body must be a JSON object.")
+    return body
+
+
+### Endpoints (run on a worker thread with a connection of the pool; return status and body)
+
+def find_habit(api, cur, user_id, name):
+    """Function to return the stored name of a habit of the user or answer with 404"""
+    try:
+        return api.habit_name(cur, user_id, name)
+    except CommandError as e:
+        raise HttpError(404, str(e)) from None
+
+
+def habit_entry(cur, user_id, habit_name):
+    """Function to return one habit of the list of the user"""
+    return next(habit for habit in list_habits(cur, user_id) if habit["habit_name"] == habit_name)
+
+
+def post_login(api, db, user_id, request, match):
+    """Endpoint to log in with user name or user ID and password; returns a session token"""
+    body = json_body(request)
+    user_id = verify_login(db.cursor(), db, str(body.get("identifier", "")), str(body.get("password", "")), "http")
+    if not user_id:
+        raise HttpError(401, "Login failed.")
+    return 200, {"user_id": user_id, "token": sessions.create_session(db.cursor(), db, user_id)}
+
+
+def get_habits(api, db, user_id, request, match):
+    """Endpoint to list the habits of the user"""
+    return 200, list_habits(db.cursor(), user_id)
+
+
+def post_habit(api, db, user_id, request, match):
+    """Endpoint to create a custom habit"""
+    body = json_body(request)
+    interval = parse_interval(str(body.get("interval") or "D"))
+    habit_name = add_custom_habit(db.cursor(), db, user_id, str(body.get("name") or ""), interval,
+                                  str(body.get("type") or ""), str(body.get("description") or ""))
+    if not habit_name:
+        raise HttpError(409, f"The habit '{body.get('name')}' already exists or has no name.")
+    return 201, habit_entry(db.cursor(), user_id, habit_name)
+
+
+def get_habit(api, db, user_id, request, match):
+    """Endpoint to return one habit"""
+    cur = db.cursor()
+    return 200, habit_entry(cur, user_id, find_habit(api, cur, user_id, match["name"]))
+
+
+def patch_habit(api, db, user_id, request, match):
+    """Endpoint to change interval, type or definition of a habit"""
+    body = json_body(request)
+    cur = db.cursor()
+    habit_name = find_habit(api, cur, user_id, match["name"])
+    interval = parse_interval(str(body["interval"])) if body.get("interval") else None
+    if not update_custom_habit(cur, db, user_id, habit_name, interval, body.get("type"), body.get("description")):
+        raise HttpError(404, f"'{habit_name}' is a predefined habit that is not in use yet.")
+    return 200, habit_entry(cur, user_id, habit_name)
+
+
+def delete_habit(api, db, user_id, request, match):
+    """Endpoint to delete a custom habit with its check-ins, calendar bitmaps, rollups and goals"""
+    cur = db.cursor()
+    habit_name = find_habit(api, cur, user_id, match["name"])
+    if not remove_custom_habit(cur, db, user_id, habit_name):
+        raise HttpError(404, f"'{habit_name}' is not a custom habit.")
+    for key in [key for key, name in api.habit_names.items() if key[0] == user_id and name == habit_name]:
+        api.habit_names.pop(key, None)
+    return 204, None
+
+
+def post_check(api, db, user_id, request, match):
+    """Endpoint to check a habit now (201 Created for a new check-in, 200 for a duplicate)"""
+    body = json_body(request)
+    find_habit(api, db.cursor(), user_id, match["name"])
+    result = op_check(api, db, user_id, {"habit": match["name"], "quantity": body.get("quantity")})
+    return (201 if result["status"] == "checked" else 200), result
+
+
+def get_habit_streaks(api, db, user_id, request, match):
+    """Endpoint to return the current and the longest streak of every habit"""
+    return 200, get_streaks(db.cursor(), user_id)
+
+
+def get_habit_stats(api, db, user_id, request, match):
+    """Endpoint to return the statistics of the habits (optional habit)"""
+    return 200, op_stats(api, db, user_id, request["query"])
+
+
+def get_completion(api, db, user_id, request, match):
+    """Endpoint to return the completion rates and the adherence per ISO week (optional weeks)"""
+    from analyze import get_completion_rates  # pandas is only loaded for this endpoint
+    rates, adherence = get_completion_rates(db.cursor(), user_id, weeks=int(request["query"].get("weeks", 12)))
+    return 200, {"rates": rates.to_dict("records"), "adherence": adherence.to_dict("records")}
+
+
+def get_due(api, db, user_id, request, match):
+    """Endpoint to return the due habits (optional risk_days)"""
+    return 200, op_due(api, db, user_id, request["query"])
+
+
+# Endpoints: method, path pattern, function (or a request answered on the event loop),
+# needs a session, answered with ETag/304
+ROUTES = [
+    ("POST", r"/login", post_login, False, False),
+    ("GET", r"/habits", get_habits, True, True),
+    ("POST", r"/habits", post_habit, True, False),
+    ("GET", r"/habits/(?P<name>[^/]+)", get_habit, True, True),
+    ("PATCH", r"/habits/(?P<name>[^/]+)", patch_habit, True, False),
+    ("DELETE", r"/habits/(?P<name>[^/]+)", delete_habit, True, False),
+    ("POST", r"/habits/(?P<name>[^/]+)/check", post_check, True, False),
+    ("GET", r"/streaks", get_habit_streaks, True, True),
+    ("GET", r"/stats", get_habit_stats, True, True),
+    ("GET", r"/stats/completion", get_completion, True, True),
+    ("GET", r"/due", get_due, True, True),
+    ("GET", r"/export", "export", True, False),  # streamed on the event loop (see HttpApi.stream_export)
+    ("GET", r"/server_stats", "server_stats", False, False),
+]
+ROUTES = [(method, re.compile(pattern + "/?"), *rest) for method, pattern, *rest in ROUTES]
+
+
+def find_route(method, path):
+    """Function to return the endpoint and the path parameters of a request (or answer with 404/405)"""
+    allowed = []
+    for route in ROUTES:
+        match = route[1].fullmatch(path)
+        if match:
+            if route[0] == method:
+                return route, match.groupdict()
+            allowed.append(route[0])
+    if allowed:
+        raise HttpError(405, f"Method {method} is not allowed for '{path}'.", {"Allow": ", ".join(allowed)})
+    raise HttpError(404, f"There is no endpoint '{path}'.")
+
+
+def bearer_token(request):
+    """Function to return the session token of the Authorization header"""
+    scheme, _, token = request["headers"].get("authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else ""
+
+
+def format_rows(rows, fmt):
+    """Function to format a batch of exported rows as CSV or JSON Lines"""
+    if fmt == "jsonl":
+        return "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows).encode("utf-8")
+    text = io.StringIO()
+    csv.writer(text, lineterminator="\n").writerows(rows)
+    return text.getvalue().encode("utf-8")
+
+
+class HttpApi(HabitDaemon):
+    """
+    Asyncio HTTP/1.1 server of the habit tracker (see HabitDaemon for the worker threads and the shutdown).
+
+    :param db_path: Path of the database file
+    :param host: Address to listen on (only local clients by default)
+    :param port: TCP port (0: any free port, see self.port after start)
+    :param workers: Number of worker threads (and database connections)
+    :param max_pending: Maximum number of requests that wait for a worker thread
+    :param request_timeout: Seconds until a request is answered with 504 Gateway Timeout
+    :param keep_alive: Seconds an idle connection stays open
+    """
+
+    NAME = "habit tracker HTTP API"
+
+    def __init__(self, db_path="main_db.db", host=DEFAULT_HOST, port=DEFAULT_PORT, workers=4, max_pending=64,
+                 request_timeout=10.0, keep_alive=KEEP_ALIVE_SECONDS):
+        super().__init__(db_path, None, workers, max_pending, request_timeout)
+        self.host = host
+        self.port = port
+        self.keep_alive = keep_alive
+        self.exports = None
+
+    ### Requests
+
+    def authenticate(self, cur, request):
+        """Method to return the user of the bearer token of a request or answer with 401"""
+        user_id = self.session_user(cur, bearer_token(request)) if bearer_token(request) else None
+        if not user_id:
+            raise HttpError(401, "Invalid or missing session token.", {"WWW-Authenticate": "Bearer"})
+        return user_id
+
+    def run_route(self, route, params, request):
+        """Method that runs one endpoint on a worker thread; returns status, body and headers"""
+        method, pattern, handler, needs_session, cached = route
+        with self.pool.connection(timeout=self.request_timeout) as db:
+            cur = db.cursor()
+            user_id = self.authenticate(cur, request) if needs_session else None
+            headers = {}
+            if cached:
+                cur.execute("SELECT data_version FROM user WHERE user_id = ?", (user_id,))
+                user_hash = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:16]
+                etag = f'W/"{user_hash}-{cur.fetchone()[0]}-{date.today():%Y%m%d}"'
+                headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+                if etag in [tag.strip() for tag in request["headers"].get("if-none-match", "").split(",")]:
+                    return 304, None, headers
+            status, body = handler(self, db, user_id, request, params)
+            return status, body, headers
+
+    async def respond(self, state, request, writer, keep_alive):
+        """Method to answer one request; returns the status code (None if the connection was closed)"""
+        start = time.perf_counter()
+        name, headers = "invalid", {}
+        try:
+            route, params = find_route(request["method"], request["path"])
+            name = f"{route[0]} {route[1].pattern[:-2]}"
+            if route[2] == "server_stats":
+                status, body = 200, self.server_stats()
+            elif route[2] == "export":
+                return await self.stream_export(request, writer, keep_alive, start)
+            else:
+                status, body, headers = await self.run_worker(state, self.run_route, route, params, request)
+        except PoolTimeout as e:
+            status, body = 503, {"error": str(e)}
+        except asyncio.TimeoutError:
+            status, body = 504, {"error": "The request timed out. It is still running and may still be applied.",
+                                 "running": True}
+        except HttpError as e:
+            status, body, headers = e.status, {"error": str(e)}, e.headers
+        except (CommandError, ValueError, TypeError, KeyError) as e:
+            status, body = 400, {"error": str(e)}
+        except sqlite3.Error as e:
+            status, body = 500, {"error": f"A database error occurred: {e}"}
+        write_response(writer, status, body, headers, keep_alive)
+        await writer.drain()
+        self.record_timing(name, status, start)
+        return status
+
+    def open_export_connection(self):
+        """Method to open the read-only connection of an export (runs on a worker thread)"""
+        db = sqlite3.connect(self.db_path, timeout=self.request_timeout, check_same_thread=False)
+        db.execute("PRAGMA query_only = ON")
+        return db
+
+    async def stream_export(self, request, writer, keep_alive, start):
+        """
+        Method to stream the check-in history in chunks (one chunk per batch of rows).
+        The export reads on its own connection until it is complete (the connections of the pool stay free for
+        the other requests); the worker threads are only used to fetch the next batch.
+        """
+        query = request["query"]
+        fmt = query.get("format", "csv")
+        if fmt not in ("csv", "jsonl"):
+            raise HttpError(400, f"Unsupported export format '{fmt}' (csv or jsonl).")
+        if self.exports.locked():
+            raise HttpError(503, "Too many exports are running. Please try again later.", {"Retry-After": "5"})
+        loop = asyncio.get_running_loop()
+        async with self.exports:
+            db = await loop.run_in_executor(self.executor, self.open_export_connection)
+            batches, started = None, False
+            try:
+                def open_export():
+                    cur = db.cursor()
+                    user_id = self.authenticate(cur, request)
+                    habit_name = find_habit(self, cur, user_id, query["habit"]) if query.get("habit") else None
+                    return iter_history_batches(cur, user_id, habit_name, query.get("from"), query.get("to"),
+                                                batch_size=EXPORT_BATCH)
+                batches = await loop.run_in_executor(self.executor, open_export)
+                started = True
+                writer.write(response_head(200, {"Content-Type": "text/csv" if fmt == "csv" else "application/x-ndjson",
+                                                 "Content-Disposition": f"attachment; filename=history.{fmt}",
+                                                 "Transfer-Encoding": "chunked"}, keep_alive))
+                if fmt == "csv":
+                    header = (",".join(EXPORT_COLUMNS) + "\n").encode("utf-8")
+                    writer.write(b"%X\r\n%s\r\n" % (len(header), header))
+                while True:
+                    rows = await loop.run_in_executor(self.executor, next, batches, None)
+                    if rows is None:
+                        break
+                    chunk = format_rows(rows, fmt)
+                    writer.write(b"%X\r\n%s\r\n" % (len(chunk), chunk))
+                    await writer.drain()  # backpressure: the next batch is fetched once the client has read this one
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            except sqlite3.Error:
+                if not started:
+                    raise
+                # The status line was already sent: the client notices the missing last chunk
+                writer.close()
+                self.record_timing("GET /export", 500, start)
+                return None
+            finally:
+                if batches is not None:
+                    await loop.run_in_executor(self.executor, batches.close)
+                await loop.run_in_executor(self.executor, db.close)
+        self.record_timing("GET /export", 200, start)
+        return 200
+
+    def record_timing(self, name, status, start):
+        """Method to add the duration of a request to the statistics of its endpoint"""
+        ms = (time.perf_counter() - start) * 1000
+        timing = self.timings.setdefault(name, [0, 0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += status >= 400
+        timing[2] += ms
+        timing[3] = max(timing[3], ms)
+
+    async def handle_client(self, reader, writer):
+        """Method that serves one keep-alive connection until it is closed, idle too long or the server shuts down"""
+        state = {"user_id": None, "busy": False, "writer": writer}
+        self.clients[asyncio.current_task()] = state
+        try:
+            while not self.closing:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), self.keep_alive)
+                except HttpError as e:
+                    write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    await writer.drain()
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    break  # idle connection, incomplete body or line longer than MAX_LINE
+                if request is None:
+                    break
+                state["busy"] = True
+                keep_alive = keeps_alive(request) and not self.closing
+                status = await self.respond(state, request, writer, keep_alive)
+                state["busy"] = False
+                if not keep_alive or status is None:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(asyncio.current_task(), None)
+            writer.close()
+
+    ### Start
+
+    async def start(self):
+        """Method to open the connection pool and listen on the TCP port"""
+        self.open_resources()
+        self.exports = asyncio.Semaphore(MAX_EXPORTS)
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=MAX_LINE)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.address = f"http://{self.host}:{self.port}"
+
+
+### Clients
+
+class HttpClient:
+    """Minimal asyncio HTTP/1.1 client with one keep-alive connection (for tests and the load test)"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, token=None):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def request(self, method, path, body=None, headers=None):
+        """Method to send one request; returns status, headers and the body (parsed if it is JSON)"""
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        lines = [f"{method} {quote(path, safe='/?=&')} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Content-Length: {len(payload)}"]
+        if self.token:
+            lines.append(f"Authorization: Bearer {self.token}")
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("The server closed the connection.")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        if response_headers.get("transfer-encoding") == "chunked":
+            data = bytearray()
+            while size := int((await self.reader.readline()).strip(), 16):
+                data += await self.reader.readexactly(size)
+                await self.reader.readexactly(2)
+            await self.reader.readexactly(2)
+        else:
+            data = await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+        if response_headers.get("content-type") == "application/json":
+            return status, response_headers, json.loads(data)
+        return status, response_headers, bytes(data)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+async def load_test(host, port, token, requests=1000, concurrency=10, path="/stats", conditional=False):
+    """
+    Function to measure the API with concurrent keep-alive clients: every client sends its share of
+    the GET requests one after the other. With conditional, the ETag of the previous response is sent
+    (If-None-Match), as a browser does, so unchanged data is answered with 304.
+    Returns the number of requests, errors and 304 responses, the throughput and the p50/p99/max latency in ms.
+    """
+    latencies, errors, not_modified = [], 0, 0
+
+    async def run_client(count):
+        nonlocal errors, not_modified
+        client = await HttpClient(host, port, token).connect()
+        etag = None
+        try:
+            for _ in range(count):
+                begin = time.perf_counter()
+                status, headers, _ = await client.request("GET", path, headers={"If-None-Match": etag} if etag else None)
+                latencies.append((time.perf_counter() - begin) * 1000)
+                errors += status >= 400
+                not_modified += status == 304
+                if conditional:
+                    etag = headers.get("etag", etag)
+        finally:
+            await client.close()
+
+    shares = [requests // concurrency + (number < requests % concurrency) for number in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(count) for count in shares if count))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "not_modified": not_modified,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(latencies) / seconds, 1) if seconds else 0,
+        "p50_ms": round(latencies[len(latencies) // 2], 3) if latencies else 0,
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3) if latencies else 0,
+        "max_ms": round(latencies[-1], 3) if latencies else 0,
+    }
+
+
+# Operators start the server or a load test directly
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON API of the habit tracker.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the server until SIGINT or SIGTERM")
+    serve.add_argument("--db", default="main_db.db")
+    serve.add_argument("--workers", type=int, default=4)
+    serve.add_argument("--max-pending", type=int, default=64)
+    test = commands.add_parser("loadtest", help="send GET requests with concurrent keep-alive clients")
+    test.add_argument("--requests", type=int, default=1000)
+    test.add_argument("--concurrency", type=int, default=10)
+    test.add_argument("--path", default="/stats")
+    test.add_argument("--conditional", action="store_true", help="send If-None-Match with the last ETag")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        asyncio.run(HttpApi(args.db, args.host, args.port, args.workers, args.max_pending).serve())
+    else:
+        report = asyncio.run(load_test(args.host, args.port, sessions.load_token(), args.requests,
+                                       args.concurrency, args.path, args.conditional))
+        print(json.dumps(report))
@@ -0,0 +1,221 @@
+"""
+This file contains functions to import the check-in history of a user from CSV or JSON Lines files
+(optionally gzip-compressed), e.g. when migrating from another habit tracker.
+The file is streamed record by record. Habit names are validated against the habits of the user,
+which are loaded once before the import. Valid records are inserted into the counter table
+in chunks within one transaction (a failed import leaves no partial history) and the streaks, calendar bitmaps, measurement rollups and goals of every imported habit
+are recomputed once at the end.
+Rejected records are collected in a report.
+"""
+
+import csv
+import gzip
+import json
+import sqlite3
+import time
+from contextlib import nullcontext
+from datetime import date
+from db import pause_data_version, rebuild_calendar, rebuild_rollup, resume_data_version
+from habit_manager import ensure_user_habit
+from counter_manager import recompute_streaks
+from goal_manager import refresh_goals
+
+# Target of the import benchmark: 1 million rows per minute
+BENCHMARK_ROWS_PER_MINUTE = 1_000_000
+
+# Insert of an imported check-in; a check-in of the same day keeps the larger repetitions and quantity,
+# so importing the same file twice changes nothing (streaks are recomputed afterwards, see recompute_streaks)
+INSERT_CHECK = """INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak, quantity)
+               VALUES (?, ?, ?, ?, ?, 0, ?) ON CONFLICT(user_id, habit_name, check_date) DO UPDATE
+               SET habit_rep = MAX(habit_rep, excluded.habit_rep),
+               quantity = CASE WHEN excluded.quantity IS NULL THEN quantity
+                               ELSE MAX(COALESCE(quantity, 0), excluded.quantity) END"""
+
+
+def open_input(path):
+    """Function to open an input file for reading, gzip-compressed if it ends with '.gz'"""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def detect_format(path):
+    """Function to detect the input format ('csv' or 'jsonl') from the file name"""
+    name = str(path).lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if name.endswith((".jsonl", ".json", ".ndjson")):
+        return "jsonl"
+    if name.endswith((".csv", ".txt")):
+        return "csv"
+    raise ValueError(f"Unknown import format of '{path}'. Please use a .csv or .jsonl file.")
+
+
+def iter_records(file, fmt):
+    """
+    Generator that yields (line number, record) for every record of an opened file.
+    Records are dictionaries; lines that cannot be parsed are yielded as strings.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_no, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else line.rstrip("\n")
+
+
+def validate_record(record, habits):
+    """
+    Function to validate a single record.
+    Returns (row, None) for a valid record or (None, reason) for a rejected one.
+
+    :param record: Dictionary with habit_name, check_date and optional check_time, habit_rep and quantity
+    :param habits: Dictionary of lower-case habit names to original habit names
+    """
+    if not isinstance(record, dict):
+        return None, "invalid line"
+    habit_name = habits.get(str(record.get("habit_name") or "").strip().lower())
+    if habit_name is None:
+        return None, "unknown habit"
+    check_date = str(record.get("check_date") or "").strip()
+    try:
+        if len(check_date) != 10:
+            raise ValueError
+        date.fromisoformat(check_date)
+    except ValueError:
+        return None, "invalid date"
+    check_time = str(record.get("check_time") or "00:00:00").strip()
+    try:
+        habit_rep = record.get("habit_rep")
+        habit_rep = 1 if habit_rep in (None, "") else int(habit_rep)
+    except (TypeError, ValueError):
+        return None, "invalid repetitions"
+    if habit_rep < 0:
+        return None, "invalid repetitions"
+    try:
+        quantity = record.get("quantity")
+        quantity = None if quantity in (None, "") else float(quantity)
+    except (TypeError, ValueError):
+        return None, "invalid quantity"
+    if quantity is not None and not quantity >= 0:
+        return None, "invalid quantity"
+    return (habit_name, check_date, check_time, habit_rep, quantity), None
+
+
+def import_history(cur, db, user_id, path=None, fmt=None, chunk_size=10000, rejected_path=None, records=None):
+    """
+    Function to bulk-import check-ins of a user from a CSV or JSON Lines file.
+
+    :param path: Path of the input file (.csv, .jsonl, optionally .gz)
+    :param fmt: 'csv' or 'jsonl' (detected from the file name if not given)
+    :param chunk_size: Number of records per insert (the whole import is one transaction)
+    :param rejected_path: Optional CSV file for the report of rejected records
+    :param records: Iterable of (line number, record) to import instead of a file (e.g. a backfill of the CLI)
+    :return: Dictionary with the number of imported and rejected records, the imported habits,
+             the rejected records (first 100), the duration and the error message (None if the import
+             succeeded; nothing is imported after an error)
+    """
+    start = time.perf_counter()
+    if records is None:
+        fmt = fmt or detect_format(path)
+
+    # Load all habits of the user once (custom, own copies and predefined habits)
+    cur.execute("SELECT habit_name FROM habits WHERE user_id = ? OR (is_custom = 0 AND user_id IS NULL)",
+                (user_id,))
+    habits = {name.lower(): name for (name,) in cur.fetchall()}
+
+    imported, rejected, touched, chunk, report, error = 0, 0, set(), [], [], None
+    report_file = open(rejected_path, "w", encoding="utf-8", newline="") if rejected_path else None
+    report_writer = csv.writer(report_file) if report_file else None
+    if report_writer:
+        report_writer.writerow(["line", "reason", "record"])
+
+    def flush():
+        # Insert one chunk (committed together with the recomputation at the end)
+        cur.executemany(INSERT_CHECK, chunk)
+        chunk.clear()
+
+    try:
+        pause_data_version(cur, [user_id])  # the data version is incremented once for the whole import
+        with open_input(path) if records is None else nullcontext() as file:
+            for line_no, record in iter_records(file, fmt) if records is None else records:
+                row, reason = validate_record(record, habits)
+                if reason:
+                    rejected += 1
+                    if len(report) < 100:
+                        report.append((line_no, reason, record))
+                    if report_writer:
+                        report_writer.writerow([line_no, reason, json.dumps(record)])
+                    continue
+                if row[0] not in touched:
+                    # Predefined habits are bound to the user before their first record
+                    ensure_user_habit(cur, user_id, row[0])
+                    touched.add(row[0])
+                chunk.append((user_id,) + row)
+                imported += 1
+                if len(chunk) >= chunk_size:
+                    flush()
+            if chunk:
+                flush()
+
+        # Recompute the streaks, calendar bitmaps and measurement rollups once per imported habit
+        for habit_name in sorted(touched):
+            recompute_streaks(cur, db, user_id, habit_name, commit=False)
+            rebuild_calendar(cur, db, user_id, habit_name, commit=False)
+            rebuild_rollup(cur, db, user_id, habit_name, commit=False)
+            refresh_goals(cur, user_id, habit_name)
+        resume_data_version(cur)
+        db.commit()
+    except (sqlite3.Error, OSError, csv.Error, UnicodeDecodeError) as e:
+        db.rollback()
+        imported = 0
+        touched.clear()
+        error = f"An error occurred while importing '{path or 'the records'}': {e}"
+    finally:
+        if report_file:
+            report_file.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        "imported": imported,
+        "rejected": rejected,
+        "habits": sorted(touched),
+        "rejected_rows": report,
+        "seconds": seconds,
+        "rows_per_minute": imported / seconds * 60 if seconds else 0,
+        "error": error,
+    }
+
+
+def import_menu(cur, db, user_id):
+    """Function to let the user import a check-in history in the CLI"""
+    print("\nWith this option you can import your check-in history from a CSV or JSON Lines file.")
+    print("Required columns/keys: habit_name, check_date (YYYY-MM-DD); optional: check_time, habit_rep, quantity.")
+    while True:
+        path = input("\nPlease enter the path of the file or type 'x' to cancel: ").strip()
+        if path.lower() == "x":
+            print("Action was cancelled. Returning to menu.")
+            return None
+        try:
+            detect_format(path)
+            with open_input(path):
+                break
+        except (ValueError, OSError) as e:
+            print(f"The file cannot be imported: {e}")
+
+    rejected_path = f"{path}.rejected.csv"
+    result = import_history(cur, db, user_id, path, rejected_path=rejected_path)
+    if result["error"]:
+        print(result["error"])
+        return result
+    print(f"***{result['imported']} records were imported for {len(result['habits'])} habit(s).***")
+    if result["rejected"]:
+        print(f"{result['rejected']} records were rejected. See the report '{rejected_path}'.")
+    return result
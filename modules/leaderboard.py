@@ -0,0 +1,151 @@
+"""
+This file contains the leaderboard of the users with the longest current and all-time streaks,
+per habit and over all habits.
+The all-time streaks come from habits.max_streak, the current streaks from habits.cur_streak,
+which is updated on every check-in together with the date until which the streak is alive (habits.streak_deadline). Both are backed by indexes, so a top-k read is an index range scan.
+Ties get the same rank and pages are read with a cursor (keyset pagination).
+"""
+
+import sqlite3
+import pandas as pd
+from datetime import date
+from db import DELETED_USERS
+
+# Column of the habits table and its index per metric
+METRICS = {"max": "max_streak", "current": "cur_streak"}
+
+# One page of the leaderboard (range scan of a leaderboard index, see build_query and alive_filter)
+LEADERBOARD_QUERY = """SELECT h.user_id, u.user_name, h.habit_name, h.{column} FROM habits AS h
+                    JOIN user AS u ON u.user_id = h.user_id
+                    WHERE {where}{alive} ORDER BY {order} LIMIT ?"""
+
+
+def build_query(habit_name, column, after):
+    """Function to build the range scan for one page; returns the WHERE clause, parameters and ORDER BY"""
+    where = [f"h.{column} > 0"]
+    params = []
+    if habit_name:
+        where.insert(0, "h.habit_name = ?")
+        params.append(habit_name)
+        order = f"h.{column} DESC, h.user_id"
+        if after:
+            streak, user_id = after[0], after[1]
+            # The extra upper bound keeps the condition a range on the leading index column
+            where.append(f"h.{column} <= ? AND (h.{column} < ? OR h.user_id > ?)")
+            params += [streak, streak, user_id]
+    else:
+        order = f"h.{column} DESC, h.user_id, h.habit_name"
+        if after:
+            streak, user_id, name = after[:3]
+            where.append(f"h.{column} <= ? AND (h.{column} < ? OR h.user_id > ? "
+                         "OR (h.user_id = ? AND h.habit_name > ?))")
+            params += [streak, streak, user_id, user_id, name]
+    return " AND ".join(where), params, order
+
+
+def page_query(habit_name, column, limit, after=None, today=None):
+    """Function to return the query of one page of the leaderboard and its parameters"""
+    where, params, order = build_query(habit_name, column, after)
+    alive, alive_params = alive_filter(column, today)
+    return (LEADERBOARD_QUERY.format(column=column, where=where, alive=alive, order=order),
+            params + alive_params + [limit])
+
+
+def alive_filter(column, today):
+    """
+    Function to exclude deleted accounts and current streaks that can no longer be continued
+    (deadline of the habit interval passed)
+    """
+    active = f" AND h.user_id NOT IN ({DELETED_USERS})"
+    if column != "cur_streak":
+        return active, []
+    today = today or date.today()
+    return active + " AND h.streak_deadline >= ?", [today.isoformat()]
+
+
+def get_leaderboard(cur, habit_name=None, metric="max", limit=10, after=None, today=None):
+    """
+    Function to read one page of the leaderboard.
+
+    :param habit_name: Leaderboard of one habit or over all habits (None)
+    :param metric: 'max' (longest streak ever) or 'current' (current streak)
+    :param limit: Number of entries per page
+    :param after: Cursor returned for the previous page (None for the first page)
+    :param today: Reference date for current streaks (default: today)
+    :return: List of entries (rank, user_id, user_name, habit_name, streak) and the cursor of the next page
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Please choose 'max' or 'current'.")
+    column = METRICS[metric]
+    alive, alive_params = alive_filter(column, today)
+    cur.execute(*page_query(habit_name, column, limit, after, today))
+    rows = cur.fetchall()
+    if not rows:
+        return [], None
+
+    # Rank of the first entry: 1 + number of entries with a longer streak (index range count)
+    count_where = f"h.{column} > ?" + (" AND h.habit_name = ?" if habit_name else "")
+    count_params = [rows[0][3]] + ([habit_name] if habit_name else [])
+    cur.execute(f"SELECT COUNT(*) FROM habits AS h WHERE {count_where}{alive}", count_params + alive_params)
+    rank = 1 + cur.fetchone()[0]
+    position = rank
+    if after and after[0] == rows[0][3]:
+        # The tie group continues from the previous page
+        rank, position = after[-1], after[-2] + 1
+
+    entries = []
+    previous = None
+    for user_id, user_name, name, streak in rows:
+        if previous is not None:
+            position += 1
+            if streak != previous:
+                rank = position
+        entries.append({"rank": rank, "user_id": user_id, "user_name": user_name,
+                        "habit_name": name, "streak": streak})
+        previous = streak
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = entries[-1]
+        key = (last["streak"], last["user_id"]) if habit_name else (last["streak"], last["user_id"], last["habit_name"])
+        next_cursor = key + (position, rank)
+    return entries, next_cursor
+
+
+def show_leaderboard(cur, habit_name=None, metric="max", limit=10, after=None):
+    """Function to display one page of the leaderboard; returns the DataFrame and the cursor of the next page"""
+    columns = ["Rank", "User", "Habit", "Streak"]
+    try:
+        entries, next_cursor = get_leaderboard(cur, habit_name, metric, limit, after)
+        if not entries:
+            print("\nNo streaks available for the leaderboard.")
+            return pd.DataFrame(columns=columns), None
+        df = pd.DataFrame([(e["rank"], e["user_name"], e["habit_name"], e["streak"]) for e in entries],
+                          columns=columns)
+        kind = "longest streaks ever" if metric == "max" else "current streaks"
+        print(f"\nLeaderboard of the {kind}" + (f" for '{habit_name}':" if habit_name else " over all habits:"))
+        print(df.to_string(index=False))
+        return df, next_cursor
+    except sqlite3.Error as e:
+        print(f"An error occurred while retrieving the leaderboard: {e}")
+        return pd.DataFrame(columns=columns), None
+
+
+def leaderboard_menu(cur):
+    """Function to let the user browse the leaderboard in the CLI"""
+    habit_name = input("\nEnter the name of a habit or press enter for all habits: ").strip() or None
+    if habit_name:
+        # Map the input to the original-cased habit name
+        cur.execute("SELECT habit_name FROM habits WHERE LOWER(habit_name) = ? LIMIT 1", (habit_name.lower(),))
+        row = cur.fetchone()
+        if not row:
+            print("Habit does not exist. Returning to menu.")
+            return
+        habit_name = row[0]
+    metric = "current" if input("Type 'C' for current streaks or press enter for the longest streaks ever: "
+                                ).strip().lower() == "c" else "max"
+    after = None
+    while True:
+        _, after = show_leaderboard(cur, habit_name, metric, after=after)
+        if not after or input("Type 'N' for the next page or press enter to return: ").strip().lower() != "n":
+            return
@@ -3,6 +3,10 @@ This file contains the main program to guide a user through the habit tracker ba
 It makes use of several modules such as:
 - counter (for updating habit counters and streaks),
 - analyze (for data analysis),
+- export (for exporting the tracking data),
+- importer (for importing a check-in history),
+- sessions (for staying logged in between program runs),
+- leaderboard (for the streak leaderboard of all users),
 - db (for database operations),
 - habit (for habit-related actions),
 - user (for user profile management).
@@ -10,10 +14,18 @@ It makes use of several modules such as:
 The code is organized into separate functions for the different menus and operations.
 """
 
+import sys
 from counter import Counter
 import analyze
-from db import get_db, close_db, initialize_db
+import export
+import importer
+import leaderboard
+import due
+import sessions
+from purger import AccountPurger
+from db import get_db, close_db, initialize_db, create_tables
 from habit import Habit
+from goal import Goal
 from user import User
 
 # ----------------------------------------
@@ -90,6 +102,9 @@ def database_needed():
             print("No tables were found. Initializing database...")
             initialize_db(cur, db)
             print("Database has been successfully created and initialized.")
+        else:
+            # Add tables of newer program versions to an existing database
+            create_tables(cur, db)
     except Exception as e:
         print(f"An error occurred while checking the database: {e}. Exiting program.")
         return None, None
@@ -102,8 +117,17 @@ def login_user_menu(cur, db):
     """
     Display the login menu where the user can choose to log in,
     create a new profile, or exit the program.
+    A valid session of an earlier program run skips the login.
     Returns the user identifier (username or ID) upon successful authentication.
     """
+    user_id = sessions.validate_session(cur, sessions.load_token())
+    if user_id:
+        # Show the login ID of the user (it differs from the internal user ID after a change in the profile)
+        cur.execute("SELECT login_id FROM user WHERE user_id = ?", (user_id,))
+        row = cur.fetchone()
+        login_id = row[0] if row and row[0] else user_id
+        print(f"Welcome back! You are still logged in as '{login_id}'.")
+        return user_id
     print("Do you already have a user profile?")
     log_input = input("Yes = 1, No = 2, Exit = 3: ").strip()
     user = User(db)
@@ -114,6 +138,7 @@ def login_user_menu(cur, db):
         **************************************
         """)
         user_id = user.user_auth()
+        start_session(cur, db, user_id)
         return user_id
     elif log_input == "2":
         print("""
@@ -124,6 +149,7 @@ def login_user_menu(cur, db):
         # 1. Create the profile
         user.create_profile()
         user_id = user.user_id
+        start_session(cur, db, user_id)
         return user_id
 
         # 2. Verify that profile is in database
@@ -141,6 +167,15 @@ def login_user_menu(cur, db):
         print("Invalid input. Exiting program.")
         return None
 
+def start_session(cur, db, user_id):
+    """Start a session after a successful login, so the next program run skips the login."""
+    if not user_id:
+        return
+    try:
+        sessions.save_token(sessions.create_session(cur, db, user_id))
+    except Exception as e:
+        print(f"An error occurred while saving the session: {e}")
+
 # -----------------------------------------------
 # Step 4: Main User Menu (after successful login)
 # ------------------------------------------------
@@ -208,10 +243,17 @@ def view_habits(cur, user_id):
         7. Current Streak Breaks
         8. Streak for Specific Habit
         9. Total Number of Repetitions
-        10. Return to Main Menu
+        10. Completion Rates & Trends
+        11. Year Heatmap
+        12. Export Tracking Data
+        13. Leaderboard
+        14. Measurement Statistics
+        15. Goals & Progress
+        16. Due Habits (still to check in this period)
+        17. Return to Main Menu
         *****************************************
         """)
-        choice = input("Please select an option (1-10): ").strip()
+        choice = input("Please select an option (1-17): ").strip()
         if choice == "1":
             analyze.show_predef_habits(cur)
         elif choice == "2":
@@ -231,10 +273,24 @@ def view_habits(cur, user_id):
         elif choice == "9":
             analyze.show_rep_number(cur, user_id)
         elif choice == "10":
+            analyze.show_completion_rates(cur, user_id)
+        elif choice == "11":
+            analyze.show_heatmap(cur, user_id)
+        elif choice == "12":
+            export.export_menu(cur, user_id)
+        elif choice == "13":
+            leaderboard.leaderboard_menu(cur)
+        elif choice == "14":
+            analyze.show_measure_stats(cur, user_id)
+        elif choice == "15":
+            Goal(cur.connection, user_id).show_goals()
+        elif choice == "16":
+            due.show_due_habits(cur, user_id)
+        elif choice == "17":
             print("Returning to the main menu.")
             break
         else:
-            print("Invalid input. Please select a number between 1 and 10.")
+            print("Invalid input. Please select a number between 1 and 17.")
 
 # ----------------------------------------
 # Step 4.2: CHANGE HABITS Menu
@@ -252,10 +308,15 @@ def change_habits(cur, db, user_id):
         1. Create Custom Habit
         2. Delete Habit
         3. Edit Habit Interval
-        4. Return to Main Menu
+        4. Set Streak Freezes
+        5. Set Habit Unit & Goal
+        6. Set First Day of the Week
+        7. Set a Goal
+        8. Delete a Goal
+        9. Return to Main Menu
         *****************************************
         """)
-        choice = input("Please select an option (1-4): ").strip()
+        choice = input("Please select an option (1-9): ").strip()
         if choice == "1":           
             habit_instance = Habit(db, user_id, "", "", "", None, "")
             habit_instance.create_custom_habits()
@@ -269,11 +330,35 @@ def change_habits(cur, db, user_id):
             habit_instance.edit_habit()
 
         elif choice == "4":
+            habit_instance = Habit(db, user_id, "", "", "", None, "")
+            habit_instance.set_streak_freezes()
+
+        elif choice == "5":
+            habit_instance = Habit(db, user_id, "", "", "", None, "")
+            habit_instance.set_unit_and_goal()
+
+        elif choice == "6":
+            habit_instance = Habit(db, user_id, "", "", "", None, "")
+            habit_instance.set_week_start()
+
+        elif choice == "7":
+            Goal(db, user_id).create_goal()
+
+        elif choice == "8":
+            goal_instance = Goal(db, user_id)
+            if not goal_instance.show_goals().empty:
+                goal_id = input("Please enter the ID of the goal you want to delete or type 'x' to cancel: ").strip()
+                if goal_id.isdigit() and goal_instance.delete_goal(int(goal_id)):
+                    print("***The goal was successfully deleted.***")
+                else:
+                    print("No goal was deleted.")
+
+        elif choice == "9":
             print("Returning to the main menu.")
             break
             
         else:
-            print("Invalid input. Please select a number between 1 and 4.")
+            print("Invalid input. Please select a number between 1 and 9.")
 
 # ----------------------------------------
 # Step 4.3: UPDATE HABITS & STREAKS Menu
@@ -293,10 +378,11 @@ def update_habits(cur, db, user_id):
         3. Reset a Repetition Counter
         4. Manually Increment a Streak
         5. Manually Increment a Counter
-        6. Return to Main Menu
+        6. Import Check-in History
+        7. Return to Main Menu
         *****************************************
         """)
-        choice = input("Please select an option (1-6): ").strip()
+        choice = input("Please select an option (1-7): ").strip()
         counter = Counter(db, user_id)
         
         if choice == "1":
@@ -320,11 +406,14 @@ def update_habits(cur, db, user_id):
             counter_instance.increment_counter()
 
         elif choice == "6":
+            importer.import_menu(cur, db, user_id)
+
+        elif choice == "7":
             print("Returning to the main menu.")
             break
         
         else:
-            print("Invalid input. Please select a number between 1 and 6.")
+            print("Invalid input. Please select a number between 1 and 7.")
 
 # ----------------------------------------
 # Step 4.4: CHANGE PROFILE Menu
@@ -340,10 +429,11 @@ def change_profile(cur, db, user_id):
                     4 CHANGE PROFILE
         *****************************************
         1. Edit or Delete Profile Data
-        2. Return to Main Menu
+        2. Log Out
+        3. Return to Main Menu
         *****************************************
         """)
-        choice = input("Please select option 1 or 2: ").strip()
+        choice = input("Please select option 1, 2 or 3: ").strip()
         if choice == "1":
             print("\nEditing profile information...")
             # Import User locally to avoid circular dependency
@@ -352,6 +442,15 @@ def change_profile(cur, db, user_id):
             user_instance.change_profile()
             
         elif choice == "2":
+            # End the session, the next program run asks for the password again
+            token = sessions.load_token()
+            if token:
+                sessions.revoke_session(cur, db, token)
+            sessions.clear_token()
+            print("You have been logged out.\nThanks for participating.")
+            sys.exit(0)
+
+        elif choice == "3":
             print("Returning to the main menu.")
             break
         
@@ -363,6 +462,8 @@ def change_profile(cur, db, user_id):
 # ----------------------------------------
 def main():
     """Main function to run the habit tracker program."""
+    purger = None
+    cur = None
     try:
         # Step 1: Display Welcome Screen
         welcome_menu()
@@ -373,8 +474,14 @@ def main():
             print("Failed to connect to the database. Exiting program.")
             return
 
+        # Deleted accounts are purged in the background in small batches
+        purger = AccountPurger("main_db.db")
+        purger.start()
+
+        # Expired sessions are removed at startup
+        sessions.sweep_sessions(cur, db)
+
         # Step 3: User Authentication
-        db, cur = database_needed()
         user_id = login_user_menu(cur, db)
         if not user_id:
             print("Failed to authenticate the user. Exiting program.")
@@ -410,6 +517,8 @@ def main():
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
     finally:
+        if purger:
+            purger.stop()
         if cur:
             cur.close()
         close_db()
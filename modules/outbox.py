@@ -0,0 +1,211 @@
+"""
+This file contains the background worker of the transactional outbox (see the outbox table in db.py).
+Check-ins only insert their events into the outbox within their own transaction, the delivery happens here:
+- the worker claims a batch of available events with a SELECT and an UPDATE in one BEGIN IMMEDIATE transaction
+  (claimed events get a lease, events of a crashed worker are claimed again after the lease expired)
+- every event is passed to a pluggable sink (stdout, a JSON Lines file or a local socket, see reminders.py)
+- delivered events are marked as done, failed deliveries are retried with exponential backoff
+  and marked as failed after the maximum number of attempts
+- done and failed events are purged in batches after their retention period
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import timedelta
+from reminders import SystemClock, FileSink, SocketSink
+
+# Format of the times in the outbox table
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def print_event(event):
+    """Sink that prints the events"""
+    print(f"[{event['event_type']}] {event['user_id']}: {json.dumps(event['payload'])}")
+
+
+def claim_events(cur, db, now, batch_size=100, lease=timedelta(minutes=5)):
+    """
+    Function to claim the oldest available events of the outbox for delivery.
+    Returns a list of event dictionaries in the order of their creation.
+
+    :param now: Current time
+    :param batch_size: Maximum number of claimed events
+    :param lease: Time after which the events claimed by a worker that did not finish can be claimed again
+    """
+    claimed_at = now.strftime(TIME_FORMAT)
+    # The write lock is taken before the SELECT, so no other worker can claim the same events in between
+    # (no UPDATE ... RETURNING, which needs SQLite 3.35)
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("""SELECT event_id, user_id, event_type, payload, created_at, attempts + 1 FROM outbox
+                    WHERE (status = 'pending' AND available_at <= :now)
+                    OR (status = 'processing' AND claimed_at <= :expired)
+                    ORDER BY event_id LIMIT :limit""",
+                    {"now": claimed_at, "expired": (now - lease).strftime(TIME_FORMAT), "limit": batch_size})
+        rows = cur.fetchall()
+        cur.executemany("UPDATE outbox SET status = 'processing', claimed_at = ?, attempts = attempts + 1 WHERE event_id = ?",
+                        [(claimed_at, row[0]) for row in rows])
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+    return [{"event_id": event_id, "user_id": user_id, "event_type": event_type, "payload": json.loads(payload),
+             "created_at": created_at, "attempts": attempts}
+            for event_id, user_id, event_type, payload, created_at, attempts in rows]
+
+
+def complete_events(cur, db, event_ids, now):
+    """Function to mark delivered events as done"""
+    cur.executemany("UPDATE outbox SET status = 'done', processed_at = ?, last_error = NULL WHERE event_id = ?",
+                    [(now.strftime(TIME_FORMAT), event_id) for event_id in event_ids])
+    db.commit()
+
+
+def retry_delay(attempts, backoff=2.0, max_backoff=3600.0):
+    """Function to return the delay in seconds before the next attempt (exponential backoff)"""
+    return min(backoff ** attempts, max_backoff)
+
+
+def fail_events(cur, db, failures, now, max_attempts=5, backoff=2.0, max_backoff=3600.0):
+    """
+    Function to reschedule failed deliveries or mark them as failed after max_attempts.
+
+    :param failures: List of (event dictionary, error message)
+    """
+    updates = []
+    for event, error in failures:
+        attempts = event["attempts"]
+        available_at = now + timedelta(seconds=retry_delay(attempts, backoff, max_backoff))
+        status = "failed" if attempts >= max_attempts else "pending"
+        updates.append((status, available_at.strftime(TIME_FORMAT), now.strftime(TIME_FORMAT) if status == "failed"
+                        else None, error[:500], event["event_id"]))
+    cur.executemany("""UPDATE outbox SET status = ?, available_at = ?, processed_at = ?, last_error = ?
+                    WHERE event_id = ?""", updates)
+    db.commit()
+
+
+def purge_outbox(cur, db, now, retention=timedelta(days=7), failed_retention=timedelta(days=30), batch_size=10000):
+    """
+    Function to delete done and failed events after their retention period in batches of batch_size rows,
+    so the outbox does not grow without bounds and the purge never holds the write lock for long.
+    Returns the number of deleted events.
+    """
+    deleted = 0
+    for status, keep in (("done", retention), ("failed", failed_retention)):
+        cutoff = (now - keep).strftime(TIME_FORMAT)
+        while True:
+            cur.execute("""DELETE FROM outbox WHERE event_id IN (SELECT event_id FROM outbox
+                        WHERE status = ? AND available_at < ? AND processed_at < ? LIMIT ?)""",
+                        (status, cutoff, cutoff, batch_size))
+            db.commit()
+            deleted += cur.rowcount
+            if cur.rowcount < batch_size:
+                break
+    return deleted
+
+
+class OutboxWorker:
+    """
+    Worker that delivers the events of the outbox to a sink.
+
+    :param db_path: Path of the database file (the worker uses its own connection)
+    :param sink: Callable that delivers one event dictionary (default: print_event)
+    :param batch_size: Number of events claimed at once
+    :param max_attempts: Number of attempts before an event is marked as failed
+    :param backoff: Base of the exponential backoff in seconds
+    :param retention: Time after which done events are purged
+    :param failed_retention: Time after which failed events are purged
+    :param purge_every: Number of runs between two purges of old events
+    :param clock: Object with now() (default: SystemClock)
+    """
+
+    def __init__(self, db_path, sink=None, batch_size=100, max_attempts=5, backoff=2.0, max_backoff=3600.0,
+                 lease=timedelta(minutes=5), retention=timedelta(days=7), failed_retention=timedelta(days=30),
+                 purge_every=100, clock=None):
+        self.db_path = db_path
+        self.sink = sink or print_event
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.retention = retention
+        self.failed_retention = failed_retention
+        self.purge_every = purge_every
+        self.clock = clock or SystemClock()
+        self.runs = 0
+        self.db = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def connect(self):
+        """Method to open the connection of the worker"""
+        if self.db is None:
+            self.db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        return self.db
+
+    def run_once(self):
+        """
+        Method to claim and deliver one batch of events.
+        Returns a dictionary with the number of delivered and failed events.
+        """
+        with self.lock:
+            db = self.connect()
+            cur = db.cursor()
+            try:
+                events = claim_events(cur, db, self.clock.now(), self.batch_size, self.lease)
+                done, failures = [], []
+                for event in events:
+                    try:
+                        self.sink(event)
+                        done.append(event["event_id"])
+                    except Exception as e:
+                        failures.append((event, str(e) or type(e).__name__))
+                now = self.clock.now()
+                complete_events(cur, db, done, now)
+                if failures:
+                    fail_events(cur, db, failures, now, self.max_attempts, self.backoff, self.max_backoff)
+                self.runs += 1
+                if self.runs % self.purge_every == 0:
+                    purge_outbox(cur, db, now, self.retention, self.failed_retention)
+                return {"delivered": len(done), "failed": len(failures)}
+            except sqlite3.Error as e:
+                db.rollback()
+                print(f"An error occurred while processing the outbox: {e}")
+                return {"delivered": 0, "failed": 0}
+
+    def run(self, poll=1.0):
+        """Method that processes the outbox until stop() is called (waits poll seconds when it is empty)"""
+        while not self.stopped.is_set():
+            result = self.run_once()
+            if result["delivered"] + result["failed"] < self.batch_size:
+                self.stopped.wait(poll)
+
+    def start(self, poll=1.0):
+        """Method to run the worker in a background thread"""
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, args=(poll,), daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        """Method to stop the background thread and close the connection"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+# Operators can run the worker directly on the database file
+if __name__ == "__main__":
+    worker = OutboxWorker("main_db.db")
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
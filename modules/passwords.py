@@ -0,0 +1,142 @@
+"""
+This file contains the password hashing of the user profiles.
+Passwords are stored as salted hashes of a key derivation function (KDF) in user.user_pwd, together with
+the parameters of the KDF, so the cost can be raised later without invalidating existing passwords:
+- scrypt$<n>$<r>$<p>$<salt>$<hash> (default)
+- pbkdf2_sha256$<iterations>$<salt>$<hash> (if scrypt is not available in the OpenSSL of the host)
+Salt and hash are base64-encoded. Passwords stored in plaintext by older versions are verified once
+and rehashed at the next login, like hashes with weaker parameters than the current ones.
+The cost of the KDF is calibrated for a target verify time on the host (see calibrate),
+e.g. run: python passwords.py and set the printed HABIT_KDF_PARAMS in the environment.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+
+# Target time of one password verification on the host (latency budget of the login)
+TARGET_VERIFY_MS = 100
+
+# Length of the salt and the derived key in bytes
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def default_params():
+    """Function to return the KDF parameters of new hashes (HABIT_KDF_PARAMS or the built-in defaults)"""
+    configured = os.environ.get("HABIT_KDF_PARAMS")
+    if configured:
+        return parse_params(configured)
+    if hasattr(hashlib, "scrypt"):
+        return ("scrypt", 2 ** 14, 8, 1)
+    return ("pbkdf2_sha256", 200_000)
+
+
+def parse_params(text):
+    """Function to parse KDF parameters like 'scrypt$16384$8$1' or 'pbkdf2_sha256$200000'"""
+    scheme, *values = text.split("$")
+    if scheme == "scrypt" and len(values) == 3:
+        return (scheme,) + tuple(int(value) for value in values)
+    if scheme == "pbkdf2_sha256" and len(values) == 1:
+        return (scheme, int(values[0]))
+    raise ValueError(f"Invalid KDF parameters '{text}'.")
+
+
+def format_params(params):
+    """Function to format KDF parameters as stored in front of the salt"""
+    return "$".join(str(value) for value in params)
+
+
+# Parameters of new hashes, can be replaced with the result of calibrate
+CURRENT_PARAMS = default_params()
+
+
+def derive(password, salt, params):
+    """Function to derive the key of a password with the given salt and KDF parameters"""
+    if params[0] == "scrypt":
+        _, n, r, p = params
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p + 2 ** 20, dklen=KEY_BYTES)
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, params[1], dklen=KEY_BYTES)
+
+
+def hash_password(password, params=None):
+    """Function to return the encoded hash of a password with a new random salt"""
+    params = params or CURRENT_PARAMS
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = derive(password, salt, params)
+    return "$".join([format_params(params), base64.b64encode(salt).decode("ascii"),
+                     base64.b64encode(key).decode("ascii")])
+
+
+def split_hash(stored):
+    """Function to split an encoded hash into parameters, salt and key; returns None for legacy plaintext"""
+    if not stored or not stored.startswith(("scrypt$", "pbkdf2_sha256$")):
+        return None
+    try:
+        params_text, salt, key = stored.rsplit("$", 2)
+        return parse_params(params_text), base64.b64decode(salt), base64.b64decode(key)
+    except ValueError:
+        return None
+
+
+def cost(params):
+    """Function to compare the cost of KDF parameters (work factor of the scheme)"""
+    if params[0] == "scrypt":
+        return params[1] * params[2] * params[3]
+    return params[1]
+
+
+def needs_rehash(stored, params=None):
+    """Function to check if a stored password is plaintext or uses other or weaker parameters than the current ones"""
+    params = params or CURRENT_PARAMS
+    parts = split_hash(stored)
+    return parts is None or parts[0][0] != params[0] or cost(parts[0]) < cost(params)
+
+
+def verify_password(password, stored):
+    """
+    Function to check a password against the stored value (encoded hash or legacy plaintext).
+    The comparison takes constant time.
+    """
+    parts = split_hash(stored)
+    if parts is None:
+        return hmac.compare_digest(str(password).encode("utf-8"), str(stored or "").encode("utf-8"))
+    params, salt, key = parts
+    return hmac.compare_digest(derive(password, salt, params), key)
+
+
+def calibrate(target_ms=TARGET_VERIFY_MS, scheme=None, rounds=3):
+    """
+    Function to pick the cost of the KDF for a target verify time on this host:
+    the cost is doubled until one derivation takes at least the target time (best of rounds measurements).
+    Returns the parameters (e.g. ('scrypt', 16384, 8, 1)).
+    """
+    scheme = scheme or ("scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256")
+    params = ("scrypt", 2 ** 10, 8, 1) if scheme == "scrypt" else ("pbkdf2_sha256", 10_000)
+    salt = secrets.token_bytes(SALT_BYTES)
+    while True:
+        seconds = min(timed(derive, "calibration", salt, params) for _ in range(rounds))
+        if seconds * 1000 >= target_ms or cost(params) >= 2 ** 24:
+            return params
+        if scheme == "scrypt":
+            params = ("scrypt", params[1] * 2, params[2], params[3])
+        else:
+            params = ("pbkdf2_sha256", params[1] * 2)
+
+
+def timed(function, *args):
+    """Function to return the duration of a call in seconds"""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+# Operators can calibrate the KDF on the host directly
+if __name__ == "__main__":
+    params = calibrate()
+    seconds = timed(derive, "calibration", secrets.token_bytes(SALT_BYTES), params)
+    print(f"HABIT_KDF_PARAMS={format_params(params)}  # {seconds * 1000:.1f} ms per verification")
@@ -0,0 +1,221 @@
+"""
+This file contains the interval model of the habits and helper functions to bucket check dates into periods.
+The interval of a habit is stored compactly in habits.interval_code:
+- 'D' daily, 'D3' every 3 days
+- 'W' weekly, 'W3' 3 times per week (weeks start on a configurable weekday)
+- 'M' monthly, 'M2' 2 times per month
+- 'S21' specific weekdays as bitmask (1 = Monday ... 64 = Sunday, e.g. 21 = Monday, Wednesday and Friday)
+habits.habit_interval keeps the readable label ('Daily', 'Weekly', 'Every 3 days', ...).
+Every check-in stores the key of its period in counter.period_key. Two check-ins are in the same period
+if their keys are equal, and a streak continues if the new key is exactly one higher than the last one
+and the last period was completed (enough checks in the period).
+Missed periods can be bridged with streak freezes: every habit gets a number of freeze tokens per month
+which are consumed automatically when a check-in detects a gap (see check_step).
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+# Default first day of a calendar week (0 = Monday ... 6 = Sunday), configurable via HABIT_WEEK_START
+DEFAULT_WEEK_START = int(os.environ.get("HABIT_WEEK_START", 0)) % 7
+
+# Interval codes of the labels used before the interval model (and of the predefined habits)
+LABEL_CODES = {"Daily": "D", "Weekly": "W"}
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def to_date(value):
+    """Function to convert a 'YYYY-MM-DD' string or a datetime into a date"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def day_period(value):
+    """Function to return the day ordinal of a date"""
+    return to_date(value).toordinal()
+
+
+def week_period(value, week_start=DEFAULT_WEEK_START):
+    """Function to return the number of the calendar week of a date (date.fromordinal(1) is a Monday)"""
+    return (to_date(value).toordinal() - 1 - week_start) // 7
+
+
+class Interval:
+    """
+    Interval of a habit: kind ('D', 'W', 'M' or 'S'), length or weekday mask and the number of
+    checks needed to complete one period.
+    """
+
+    def __init__(self, kind, value=1, week_start=DEFAULT_WEEK_START):
+        """
+        :param kind: 'D' (every N days), 'W' (X times per week), 'M' (X times per month) or 'S' (weekdays)
+        :param value: N days for 'D', X checks for 'W' and 'M', weekday bitmask for 'S'
+        :param week_start: First day of the week for 'W' (0 = Monday ... 6 = Sunday)
+        """
+        if kind not in ("D", "W", "M", "S") or value < 1 or (kind == "S" and value > 127):
+            raise ValueError(f"Invalid interval '{kind}{value}'.")
+        self.kind = kind
+        self.value = value
+        self.week_start = week_start
+        self.days = value if kind == "D" else 1
+        self.times = value if kind in ("W", "M") else 1
+        # Specific weekdays: position of every weekday within the scheduled days of a week
+        self.weekdays = [day for day in range(7) if value >> day & 1] if kind == "S" else []
+        self.slots = [sum(1 for d in self.weekdays if d <= day) for day in range(7)]
+
+    @property
+    def code(self):
+        """Compact code of the interval as stored in habits.interval_code"""
+        return self.kind if self.value == 1 and self.kind != "S" else f"{self.kind}{self.value}"
+
+    @property
+    def label(self):
+        """Readable label of the interval as stored in habits.habit_interval"""
+        if self.kind == "D":
+            return "Daily" if self.days == 1 else f"Every {self.days} days"
+        if self.kind == "W":
+            return "Weekly" if self.times == 1 else f"{self.times}x per week"
+        if self.kind == "M":
+            return "Monthly" if self.times == 1 else f"{self.times}x per month"
+        return ", ".join(WEEKDAYS[day] for day in self.weekdays)
+
+    def period_of(self, value):
+        """Function to return the key of the period of a check date"""
+        ordinal = to_date(value).toordinal()
+        if self.kind == "D":
+            return ordinal // self.days
+        if self.kind == "W":
+            return (ordinal - 1 - self.week_start) // 7
+        if self.kind == "M":
+            day = to_date(value)
+            return day.year * 12 + day.month - 1
+        # Specific weekdays: a check belongs to the last scheduled day on or before the check date
+        week, weekday = divmod(ordinal - 1, 7)
+        return week * len(self.weekdays) + self.slots[weekday] - 1
+
+    def period_start(self, period):
+        """Function to return the first date of a period"""
+        if self.kind == "D":
+            return date.fromordinal(max(period * self.days, 1))
+        if self.kind == "W":
+            return date.fromordinal(period * 7 + 1 + self.week_start)
+        if self.kind == "M":
+            return date(period // 12, period % 12 + 1, 1)
+        week, slot = divmod(period, len(self.weekdays))
+        return date.fromordinal(week * 7 + 1 + self.weekdays[slot])
+
+    def period_end(self, period):
+        """Function to return the last date of a period"""
+        return self.period_start(period + 1) - timedelta(days=1)
+
+    @staticmethod
+    def is_consecutive(first, second):
+        """Function to check if the second period directly follows the first one"""
+        return second == first + 1
+
+    def missed_periods(self, last_period, count, period):
+        """Function to return the number of periods that were not completed between the last and a new check"""
+        return period - last_period - 1 + (0 if count >= self.times else 1)
+
+    def advance(self, last_period, count, streak, period, freezes=0):
+        """
+        Function to apply one check-in to the streak state of a habit (no database access).
+
+        :param last_period: Period of the last check (None if never checked)
+        :param count: Number of checks in the last period
+        :param streak: Current streak (number of consecutive completed periods)
+        :param period: Period of the new check
+        :param freezes: Number of freeze tokens available to bridge missed periods
+        :return: Status ('checked', 'frozen', 'broken' or 'duplicate'), number of checks in the period,
+                 streak and number of used freeze tokens
+        """
+        count = count or 0
+        streak = streak or 0
+        if last_period is not None and (period < last_period or (period == last_period and count >= self.times)):
+            # Only as many checks per period as needed to complete it
+            return "duplicate", count, streak, 0
+        status, used = "checked", 0
+        if period == last_period:
+            count += 1
+        else:
+            missed = self.missed_periods(last_period, count, period) if last_period is not None else 0
+            if 0 < missed <= freezes:
+                # The missed periods are bridged, the streak continues
+                status, used = "frozen", missed
+            elif missed:
+                status, streak = "broken", 0
+            count = 1
+        if count == self.times:
+            streak += 1
+        return status, count, streak, used
+
+    def deadline(self, last_period, count, freezes=0):
+        """Function to return the last date on which a check keeps the current streak alive (incl. freeze tokens)"""
+        if last_period is None:
+            return None
+        return self.period_end((last_period + 1 if count >= self.times else last_period) + (freezes or 0)).isoformat()
+
+    def next_due(self, last_period, count):
+        """Function to return the first date on which the habit is due again (None if never checked)"""
+        if last_period is None:
+            return None
+        return self.period_start(last_period + 1 if count >= self.times else last_period).isoformat()
+
+
+def month_of(value):
+    """Function to return the number of the month of a date (used for the monthly refill of the freeze tokens)"""
+    day = to_date(value)
+    return day.year * 12 + day.month - 1
+
+
+def check_step(interval, allowance, state, value):
+    """
+    Function to apply one check-in to the full streak state of a habit, including the freeze tokens.
+    Used at check-in time (record_check) and for the rebuild from the history (recompute_streaks),
+    so both give exactly the same result.
+
+    :param interval: Interval model of the habit
+    :param allowance: Number of freeze tokens per month
+    :param state: Tuple (last period, checks in the last period, streak, freeze tokens, month of the last refill)
+    :param value: Check date
+    :return: Status, the new state and the number of used freeze tokens
+    """
+    last_period, count, streak, tokens, refill_month = state
+    month = month_of(value)
+    if refill_month != month:
+        # Tokens are refilled at the first check-in of a month (unused tokens do not accumulate)
+        tokens, refill_month = allowance or 0, month
+    period = interval.period_of(value)
+    status, count, streak, used = interval.advance(last_period, count, streak, period, tokens or 0)
+    if status == "duplicate":
+        # A rejected check does not change the state
+        return status, state, 0
+    return status, (period, count, streak, (tokens or 0) - used, refill_month), used
+
+
+@lru_cache(maxsize=256)
+def parse_interval(code, week_start=None):
+    """
+    Function to create the interval model of an interval code (e.g. 'D', 'W3', 'S21')
+    or of one of the labels 'Daily' and 'Weekly'.
+    """
+    code = LABEL_CODES.get(code, code) or "D"
+    week_start = DEFAULT_WEEK_START if week_start is None else week_start
+    return Interval(code[0], int(code[1:] or 1), week_start)
+
+
+def period_key(value, interval_code, week_start=None):
+    """
+    Function to return the period key of a check date.
+
+    :param value: Check date (date, datetime or 'YYYY-MM-DD')
+    :param interval_code: Interval code or label ('Daily', 'Weekly') of the habit
+    :param week_start: First day of the week for weekly habits (0 = Monday ... 6 = Sunday)
+    """
+    return parse_interval(interval_code, week_start).period_of(value)
+
@@ -0,0 +1,151 @@
+"""
+This file contains the background purger of deleted accounts.
+An account deletion only marks the user as deleted (user.deleted_at, see user_manager.mark_user_deleted),
+the data is deleted here in short transactions of at most batch_size rows each,
+so other writers (check-ins, imports) are never blocked for long:
+- the large per-user tables (counter, outbox) are deleted in rowid batches
+- the small tables (calendar bitmaps, rollups, goals, sessions, habits) and at last the user row follow
+Every transaction increments the data version of the user once (see db.pause_data_version).
+The purger reports its progress after every batch and can be interrupted at any time;
+the next run continues with the remaining rows.
+"""
+
+import sqlite3
+import threading
+import time
+from db import pause_data_version, resume_data_version
+
+# Tables of a user that are deleted in rowid batches (large) and in one statement each (small), in this order
+BATCHED_TABLES = ("counter", "outbox")
+SMALL_TABLES = ("habit_calendar", "measure_rollup", "goals", "sessions", "habits")
+
+
+def print_progress(progress):
+    """Function to print the progress of a purge"""
+    print(f"Purging '{progress['user_id']}': {progress['deleted']} rows deleted from {progress['table']}"
+          + (" (done)" if progress["done"] else ""))
+
+
+def pending_users(cur):
+    """Function to return the IDs of the deleted accounts that are not purged yet (oldest deletion first)"""
+    cur.execute("SELECT user_id FROM user WHERE deleted_at IS NOT NULL ORDER BY deleted_at")
+    return [user_id for (user_id,) in cur.fetchall()]
+
+
+def purge_user(cur, db, user_id, batch_size=5000, progress=None, pause=0.0, stopped=None):
+    """
+    Function to delete all data of a deleted account in batches.
+    Returns the number of deleted rows, or None if the purge was stopped before it was complete.
+
+    :param batch_size: Maximum number of rows deleted per transaction
+    :param progress: Callable that gets a progress dictionary after every batch (optional)
+    :param pause: Seconds to wait between two batches, so other writers get the lock
+    :param stopped: threading.Event to interrupt the purge (optional)
+    """
+    deleted = 0
+    for table in BATCHED_TABLES:
+        table_deleted = 0
+        while True:
+            if stopped is not None and stopped.is_set():
+                return None
+            pause_data_version(cur, [user_id])
+            cur.execute(f"""DELETE FROM {table} WHERE rowid IN
+                        (SELECT rowid FROM {table} WHERE user_id = ? LIMIT ?)""", (user_id, batch_size))
+            count = cur.rowcount
+            resume_data_version(cur)
+            db.commit()
+            table_deleted += count
+            if progress:
+                progress({"user_id": user_id, "table": table, "deleted": table_deleted, "done": False})
+            if count < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+        deleted += table_deleted
+    pause_data_version(cur, [user_id])
+    for table in SMALL_TABLES:
+        cur.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+        deleted += cur.rowcount
+    cur.execute("DELETE FROM user WHERE user_id = ? AND deleted_at IS NOT NULL", (user_id,))
+    deleted += cur.rowcount
+    resume_data_version(cur)
+    db.commit()
+    if progress:
+        progress({"user_id": user_id, "table": "user", "deleted": deleted, "done": True})
+    return deleted
+
+
+def purge_deleted_users(cur, db, batch_size=5000, progress=None, pause=0.0, stopped=None):
+    """Function to purge all deleted accounts; returns a dictionary of user IDs and their deleted rows"""
+    purged = {}
+    for user_id in pending_users(cur):
+        try:
+            deleted = purge_user(cur, db, user_id, batch_size, progress, pause, stopped)
+        except sqlite3.Error as e:
+            db.rollback()
+            print(f"An error occurred while purging the account '{user_id}': {e}")
+            continue
+        if deleted is None:
+            break
+        purged[user_id] = deleted
+    return purged
+
+
+class AccountPurger:
+    """
+    Background thread that purges the deleted accounts.
+
+    :param db_path: Path of the database file (the purger uses its own connection)
+    :param interval: Seconds between two checks for deleted accounts
+    :param batch_size: Maximum number of rows deleted per transaction
+    :param pause: Seconds to wait between two batches
+    :param progress: Callable that gets the progress after every batch (optional)
+    """
+
+    def __init__(self, db_path, interval=60.0, batch_size=5000, pause=0.01, progress=None):
+        self.db_path = db_path
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.progress = progress
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def run(self):
+        """Method that purges the deleted accounts until stop() is called"""
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            cur = db.cursor()
+            while not self.stopped.is_set():
+                try:
+                    purge_deleted_users(cur, db, self.batch_size, self.progress, self.pause, self.stopped)
+                except sqlite3.Error as e:
+                    db.rollback()
+                    print(f"An error occurred while purging deleted accounts: {e}")
+                self.stopped.wait(self.interval)
+        finally:
+            db.close()
+
+    def start(self):
+        """Method to run the purger in a background thread"""
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        """Method to stop the background thread after the current batch"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+# Operators can purge all deleted accounts directly on the database file
+if __name__ == "__main__":
+    connection = sqlite3.connect("main_db.db", timeout=30)
+    try:
+        result = purge_deleted_users(connection.cursor(), connection, progress=print_progress)
+        print(f"{len(result)} deleted account(s) were purged.")
+    finally:
+        connection.close()
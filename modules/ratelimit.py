@@ -0,0 +1,143 @@
+"""
+This file contains the login rate limiter of the habit tracker.
+Every login attempt takes one token from the bucket of its key (identifier and source, e.g. 'cli:testuser');
+the buckets refill continuously, so a user can retry a few times in a row but a script cannot try passwords
+faster than the refill rate. The check runs before any database access and costs a few microseconds:
+- the buckets live in a dictionary ordered by last use, bounded to max_keys entries: only buckets that have
+  refilled completely are dropped (a full bucket is the same as no bucket), so a flood of new keys never
+  clears the limits of exhausted ones; while all buckets are in use, new keys share one overflow bucket
+  per source
+- the state can be saved to a JSON file (HABIT_RATELIMIT_FILE), so limits survive a restart of the program
+- a lock guards the buckets, so the limiter can be shared by the worker threads of the daemon
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Default bucket: 5 attempts in a row, then one more attempt every 12 seconds
+DEFAULT_CAPACITY = 5
+DEFAULT_REFILL_SECONDS = 12.0
+
+# Maximum number of keys held in memory
+DEFAULT_MAX_KEYS = 10000
+
+
+def limit_key(identifier, source):
+    """Function to build the bucket key of a login attempt"""
+    return f"{source}:{str(identifier).strip().lower()}"
+
+
+class LoginRateLimiter:
+    """
+    Token buckets for login attempts, keyed by identifier and source.
+
+    :param capacity: Attempts that are allowed in a row
+    :param refill_seconds: Seconds until one more attempt is allowed
+    :param max_keys: Maximum number of buckets in memory (plus one overflow bucket per source)
+    :param path: JSON file to save the buckets to (optional)
+    :param clock: Callable that returns the current time in seconds (wall clock, so saved buckets stay valid)
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, refill_seconds=DEFAULT_REFILL_SECONDS,
+                 max_keys=DEFAULT_MAX_KEYS, path=None, clock=time.time):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.max_keys = max_keys
+        self.path = path
+        self.clock = clock
+        self.buckets = OrderedDict()  # key -> [tokens, time of the last update]
+        self.lock = threading.Lock()
+        if path:
+            self.load()
+
+    def tokens(self, key, now):
+        """Method to return the bucket of a key refilled up to now (not stored)"""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return float(self.capacity)
+        return min(float(self.capacity), bucket[0] + (now - bucket[1]) / self.refill_seconds)
+
+    def key(self, identifier, source, now):
+        """Method to return the bucket key of a login attempt (the overflow bucket if no bucket is free)"""
+        key = limit_key(identifier, source)
+        if key in self.buckets or len(self.buckets) < self.max_keys or self.drop_full(now):
+            return key
+        return limit_key("*", source)
+
+    def drop_full(self, now):
+        """Method to drop the least recently used buckets as long as they are full; returns True if one was dropped"""
+        dropped = False
+        while self.buckets:
+            key = next(iter(self.buckets))
+            if self.tokens(key, now) < self.capacity:
+                break
+            del self.buckets[key]
+            dropped = True
+        return dropped
+
+    def allow(self, identifier, source="local"):
+        """Method to take one token for a login attempt; returns False if the attempt is rate limited"""
+        with self.lock:
+            now = self.clock()
+            key = self.key(identifier, source, now)
+            tokens = self.tokens(key, now)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self.buckets[key] = [tokens, now]
+            self.buckets.move_to_end(key)
+        return allowed
+
+    def retry_after(self, identifier, source="local"):
+        """Method to return the seconds until the next attempt is allowed (0 if allowed now)"""
+        with self.lock:
+            now = self.clock()
+            return max(0.0, (1.0 - self.tokens(self.key(identifier, source, now), now)) * self.refill_seconds)
+
+    def reset(self, identifier, source="local"):
+        """Method to refill the bucket of a key, e.g. after a successful login"""
+        with self.lock:
+            self.buckets.pop(limit_key(identifier, source), None)
+
+    def save(self):
+        """
+        Method to write the buckets that are not full to the JSON file
+        (atomic replace of a temporary file of its own, so concurrent saves do not overwrite each other's file)
+        """
+        if not self.path:
+            return
+        with self.lock:
+            now = self.clock()
+            state = {key: list(bucket) for key, bucket in self.buckets.items()
+                     if self.tokens(key, now) < self.capacity}
+        temp_path = None
+        try:
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(os.path.abspath(self.path)),
+                                             prefix=f"{os.path.basename(self.path)}.", suffix=".tmp",
+                                             delete=False) as file:
+                temp_path = file.name
+                json.dump(state, file)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"An error occurred while saving the login rate limits: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def load(self):
+        """Method to read the buckets of the JSON file (a missing or broken file starts with full buckets)"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return
+        with self.lock:
+            for key, (tokens, updated) in list(state.items())[-self.max_keys:]:
+                self.buckets[key] = [float(tokens), float(updated)]
+
+
+# Limiter of the login (user_manager.verify_login and user_auth)
+limiter = LoginRateLimiter(path=os.environ.get("HABIT_RATELIMIT_FILE"))
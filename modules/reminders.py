@@ -0,0 +1,375 @@
+"""
+This file contains a local reminder scheduler that fires reminders before the streak of a habit would break.
+The scheduler keeps one entry per (user, habit) with the time of its next reminder in a priority queue (heap):
+- the entries are loaded once from the streak deadlines of the habits table (no scan of the counter table)
+- every check-in reschedules its entry (see on_check; subscribe() attaches the scheduler to the 'check' and
+  'reset_streak' hooks of the process), an update is a dictionary write and a heap push
+- outdated heap items are skipped when they reach the top and the heap is compacted when it grows too large
+Reminders are delivered to a pluggable sink (stdout, a JSON Lines file or a local socket).
+The clock is pluggable as well, so tests drive the scheduler with a simulated clock.
+Run: python reminders.py (the deadlines are reloaded regularly, so check-ins of other processes are picked up),
+or python daemon.py serve --reminders (check-ins of the daemon reschedule their reminders at once).
+"""
+
+import argparse
+import heapq
+import json
+import signal
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+import hooks
+from periods import to_date
+from db import DELETED_USERS
+
+# A reminder is fired this long before the streak deadline (the end of the deadline day)
+DEFAULT_LEAD = timedelta(hours=4)
+
+# Outdated heap items tolerated before the heap is rebuilt from the current entries
+COMPACT_SLACK = 1024
+
+# Seconds between two reloads of the streak deadlines in the reminder process
+DEFAULT_RELOAD = 300.0
+
+
+### Clocks
+
+class SystemClock:
+    """Clock of the running program"""
+
+    def now(self):
+        return datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """Clock for tests: the time only moves when it is advanced"""
+
+    def __init__(self, start):
+        self.current = start
+
+    def now(self):
+        return self.current
+
+    def advance(self, **kwargs):
+        """Method to move the clock forward, e.g. advance(hours=2); returns the new time"""
+        self.current += timedelta(**kwargs)
+        return self.current
+
+    def sleep(self, seconds):
+        self.current += timedelta(seconds=seconds)
+
+
+### Sinks: callables that deliver one reminder (dictionary)
+
+def reminder_text(reminder):
+    """Function to format a reminder as message for the user"""
+    return (f"Reminder for {reminder['user_id']}: check '{reminder['habit_name']}' until {reminder['deadline']} "
+            f"to keep your streak of {reminder['streak']}.")
+
+
+class StdoutSink:
+    """Sink that prints the reminders"""
+
+    def __call__(self, reminder):
+        print(reminder_text(reminder))
+
+
+class FileSink:
+    """Sink that appends the reminders to a JSON Lines file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, reminder):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(reminder) + "\n")
+
+
+class SocketSink:
+    """
+    Sink that sends the reminders as JSON lines to a local socket:
+    a path for a Unix domain socket or a (host, port) tuple for TCP.
+    The connection is opened on the first reminder and reopened after an error.
+    """
+
+    def __init__(self, address, timeout=1.0):
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+
+    def __call__(self, reminder):
+        data = (json.dumps(reminder) + "\n").encode("utf-8")
+        try:
+            if self.sock is None:
+                family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+                self.sock = socket.socket(family, socket.SOCK_STREAM)
+                self.sock.settimeout(self.timeout)
+                self.sock.connect(self.address)
+            self.sock.sendall(data)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        """Method to close the connection"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+### Scheduler
+
+@lru_cache(maxsize=4096)
+def fire_time(deadline, lead=DEFAULT_LEAD):
+    """Function to return the time of the reminder of a streak deadline (date or 'YYYY-MM-DD'; cached per day)"""
+    end = datetime.combine(to_date(deadline), datetime.min.time()) + timedelta(days=1)
+    return end - lead
+
+
+class ReminderScheduler:
+    """
+    In-process scheduler of the reminders of all habits with a current streak.
+
+    :param sink: Callable that delivers one reminder (default: StdoutSink)
+    :param clock: Object with now() and sleep() (default: SystemClock)
+    :param lead: Time between the reminder and the end of the deadline day
+    """
+
+    def __init__(self, sink=None, clock=None, lead=DEFAULT_LEAD):
+        self.sink = sink or StdoutSink()
+        self.clock = clock or SystemClock()
+        self.lead = lead
+        # (fire time, sequence number, key) of every scheduled reminder; outdated items stay until popped
+        self.heap = []
+        # Current entry per key (user ID, habit name): (fire time, sequence number, deadline, streak)
+        self.entries = {}
+        # (key, deadline) of the reminders that were sent, so a reload does not schedule them again
+        self.fired = set()
+        self.seq = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def schedule(self, user_id, habit_name, deadline, streak=0):
+        """Method to schedule (or reschedule) the reminder of a habit; a deadline of None cancels it"""
+        if deadline is None:
+            self.cancel(user_id, habit_name)
+            return None
+        fire_at = fire_time(deadline, self.lead)
+        key = (user_id, habit_name)
+        with self.lock:
+            self.seq += 1
+            self.entries[key] = (fire_at, self.seq, str(deadline), streak)
+            heapq.heappush(self.heap, (fire_at, self.seq, key))
+            earliest = self.heap[0][1] == self.seq
+            if len(self.heap) > 2 * len(self.entries) + COMPACT_SLACK:
+                self.compact()
+        if earliest:
+            # The running loop has to wake up earlier than planned
+            self.wakeup.set()
+        return fire_at
+
+    def schedule_many(self, items):
+        """
+        Method to schedule many reminders at once, e.g. at start-up (one heapify instead of single pushes).
+        Reminders that were already sent for the same deadline are skipped.
+
+        :param items: Iterable of (user ID, habit name, deadline, streak)
+        """
+        with self.lock:
+            for user_id, habit_name, deadline, streak in items:
+                if ((user_id, habit_name), str(deadline)) in self.fired:
+                    continue
+                self.seq += 1
+                self.entries[(user_id, habit_name)] = (fire_time(deadline, self.lead), self.seq, str(deadline), streak)
+            self.compact()
+        self.wakeup.set()
+        return len(self.entries)
+
+    def cancel(self, user_id, habit_name):
+        """Method to cancel the reminder of a habit (its heap item is skipped later)"""
+        with self.lock:
+            return self.entries.pop((user_id, habit_name), None) is not None
+
+    def compact(self):
+        """Method to rebuild the heap from the current entries (called with the lock held)"""
+        self.heap = [(fire_at, seq, key) for key, (fire_at, seq, _, _) in self.entries.items()]
+        heapq.heapify(self.heap)
+
+    def on_check(self, user_id, habit_name, result):
+        """Method to reschedule a habit after a check-in with the result of record_check"""
+        if result.get("status") == "checked":
+            return self.schedule(user_id, habit_name, result.get("deadline"), result.get("streak", 0))
+        return None
+
+    def on_check_event(self, event):
+        """Hook handler of the 'check' event (see hooks.py): reschedules the checked habit"""
+        return self.on_check(event["user_id"], event["habit_name"], dict(event, status="checked"))
+
+    def on_reset_event(self, event):
+        """Hook handler of the 'reset_streak' event: a reset streak needs no reminder"""
+        return self.cancel(event["user_id"], event["habit_name"])
+
+    def subscribe(self, registry=None):
+        """Method to attach the scheduler to the 'check' and 'reset_streak' hooks (default: registry of the program)"""
+        registry = registry or hooks.registry
+        registry.register("check", self.on_check_event, name=f"reminders-{id(self)}")
+        registry.register("reset_streak", self.on_reset_event, name=f"reminders-{id(self)}")
+
+    def unsubscribe(self, registry=None):
+        """Method to detach the scheduler from the hooks"""
+        registry = registry or hooks.registry
+        for event in ("check", "reset_streak"):
+            registry.unregister(event, f"reminders-{id(self)}")
+
+    def load(self, cur, today=None):
+        """Method to schedule the reminders of all habits with a current streak from the habits table"""
+        today = today or self.clock.now().date()
+        cur.execute(f"""SELECT user_id, habit_name, streak_deadline, cur_streak FROM habits
+                    WHERE user_id IS NOT NULL AND cur_streak > 0 AND streak_deadline >= ?
+                    AND user_id NOT IN ({DELETED_USERS})""", (today.isoformat(),))
+        return self.schedule_many(cur.fetchall())
+
+    def reload(self, cur, today=None):
+        """
+        Method to replace all reminders with the current streak deadlines (e.g. after changes of other processes);
+        reminders that were already sent are not scheduled again
+        """
+        today = today or self.clock.now().date()
+        with self.lock:
+            self.entries.clear()
+            self.fired = {item for item in self.fired if item[1] >= today.isoformat()}
+        return self.load(cur, today)
+
+    def next_fire(self):
+        """Method to return the time of the next reminder (None if nothing is scheduled)"""
+        with self.lock:
+            while self.heap:
+                fire_at, seq, key = self.heap[0]
+                entry = self.entries.get(key)
+                if entry is not None and entry[1] == seq:
+                    return fire_at
+                heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now):
+        """Method to remove and return the reminders that are due at the given time"""
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                fire_at, seq, key = heapq.heappop(self.heap)
+                entry = self.entries.get(key)
+                if entry is None or entry[1] != seq:
+                    continue
+                del self.entries[key]
+                self.fired.add((key, entry[2]))
+                if now >= fire_at + self.lead:
+                    # The deadline has passed, the streak is broken already
+                    continue
+                due.append({"user_id": key[0], "habit_name": key[1], "deadline": entry[2],
+                            "streak": entry[3], "fire_at": fire_at.isoformat(timespec="seconds")})
+        return due
+
+    def run_pending(self):
+        """Method to deliver all due reminders; a failing sink does not stop the other reminders"""
+        reminders = self.pop_due(self.clock.now())
+        for reminder in reminders:
+            try:
+                self.sink(reminder)
+            except Exception as e:
+                self.failures += 1
+                print(f"An error occurred while sending a reminder: {e}")
+        return len(reminders)
+
+    def run(self, poll=60.0):
+        """Method that delivers the reminders until stop() is called (sleeps until the next reminder)"""
+        while not self.stopped.is_set():
+            self.run_pending()
+            next_fire = self.next_fire()
+            timeout = poll
+            if next_fire is not None:
+                timeout = min(poll, max((next_fire - self.clock.now()).total_seconds(), 0))
+            self.wakeup.wait(timeout)
+            self.wakeup.clear()
+
+    def start(self, poll=60.0):
+        """Method to run the scheduler in a background thread"""
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, args=(poll,), daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        """Method to stop the background thread"""
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+### Reminder process
+
+def make_sink(target):
+    """Function to create the sink of a target: 'stdout', a .jsonl file, 'host:port' (TCP) or a Unix socket path"""
+    if not target or target == "stdout":
+        return StdoutSink()
+    if target.endswith(".jsonl"):
+        return FileSink(target)
+    host, _, port = target.rpartition(":")
+    if host and port.isdigit():
+        return SocketSink((host, int(port)))
+    return SocketSink(target)
+
+
+def serve(db_path, scheduler, poll=60.0, reload=DEFAULT_RELOAD, stopped=None):
+    """
+    Function to run the scheduler of a reminder process until stopped is set (or SIGINT/SIGTERM):
+    the reminders are loaded from the database, the scheduler runs in its background thread,
+    and the streak deadlines are reloaded every reload seconds.
+    """
+    stopped = stopped or threading.Event()
+    db = sqlite3.connect(db_path)
+    try:
+        scheduler.load(db.cursor())
+        scheduler.subscribe()
+        scheduler.start(poll)
+        while not stopped.wait(reload):
+            try:
+                scheduler.reload(db.cursor())
+            except sqlite3.Error as e:
+                print(f"An error occurred while reloading the reminders: {e}")
+    finally:
+        scheduler.stop()
+        scheduler.unsubscribe()
+        db.close()
+
+
+# Operators run the reminder process directly
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reminders before the streaks of the habits break.")
+    parser.add_argument("--db", default="main_db.db")
+    parser.add_argument("--sink", default="stdout",
+                        help="'stdout', a .jsonl file, 'host:port' or the path of a Unix socket (default: %(default)s)")
+    parser.add_argument("--lead-hours", type=float, default=DEFAULT_LEAD.total_seconds() / 3600,
+                        help="hours between the reminder and the end of the deadline day")
+    parser.add_argument("--reload", type=float, default=DEFAULT_RELOAD, help="seconds between two reloads")
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    print("The reminder scheduler is running. Press Ctrl+C to stop it.")
+    serve(args.db, ReminderScheduler(make_sink(args.sink), lead=timedelta(hours=args.lead_hours)),
+          reload=args.reload, stopped=stop)
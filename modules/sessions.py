@@ -0,0 +1,156 @@
+"""
+This file contains the session tokens of the habit tracker, so a logged-in user does not have to enter the
+password on every program start (and scripts can run without a password prompt).
+A session token has the form <random>.<expiry>.<signature>:
+- the signature is an HMAC-SHA256 of random part and expiry with the local secret of the installation,
+  so forged or modified tokens are rejected without a database lookup
+- the sessions table stores only the SHA-256 hash of the token (primary key) with its expiry,
+  so a stolen database does not contain usable tokens and a session can be revoked
+The token of the current user is kept in a local session file (readable only by the owner).
+All sessions of a user are revoked when the password changes; expired sessions are removed by a sweep.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from datetime import datetime, timedelta
+
+# Session file of the CLI and the file of the local secret (configurable via environment variables)
+SESSION_FILE = os.environ.get("HABIT_SESSION_FILE", ".habit_session")
+SECRET_FILE = os.environ.get("HABIT_SESSION_SECRET_FILE", ".habit_secret")
+
+# Lifetime of a new session
+SESSION_TTL = timedelta(days=7)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def write_private(path, text):
+    """Function to write a file that only the owner can read"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        file.write(text)
+
+
+def load_secret(path=None):
+    """Function to return the local secret (HABIT_SESSION_SECRET or the secret file, created on first use)"""
+    configured = os.environ.get("HABIT_SESSION_SECRET")
+    if configured:
+        return configured.encode("utf-8")
+    path = path or SECRET_FILE
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return file.read().strip().encode("utf-8")
+    except FileNotFoundError:
+        secret = secrets.token_hex(32)
+        write_private(path, secret)
+        return secret.encode("utf-8")
+
+
+def sign(secret, message):
+    """Function to return the base64url HMAC-SHA256 signature of a message"""
+    digest = hmac.new(secret, message.encode("ascii"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+
+def token_hash(token):
+    """Function to return the hash of a token as stored in the sessions table"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def create_session(cur, db, user_id, ttl=SESSION_TTL, now=None, secret=None):
+    """Function to start a session for an authenticated user; returns the signed token"""
+    now = now or datetime.now()
+    expires = int((now + ttl).timestamp())
+    message = f"{secrets.token_urlsafe(24)}.{expires}"
+    token = f"{message}.{sign(secret or load_secret(), message)}"
+    cur.execute("INSERT INTO sessions (token_hash, user_id, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (token_hash(token), user_id, now.strftime(TIME_FORMAT),
+                 datetime.fromtimestamp(expires).strftime(TIME_FORMAT)))
+    db.commit()
+    return token
+
+
+def check_signature(token, now=None, secret=None):
+    """Function to check signature and expiry of a token without database access"""
+    try:
+        random_part, expires, signature = token.strip().split(".")
+        expires = int(expires)
+    except (AttributeError, ValueError):
+        return False
+    message = f"{random_part}.{expires}"
+    if not hmac.compare_digest(sign(secret or load_secret(), message), signature):
+        return False
+    return expires > (now or datetime.now()).timestamp()
+
+
+def validate_session(cur, token, now=None, secret=None):
+    """
+    Function to return the user ID of a valid session token, or None if the token is forged, expired,
+    revoked or belongs to a deleted account (one primary key lookup for well-formed tokens).
+    """
+    now = now or datetime.now()
+    if not token or not check_signature(token, now, secret):
+        return None
+    cur.execute("""SELECT s.user_id FROM sessions AS s JOIN user AS u ON u.user_id = s.user_id
+                WHERE s.token_hash = ? AND s.revoked_at IS NULL AND s.expires_at > ? AND u.deleted_at IS NULL""",
+                (token_hash(token), now.strftime(TIME_FORMAT)))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def revoke_session(cur, db, token, now=None):
+    """Function to revoke one session (log out); returns True if the session existed"""
+    cur.execute("UPDATE sessions SET revoked_at = ? WHERE token_hash = ? AND revoked_at IS NULL",
+                ((now or datetime.now()).strftime(TIME_FORMAT), token_hash(token)))
+    db.commit()
+    return cur.rowcount > 0
+
+
+def revoke_user_sessions(cur, db, user_id, now=None, commit=True):
+    """Function to revoke all sessions of a user, e.g. after a password change; returns the number of sessions"""
+    cur.execute("UPDATE sessions SET revoked_at = ? WHERE user_id = ? AND revoked_at IS NULL",
+                ((now or datetime.now()).strftime(TIME_FORMAT), user_id))
+    if commit:
+        db.commit()
+    return cur.rowcount
+
+
+def sweep_sessions(cur, db, now=None, batch_size=10000):
+    """Function to delete expired sessions (and revoked ones that would have expired) in batches"""
+    cutoff = (now or datetime.now()).strftime(TIME_FORMAT)
+    deleted = 0
+    while True:
+        cur.execute("""DELETE FROM sessions WHERE token_hash IN
+                    (SELECT token_hash FROM sessions WHERE expires_at <= ? LIMIT ?)""", (cutoff, batch_size))
+        db.commit()
+        deleted += cur.rowcount
+        if cur.rowcount < batch_size:
+            return deleted
+
+
+def save_token(token, path=None):
+    """Function to store the token of the current user in the session file"""
+    write_private(path or SESSION_FILE, token)
+
+
+def load_token(path=None):
+    """Function to read the token of the session file (or of HABIT_SESSION_TOKEN for scripts); None if missing"""
+    token = os.environ.get("HABIT_SESSION_TOKEN")
+    if token:
+        return token.strip()
+    try:
+        with open(path or SESSION_FILE, "r", encoding="utf-8") as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def clear_token(path=None):
+    """Function to delete the session file"""
+    try:
+        os.remove(path or SESSION_FILE)
+    except FileNotFoundError:
+        pass
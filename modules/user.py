@@ -21,10 +21,14 @@ class User:
             A unique identifier for the user to handle name duplications.
         :param user_pwd: str, optional
             The password chosen by the user for authentication.
+
+        The user_id is the internal key of the user and never changes.
+        A change of the user ID in the profile only changes the login ID (self.login_id).
         """ 
 
         self.user_name = user_name
         self.user_id = user_id
+        self.login_id = user_id
         self.user_pwd = user_pwd
         #Database connection
         self.db = db_connection
@@ -1,12 +1,20 @@
 """
 This file contains helper functions for the user class to create, change and authenticate a user profile.
 The library sys is used for program termination. The library pwinput is used to cover a password while typing.
+Users log in with their user name or their login ID; the internal user_id referenced by habits and counter never changes.
+Deleted accounts are marked and hidden immediately; their data is deleted in the background (see purger.py).
+Passwords are stored as salted KDF hashes (see passwords.py); legacy plaintext passwords are rehashed at the next login.
 All functions are called in the user class.
 """
 
 import sys
+import time
 import pwinput
 import sqlite3
+from datetime import datetime
+from passwords import hash_password, verify_password, needs_rehash
+from sessions import revoke_user_sessions
+import ratelimit
 
 
 def create_name(cur, db):
@@ -75,6 +83,12 @@ def create_id(cur, db):
                 print("Please make sure you entered two characters for each part of the ID.")
                 continue
 
+            # Check for duplicate (login IDs and internal keys of users who changed their login ID)
+            cur.execute("SELECT 1 FROM user WHERE login_id = ? OR user_id = ?", (user_id, user_id))
+            if cur.fetchone():
+                print("This user ID is already taken. Please choose different letters or digits.")
+                continue
+
             # Confirm with the user
             id_correct = input(f"Is this your ID: '{user_id}'? Type 'Y' for yes and 'N' for no: ").lower()
             if id_correct == "n":
@@ -124,8 +138,8 @@ def create_profile(cur, db):
         user_id = create_id(cur, db)
         user_pwd = create_pwd(cur, db)
 
-        cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES (?, ?, ?)",
-                    (user_id, user_name, user_pwd))
+        cur.execute("INSERT INTO user (user_id, user_name, user_pwd, login_id) VALUES (?, ?, ?, ?)",
+                    (user_id, user_name, hash_password(user_pwd), user_id))
         db.commit()
         print("User created successfully!")
         return user_id, user_name, user_pwd
@@ -156,24 +170,25 @@ def change_profile(cur, db, user):
             
             elif user_input == "2":
                 new_user_pwd = create_pwd(cur, db)
-                cur.execute("UPDATE user SET user_pwd = ? WHERE user_id = ?", (new_user_pwd, user.user_id))
+                cur.execute("UPDATE user SET user_pwd = ? WHERE user_id = ?", (hash_password(new_user_pwd), user.user_id))
+                # Sessions of the old password are no longer valid
+                revoke_user_sessions(cur, db, user.user_id, commit=False)
                 db.commit()
-                print("Password changed successfully.")
+                print("Password changed successfully. Please log in again on your other devices.")
             
             elif user_input == "3":
-                old_user_id = user.user_id # Save old ID
-                new_user_id = create_id(cur, db) # Create new ID
+                cur.execute("SELECT login_id FROM user WHERE user_id = ?", (user.user_id,))
+                row = cur.fetchone()
+                old_login_id = row[0] if row else user.user_id # Save old ID
+                new_login_id = create_id(cur, db) # Create new ID
                 
-                # Update user table
-                cur.execute("UPDATE user SET user_id = ? WHERE user_id = ?", (new_user_id, old_user_id))
-                
-                # Update counter table
-                cur.execute("UPDATE counter SET user_id = ? WHERE user_id = ?",(new_user_id, old_user_id))
+                # Only the login ID changes, habits and counter keep the internal user ID
+                cur.execute("UPDATE user SET login_id = ? WHERE user_id = ?", (new_login_id, user.user_id))
                 
                 # Commit and inform user
                 db.commit()
-                user.user_id = new_user_id
-                print(f"Your user ID was successfully changed from '{old_user_id}' to '{new_user_id}'.")
+                user.login_id = new_login_id
+                print(f"Your user ID was successfully changed from '{old_login_id}' to '{new_login_id}'.")
                 
             elif user_input == "4":
                 print("\nDo you want to delete your user account?")
@@ -184,25 +199,21 @@ def change_profile(cur, db, user):
                     confirm_input2 = input("To confirm deletion, enter your user ID: ").strip().lower()
                     # Fetch actual credentials from database
                     cur.execute(
-                        "SELECT user_id, user_pwd FROM user WHERE user_id = ? OR user_name = ?",
+                        "SELECT user_id, user_pwd, login_id FROM user WHERE user_id = ? OR user_name = ?",
                         (user.user_id, user.user_id)
                     )
                     result = cur.fetchone()
                     if not result:
                         print("User not found in database. Cannot delete.")
                         return
-                    real_id, stored_pwd = result
-                    real_id_lower = real_id.lower()
+                    real_id, stored_pwd, login_id = result
+                    real_id_lower = (login_id or real_id).lower()
                                        
-                    if confirm_input1 == stored_pwd and confirm_input2 == real_id_lower:
-                        # Deletion of Counter data
-                        cur.execute("DELETE FROM counter WHERE user_id = ?", (real_id,))
-                        # Deletion of Habit data
-                        cur.execute("DELETE FROM habits WHERE user_id = ?", (real_id,))
-                        # Deletion of User data
-                        cur.execute("DELETE FROM user WHERE user_id = ?", (real_id,))
-                        db.commit()
-                        print("All your account data (user, habits & counters) has been successfully deleted.")
+                    if verify_password(confirm_input1, stored_pwd) and confirm_input2 == real_id_lower:
+                        # The account is hidden at once, the purger deletes the data in small batches
+                        mark_user_deleted(cur, db, real_id)
+                        print("Your account has been deleted. All your data (user, habits & counters) "
+                              "will be removed in the background.")
                         sys.exit(0)  # Cancel program --> log-off
                     else:
                         print("Password or user ID were incorrect. Account deletion was canceled.")
@@ -220,6 +231,59 @@ def change_profile(cur, db, user):
             db.rollback()
             print(f"An error occurred when changing profile: {e}")
   
+
+def mark_user_deleted(cur, db, user_id):
+    """
+    Function to delete an account: the user is marked as deleted (one row), which hides the account from
+    login and analytics at once. The login ID is released for new users.
+    """
+    cur.execute("UPDATE user SET deleted_at = ?, login_id = NULL WHERE user_id = ?",
+                (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), user_id))
+    revoke_user_sessions(cur, db, user_id, commit=False)
+    db.commit()
+
+
+def verify_login(cur, db, identifier, password, source="local", rate_limit=True):
+    """
+    Function to verify the password of a user (identified by user name or user ID) without user interaction.
+    Plaintext passwords and hashes with weaker parameters are rehashed after a successful verification.
+    Attempts are rate limited per identifier and source before any database access (see ratelimit.py).
+    Returns the user ID or None.
+    """
+    if rate_limit and not ratelimit.limiter.allow(identifier, source):
+        return None
+    cur.execute("SELECT user_id, user_pwd FROM user WHERE (user_name = ? OR login_id = ?) AND deleted_at IS NULL",
+                (identifier, identifier))
+    result = cur.fetchone()
+    if not result or not verify_password(password, result[1]):
+        ratelimit.limiter.save()
+        return None
+    real_id, stored_pwd = result
+    ratelimit.limiter.reset(identifier, source)
+    if needs_rehash(stored_pwd):
+        cur.execute("UPDATE user SET user_pwd = ? WHERE user_id = ?", (hash_password(password), real_id))
+        db.commit()
+    return real_id
+
+
+def benchmark_login(cur, db, identifier, password, runs=50):
+    """
+    Function to measure the latency of the login verification (lookup, KDF and rehash check).
+    Returns a dictionary with the p50, p99 and maximum latency in milliseconds.
+    """
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        verify_login(cur, db, identifier, password, rate_limit=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "runs": runs,
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+        "max_ms": round(latencies[-1], 2),
+    }
+
             
 def user_auth(cur, db):
     """
@@ -232,13 +296,18 @@ def user_auth(cur, db):
         try:
             print("\n***User Authentication***")
             identifier = input("Please enter your username or user ID: ").strip()
-            cur.execute("SELECT user_id, user_pwd FROM user WHERE user_name = ? OR user_id = ?",
+            # Too many attempts are refused before the database is queried
+            if not ratelimit.limiter.allow(identifier, "cli"):
+                wait = ratelimit.limiter.retry_after(identifier, "cli")
+                print(f"Too many login attempts. Please try again in {wait:.0f} seconds.")
+                return None
+            cur.execute("SELECT user_id FROM user WHERE (user_name = ? OR login_id = ?) AND deleted_at IS NULL",
                     (identifier, identifier))
             result = cur.fetchone()          
             if result:
-                real_id, stored_pwd = result
                 input_pwd = pwinput.pwinput("Please enter your password: ")
-                if input_pwd == stored_pwd:
+                real_id = verify_login(cur, db, identifier, input_pwd, "cli", rate_limit=False)
+                if real_id:
                     print("Authentication successful!")
                     return real_id
                 else:
@@ -251,9 +320,10 @@ def user_auth(cur, db):
                             # Use create_pwd function to get a new password
                             new_pwd = create_pwd(cur, db)
                             cur.execute(
-                                "UPDATE user SET user_pwd = ? WHERE user_name = ? OR user_id = ?",
-                                (new_pwd, identifier, identifier)
+                                "UPDATE user SET user_pwd = ? WHERE user_name = ? OR login_id = ?",
+                                (hash_password(new_pwd), identifier, identifier)
                             )
+                            revoke_user_sessions(cur, db, result[0], commit=False)
                             db.commit()
                             print("Password has been reset. Please log in again.")
                             attempts = 0
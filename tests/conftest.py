@@ -4,11 +4,25 @@ File used to indicate the correct test folder and to load the sample data.
 
 import sys
 import os
+import pytest
 
 # Add modules folder to sys.path to find all non-test modules
 modules_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'modules'))
 if os.path.isdir(modules_path) and modules_path not in sys.path:
     sys.path.insert(0, modules_path)
+
+### Benchmark tests: wall-clock limits depend on the machine, they only run with HABIT_BENCHMARKS=1
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: wall-clock limit (run with HABIT_BENCHMARKS=1)")
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get("HABIT_BENCHMARKS") == "1":
+        return
+    skip = pytest.mark.skip(reason="benchmark, set HABIT_BENCHMARKS=1 to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
     
 ### Fixture for Sample data (4 week period)
 
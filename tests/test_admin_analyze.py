@@ -0,0 +1,60 @@
+"""
+Test file for the admin_analyze.py module
+"""
+
+import sqlite3
+import pytest
+import admin_analyze
+from db import create_tables
+from habit_manager import create_predef_habits
+
+class TestAdminAnalyze:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path):
+        # Create a database file with three users (worker processes open it read-only)
+        self.db_file = str(tmp_path / "test_admin.db")
+        self.db = sqlite3.connect(self.db_file)
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        create_predef_habits(self.cur, self.db)
+        users = {"user0001": ["PMR", "Yoga"], "user0002": ["PMR"], "user0003": ["PMR", "Jogging"]}
+        for user_id, habits in users.items():
+            self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES (?, ?, ?)",
+                             (user_id, user_id, "pa$$word123"))
+            for habit in habits:
+                self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_def, habit_type, habit_interval, is_custom)
+                                 SELECT ?, habit_name, habit_def, habit_type, habit_interval, 0 FROM habits
+                                 WHERE user_id IS NULL AND habit_name = ?""", (user_id, habit))
+                # 10 consecutive check-ins with streaks 1-10
+                self.cur.executemany("INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak) VALUES (?, ?, ?, '18:00:00', 1, ?)",
+                                     [(user_id, habit, f"2025-04-{day:02d}", day) for day in range(1, 11)])
+                self.cur.execute("UPDATE habits SET max_streak = 10 WHERE user_id = ? AND habit_name = ?",
+                                 (user_id, habit))
+        # A custom habit is not part of the popular predefined habits
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_type, habit_interval, is_custom, max_streak)
+                         VALUES ('user0002', 'Piano', 'Cognitive', 'Daily', 1, 1)""")
+        self.cur.execute("INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak) VALUES ('user0002', 'Piano', '2025-04-01', '18:00:00', 1, 1)")
+        self.db.commit()
+        yield
+        self.db.close()
+
+    def test_rowid_ranges(self):
+        # 51 counter records in chunks of 20 rowids
+        assert admin_analyze.rowid_ranges(self.cur, 20) == [(1, 20), (21, 40), (41, 51)]
+
+    def test_global_stats_parallel(self):
+        # Parallel scan over small chunks must give the same result as one scan
+        single = admin_analyze.global_stats(self.db_file, workers=1)
+        popular, streaks, distribution = admin_analyze.global_stats(self.db_file, workers=2, chunk_rows=7)
+        for expected, result in zip(single, (popular, streaks, distribution)):
+            assert expected.equals(result)
+
+        assert list(popular["Habit"]) == ["PMR", "Jogging", "Yoga"]
+        assert list(popular["Users"]) == [3, 1, 1]
+        assert popular.loc[0, "Checks"] == 30
+        streaks = streaks.set_index("Type")
+        # Average of the streaks 1-10 is 5.5
+        assert streaks.loc["Relaxing", "Avg Streak"] == 5.5
+        assert streaks.loc["Cognitive", "Avg Streak"] == 1
+        counts = dict(zip(distribution["Longest Streak"], distribution["Habits"]))
+        assert counts == {"0": 0, "1": 1, "2-7": 0, "8-30": 5, "31-90": 0, "91-365": 0, "366+": 0}
@@ -3,9 +3,11 @@ Test file for the analyze.py module
 """
 
 import io
+import time
 import pytest
 import pandas as pd
 from contextlib import redirect_stdout
+from datetime import date
 from db import create_tables
 import analyze
 
@@ -128,3 +130,129 @@ class TestAnalyze:
         # Check 2 exemplary habits
         assert reps.get("PMR") == 28
         assert reps.get("Jogging") == 4
+
+    def test_show_completion_rates(self):
+        # Sample data: 28 daily checks (until 2025-04-28) and 4 weekly checks since 2025-04-01
+        rates, adherence = analyze.show_completion_rates(self.cur, "test0123", today="2025-04-28")
+        assert isinstance(rates, pd.DataFrame)
+        rates = rates.set_index("Habit")
+        # Every period since the habit creation was completed --> 100 %
+        assert rates.loc["PMR", "7 Days"] == 100.0
+        assert rates.loc["PMR", "30 Days"] == 100.0
+        assert rates.loc["Jogging", "30 Days"] == 100.0
+        assert rates.loc["PMR", "Trend"] == 0.0
+        # ISO week 2025-W17 (21.-27.04.): 3 daily habits * 7 days + 3 weekly habits
+        week = adherence.set_index("Week").loc["2025-W17"]
+        assert week["Completed"] == week["Expected"] == 24
+
+    def test_completion_rates_per_interval(self):
+        # W2, monthly, weekday and Sunday-week habits are scored by the periods of their interval
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test4567', 'other', 'x')")
+        habits = [("Swim", "2x per week", "W2", 0, "2025-03-31"), ("Budget", "Monthly", "M", 0, "2025-01-01"),
+                  ("Gym", "Mon, Wed, Fri", "S21", 0, "2025-04-14"), ("Plan", "Weekly", "W", 6, "2025-04-06")]
+        self.cur.executemany("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, week_start,
+                             habit_date) VALUES ('test4567', ?, ?, ?, ?, ?)""", habits)
+        checks = [("Swim", "2025-04-01"), ("Swim", "2025-04-03"), ("Swim", "2025-04-08"), ("Swim", "2025-04-15"),
+                  ("Swim", "2025-04-17"), ("Budget", "2025-01-15"), ("Budget", "2025-03-02"),
+                  ("Gym", "2025-04-14"), ("Gym", "2025-04-16"), ("Gym", "2025-04-18"), ("Gym", "2025-04-21"),
+                  ("Gym", "2025-04-23"), ("Plan", "2025-04-06"), ("Plan", "2025-04-12"), ("Plan", "2025-04-20")]
+        self.cur.executemany("""INSERT INTO counter (user_id, habit_name, check_date, check_time)
+                             VALUES ('test4567', ?, ?, '18:00:00')""", checks)
+        self.db.commit()
+        rates, adherence = analyze.get_completion_rates(self.cur, "test4567", today="2025-04-28")
+        rates = rates.set_index("Habit")
+        # Swim: 5 of 8 checks in 4 weeks, none in the last week; the running week does not count yet
+        assert rates.loc["Swim", "30 Days"] == 62.5 and rates.loc["Swim", "7 Days"] == 0.0
+        # Budget: January and March of the 3 months that ended within 90 days
+        assert rates.loc["Budget", "90 Days"] == 66.7
+        # Gym: 5 of 6 scheduled days
+        assert rates.loc["Gym", "30 Days"] == 83.3
+        # Plan: weeks from Sunday to Saturday, 2 of 3 weeks
+        assert rates.loc["Plan", "30 Days"] == 66.7
+        # ISO week 2025-W17: 2 Swim checks, 3 Gym days and the Plan week ending on Saturday 26.04.
+        week = adherence.set_index("Week").loc["2025-W17"]
+        assert (week["Completed"], week["Expected"]) == (3, 6)
+
+    def insert_history(self):
+        # 5+ years of daily history for all 6 habits
+        rows = []
+        for habit in ["PMR", "Meditation", "Journaling", "Week Planning", "Yoga", "Jogging"]:
+            for day in pd.date_range("2020-01-01", "2025-03-31").strftime("%Y-%m-%d"):
+                rows.append(("test0123", habit, day, "18:00:00", 1, 1))
+        self.cur.executemany("INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.db.commit()
+
+    def test_show_completion_rates_long_history(self):
+        # The rates of all 6 habits are computed from 5+ years of history
+        self.insert_history()
+        rates, _ = analyze.show_completion_rates(self.cur, "test0123", today="2025-04-28")
+        assert len(rates) == 6
+        assert rates.set_index("Habit").loc["PMR", "30 Days"] == 100.0
+
+    @pytest.mark.benchmark
+    def test_show_completion_rates_latency(self):
+        # 5+ years of history must stay within the latency budget
+        self.insert_history()
+        start = time.perf_counter()
+        rates, _ = analyze.show_completion_rates(self.cur, "test0123", today="2025-04-28")
+        assert time.perf_counter() - start < 0.5
+        assert len(rates) == 6
+
+    def test_show_heatmap(self):
+        # Sample data: PMR checked daily from 2025-04-01 to 2025-04-28, Jogging once a week
+        f = io.StringIO()
+        with redirect_stdout(f):
+            df = analyze.show_heatmap(self.cur, "test0123", year=2025, today=date(2025, 4, 29))
+        assert "Heatmap 2025 for all habits" in f.getvalue()
+        stats = df.set_index("Habit")
+        assert stats.loc["PMR", "Days Checked"] == 28
+        assert stats.loc["PMR", "Longest Streak"] == 28
+        # Not yet checked today, but yesterday --> streak still alive
+        assert stats.loc["PMR", "Current Streak"] == 28
+        assert stats.loc["Jogging", "Days Checked"] == 4
+        assert stats.loc["Jogging", "Longest Streak"] == 1
+
+    def test_show_measure_stats(self):
+        # Test the measurement statistics of a quantity-tracked habit from the rollups
+        from datetime import datetime
+        from counter_manager import record_check
+        from db import rebuild_rollup
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom, unit, goal)
+                         VALUES ('test0123', 'Running', 'Daily', 'D', 1, 'km', 5)""")
+        self.db.commit()
+        # Week 1: 4 + 6 km, week 2: 5 + 7 + 3 km
+        for day, km in [(7, 4), (8, 6), (14, 5), (15, 7), (16, 3)]:
+            record_check(self.cur, self.db, "test0123", "Running", datetime(2025, 4, day, 7, 0), quantity=km)
+        df = analyze.show_measure_stats(self.cur, "test0123", grain="W")
+        row = df[df["Habit"] == "Running"].iloc[0]
+        assert row["Periods"] == 2 and row["Total"] == 25
+        assert row["Mean per Check"] == 5 and row["Mean per Period"] == 12.5
+        assert row["Goal Reached (%)"] == 60
+        # The rebuild from the counter table gives the same rollups
+        self.cur.execute("SELECT * FROM measure_rollup WHERE habit_name = 'Running' ORDER BY grain, bucket")
+        rollups = self.cur.fetchall()
+        rebuild_rollup(self.cur, self.db, "test0123", "Running")
+        self.cur.execute("SELECT * FROM measure_rollup WHERE habit_name = 'Running' ORDER BY grain, bucket")
+        assert self.cur.fetchall() == rollups
+
+    def test_measure_rollup_parity(self):
+        # A day counts as one measurement in the live rollups and in the rebuild (same-day quantities are summed)
+        from datetime import datetime
+        from counter_manager import record_check
+        from db import rebuild_rollup
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom, unit, goal)
+                         VALUES ('test0123', 'Running', 'Daily', 'D', 1, 'km', 5)""")
+        # Counter record of a manual counter increment with a quantity on 2025-04-08
+        self.cur.execute("""INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, quantity)
+                         VALUES ('test0123', 'Running', '2025-04-08', '06:00:00', 1, 2)""")
+        self.db.commit()
+        for day, hour, km in [(7, 7, 4), (7, 19, 3), (8, 7, 4)]:
+            record_check(self.cur, self.db, "test0123", "Running", datetime(2025, 4, day, hour, 0), quantity=km)
+        self.cur.execute("""SELECT n, total, min_value, max_value, goal_hits FROM measure_rollup
+                         WHERE habit_name = 'Running' AND grain = 'W'""")
+        assert self.cur.fetchall() == [(2, 10, 4, 6, 1)]
+        self.cur.execute("SELECT * FROM measure_rollup WHERE habit_name = 'Running' ORDER BY grain, bucket")
+        rollups = self.cur.fetchall()
+        rebuild_rollup(self.cur, self.db, "test0123", "Running")
+        self.cur.execute("SELECT * FROM measure_rollup WHERE habit_name = 'Running' ORDER BY grain, bucket")
+        assert self.cur.fetchall() == rollups
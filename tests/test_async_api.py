@@ -0,0 +1,142 @@
+"""
+Test file for the async_api.py module
+"""
+
+import asyncio
+import sqlite3
+import time
+import pytest
+import sessions
+import async_api
+from cli import CommandError
+from db import create_tables
+from habit_manager import create_predef_habits
+
+# Query that keeps SQLite busy for a while (count to n)
+SLOW_QUERY = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?) SELECT count(*) FROM n"
+
+
+def slow_count(cur, db, n):
+    return cur.execute(SLOW_QUERY, (n,)).fetchone()[0]
+
+
+class TestAsyncApi:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path, monkeypatch):
+        # Setup: database with the predefined habits, a user and a session
+        monkeypatch.setenv("HABIT_SESSION_SECRET", "test-secret")
+        self.path = str(tmp_path / "test_async_api.db")
+        db = sqlite3.connect(self.path)
+        cur = db.cursor()
+        create_tables(cur, db)
+        create_predef_habits(cur, db)
+        cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'x')")
+        db.commit()
+        self.token = sessions.create_session(cur, db, "test0123")
+        db.close()
+        yield
+
+    def run(self, scenario, **options):
+        # Run a scenario (coroutine function with an open tracker) and close the tracker
+        async def run():
+            async with async_api.AsyncTracker(self.path, **options) as tracker:
+                return await scenario(tracker)
+        return asyncio.run(run())
+
+    def test_core_operations(self):
+        # Check-in on the writer thread, habit list, streaks, statistics and due habits on the reader threads
+        async def scenario(tracker):
+            user_id = await tracker.authenticate(self.token)
+            check = await tracker.check(user_id, "yoga")
+            duplicate = await tracker.check(user_id, "Yoga")
+            with pytest.raises(CommandError):
+                await tracker.check(user_id, "Unknown")
+            habits, streaks, stats, due = await asyncio.gather(
+                tracker.list_habits(user_id), tracker.streaks(user_id), tracker.stats(user_id, "Yoga"),
+                tracker.due(user_id))
+            return user_id, check, duplicate, habits, streaks, stats, due, await tracker.authenticate("invalid")
+
+        user_id, check, duplicate, habits, streaks, stats, due, invalid = self.run(scenario)
+        assert user_id == "test0123" and invalid is None
+        assert check["status"] == "checked" and duplicate["status"] == "duplicate"
+        assert "Yoga" in [habit["habit_name"] for habit in habits]
+        assert streaks[0]["habit_name"] == "Yoga" and streaks[0]["cur_streak"] == 1
+        assert stats[0]["checks"] == 1
+        assert "Yoga" not in [entry["habit_name"] for entry in due]
+
+    def test_readers_are_read_only(self):
+        # A change on a reader connection is rejected
+        async def scenario(tracker):
+            with pytest.raises(sqlite3.OperationalError):
+                await tracker.read(lambda cur, db: cur.execute("DELETE FROM habits"))
+
+        self.run(scenario)
+
+    def test_timeout_interrupts_query(self):
+        # The running statement is interrupted, the reader thread is free again at once
+        async def scenario(tracker):
+            start = time.perf_counter()
+            with pytest.raises(TimeoutError):
+                await tracker.read(slow_count, 10 ** 9, timeout=0.05)
+            interrupted = time.perf_counter() - start
+            return interrupted, await tracker.read(slow_count, 10, timeout=1)
+
+        interrupted, count = self.run(scenario, readers=1)
+        assert interrupted < 1 and count == 10
+
+    def test_cancellation(self):
+        # A cancelled queued call never runs, a cancelled change is rolled back
+        calls = []
+
+        def insert_and_wait(cur, db):
+            cur.execute("UPDATE habits SET habit_def = 'changed' WHERE habit_name = 'Yoga'")
+            return slow_count(cur, db, 10 ** 9)
+
+        async def scenario(tracker):
+            running = asyncio.create_task(tracker.read(slow_count, 10 ** 9))
+            queued = asyncio.create_task(tracker.read(lambda cur, db: calls.append(1)))
+            change = asyncio.create_task(tracker.write(insert_and_wait))
+            await asyncio.sleep(0.1)
+            for task in (queued, running, change):
+                task.cancel()
+            await asyncio.gather(running, queued, change, return_exceptions=True)
+            return await tracker.read(lambda cur, db: cur.execute(
+                "SELECT habit_def FROM habits WHERE habit_name = 'Yoga'").fetchone()[0])
+
+        definition = self.run(scenario, readers=1)
+        assert calls == [] and definition != "changed"
+
+    def test_event_loop_is_not_blocked(self):
+        # The loop keeps running while a long query runs on a reader thread
+        async def scenario(tracker):
+            monitor = async_api.LoopMonitor()
+            monitor.start()
+            start = time.perf_counter()
+            await tracker.read(slow_count, 500000)
+            seconds = time.perf_counter() - start
+            return seconds, len(monitor.lags), await monitor.stop()
+
+        seconds, ticks, lag = self.run(scenario)
+        assert ticks > 20
+        assert lag["p99_lag_ms"] < seconds * 1000 / 10
+
+    def test_benchmark(self):
+        # Concurrent calls without errors; the report contains throughput, latency and loop lag
+        async def scenario(tracker):
+            return await async_api.benchmark(tracker, "test0123", "PMR", calls=500, concurrency=10)
+
+        report = self.run(scenario)
+        assert report["calls"] == 500 and report["errors"] == 0
+        assert report["p50_ms"] <= report["p99_ms"]
+        assert report["max_lag_ms"] >= report["p99_lag_ms"] >= 0
+
+    @pytest.mark.benchmark
+    def test_throughput(self):
+        # More than 200 calls per second; the calls add less than 1 ms to the p99 loop lag of the idle loop
+        # (the maximum lag is a single sample and varies by several ms with the scheduler of the machine)
+        async def scenario(tracker):
+            return await async_api.benchmark(tracker, "test0123", "PMR", calls=2000, concurrency=10)
+
+        report = self.run(scenario)
+        assert report["errors"] == 0 and report["calls_per_second"] > 200
+        assert report["p99_lag_ms"] - report["idle_p99_lag_ms"] < 1
@@ -0,0 +1,126 @@
+"""
+Test file for the batch.py module
+"""
+
+import sqlite3
+import time
+import pytest
+import batch
+from datetime import date, timedelta
+from db import create_tables
+from habit_manager import create_predef_habits
+
+class TestBatch:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path):
+        # Setup: predefined habits and two users, 'test4567' logs in with the login ID 'runner'
+        self.db = sqlite3.connect(str(tmp_path / "test_batch.db"))
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        create_predef_habits(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'x')")
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd, login_id) VALUES ('test4567', 'other', 'x', 'runner')")
+        self.db.commit()
+        yield
+        self.db.close()
+
+    def habit_state(self, user_id, habit_name):
+        self.cur.execute("SELECT cur_streak, max_streak FROM habits WHERE user_id = ? AND habit_name = ?",
+                         (user_id, habit_name))
+        return self.cur.fetchone()
+
+    def test_run_batch(self):
+        # Habits are created and checked in the same batch, invalid lines are reported with their reason
+        lines = [
+            "# Seed habits for the team",
+            'create-habit test0123 "cold shower" D Physical "A cold shower every morning"',
+            "create-habit runner Stretching W3",
+            "check test0123 'Cold Shower' 2025-04-01",
+            "check test0123 cold\\ shower 2025-04-02",
+            "check RUNNER yoga 2025-04-02 20",
+            "",
+            "check test0123 Yoga 2025-02-30",
+            "check nobody Yoga 2025-04-01",
+            "create-habit test0123 PMR X",
+            "reset-rep test0123 Unknown",
+            "jump test0123",
+        ]
+        result = batch.run_batch(self.cur, self.db, lines, transaction_size=2)
+        assert (result["ok"], result["rejected"], result["failed"]) == (5, 5, 0)
+        assert result["transactions"] == 3
+        report = {row["line"]: row for row in result["report"]}
+        assert report[8]["message"] == "invalid date '2025-02-30'"
+        assert report[9]["message"] == "unknown user 'nobody'"
+        assert report[10]["message"] == "invalid interval 'X'"
+        assert report[11]["message"] == "unknown habit 'Unknown'"
+        assert report[12]["message"] == "unknown command 'jump'"
+        assert all(row["ms"] >= 0 for row in result["report"])
+        # Streaks are recomputed once per transaction, predefined habits are bound to the user
+        assert self.habit_state("test0123", "Cold Shower") == (2, 2)
+        self.cur.execute("SELECT interval_code FROM habits WHERE user_id = 'test4567' AND habit_name = 'Stretching'")
+        assert self.cur.fetchone() == ("W3",)
+        self.cur.execute("SELECT quantity FROM counter WHERE user_id = 'test4567' AND habit_name = 'Yoga'")
+        assert self.cur.fetchone() == (20.0,)
+
+    def test_resets(self):
+        # A reset after checks of the same batch works on the recomputed streak
+        lines = ["check test0123 PMR 2025-04-01", "check test0123 PMR 2025-04-02", "reset-streak test0123 PMR",
+                 "check test0123 Yoga 2025-04-01", "reset-rep test0123 Yoga"]
+        result = batch.run_batch(self.cur, self.db, lines)
+        assert result["ok"] == 5 and result["transactions"] == 1
+        assert self.habit_state("test0123", "PMR") == (0, 2)
+        self.cur.execute("SELECT habit_rep FROM counter WHERE user_id = 'test0123' AND habit_name = 'Yoga'")
+        assert self.cur.fetchone() == (0,)
+
+    def test_check_after_streak_reset(self):
+        # Checks after a reset start a new streak, in the same batch and in a later batch
+        lines = ["check test0123 PMR 2025-04-01", "check test0123 PMR 2025-04-02", "reset-streak test0123 PMR",
+                 "check test0123 PMR 2025-04-03"]
+        assert batch.run_batch(self.cur, self.db, lines)["ok"] == 4
+        assert self.habit_state("test0123", "PMR") == (1, 2)
+        lines = ["check test0123 Yoga 2025-04-01", "check test0123 Yoga 2025-04-02", "check test0123 Yoga 2025-04-03",
+                 "reset-streak test0123 Yoga"]
+        assert batch.run_batch(self.cur, self.db, lines)["ok"] == 4
+        assert batch.run_batch(self.cur, self.db, ["check test0123 Yoga 2025-04-04"])["ok"] == 1
+        assert self.habit_state("test0123", "Yoga") == (1, 3)
+
+    def test_strict_dry_run_and_rollback(self):
+        # Strict mode and dry run apply nothing, a failed transaction is rolled back completely
+        lines = ["check test0123 PMR 2025-04-01", "check test0123 PMR 2000-01-01", "check test0123 Yoga 2025-04-01"]
+        assert batch.run_batch(self.cur, self.db, lines + ["check x PMR 2025-04-01"], strict=True)["ok"] == 0
+        assert batch.run_batch(self.cur, self.db, lines, dry_run=True)["valid"] == 3
+        self.cur.execute("""CREATE TRIGGER fail_check BEFORE INSERT ON counter WHEN NEW.check_date = '2000-01-01'
+                         BEGIN SELECT RAISE(ABORT, 'test failure'); END""")
+        result = batch.run_batch(self.cur, self.db, lines, transaction_size=2)
+        assert [row["status"] for row in result["report"]] == ["failed", "failed", "ok"]
+        self.cur.execute("SELECT habit_name FROM counter")
+        assert self.cur.fetchall() == [("Yoga",)]
+
+    def test_batch_streaks(self):
+        # Check-ins of many users and days are applied in several transactions with the right streaks
+        for number in range(10):
+            self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES (?, ?, 'x')",
+                             (f"bench{number}", f"bench{number}"))
+        self.db.commit()
+        start_date = date(2020, 1, 1)
+        lines = [f"check bench{n % 10} {'PMR' if n % 20 < 10 else 'Yoga'} {start_date + timedelta(days=n // 20)}"
+                 for n in range(2000)]
+        result = batch.run_batch(self.cur, self.db, lines, transaction_size=500)
+        assert result["ok"] == 2000 and result["transactions"] == 4
+        assert self.habit_state("bench0", "PMR") == (100, 100)
+
+    @pytest.mark.benchmark
+    def test_batch_benchmark(self):
+        # 20,000 check-ins of 10 users are applied in a few seconds
+        for number in range(10):
+            self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES (?, ?, 'x')",
+                             (f"bench{number}", f"bench{number}"))
+        self.db.commit()
+        start_date = date(2020, 1, 1)
+        lines = [f"check bench{n % 10} {'PMR' if n % 20 < 10 else 'Yoga'} {start_date + timedelta(days=n // 20)}"
+                 for n in range(20000)]
+        start = time.perf_counter()
+        result = batch.run_batch(self.cur, self.db, lines, transaction_size=5000)
+        assert result["ok"] == 20000 and result["transactions"] == 4
+        assert time.perf_counter() - start < 10
+        assert self.habit_state("bench0", "PMR") == (1000, 1000)
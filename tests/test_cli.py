@@ -0,0 +1,120 @@
+"""
+Test file for the cli.py module
+"""
+
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+import pytest
+import cli
+import sessions
+from db import create_tables
+from habit_manager import create_predef_habits
+
+class TestCli:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path, monkeypatch):
+        # Setup: database with the predefined habits, a user and a session of the user
+        monkeypatch.setenv("HABIT_SESSION_SECRET", "test-secret")
+        monkeypatch.chdir(tmp_path)
+        self.tmp_path = tmp_path
+        self.path = str(tmp_path / "test_cli.db")
+        db = sqlite3.connect(self.path)
+        cur = db.cursor()
+        create_tables(cur, db)
+        create_predef_habits(cur, db)
+        cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'pa$$word123')")
+        db.commit()
+        self.token = sessions.create_session(cur, db, "test0123")
+        db.close()
+        monkeypatch.setenv("HABIT_SESSION_TOKEN", self.token)
+        yield
+
+    def run(self, capsys, *argv):
+        # Run one command and return exit code and the parsed JSON output
+        code = cli.main(["--db", self.path, *argv])
+        out = capsys.readouterr().out
+        return code, json.loads(out) if out.strip() and "--tsv" not in argv else out
+
+    def test_check(self, capsys):
+        # A check-in is recorded once per period, the habit name is case-insensitive
+        code, result = self.run(capsys, "check", "yoga")
+        assert code == cli.EXIT_OK and result["habit_name"] == "Yoga" and result["status"] == "checked"
+        assert self.run(capsys, "check", "Yoga")[1]["status"] == "duplicate"
+        assert self.run(capsys, "check", "Unknown")[0] == cli.EXIT_FAILED
+
+    def test_not_logged_in(self, capsys, monkeypatch):
+        # Without a valid session the commands are refused
+        monkeypatch.setenv("HABIT_SESSION_TOKEN", "invalid")
+        assert self.run(capsys, "list")[0] == cli.EXIT_NOT_LOGGED_IN
+
+    def test_backfill_list_and_stats(self, capsys):
+        # Past check-ins are added with recomputed streaks, the output can be TSV
+        code, result = self.run(capsys, "backfill", "PMR", "2025-04-01", "2025-04-02", "2025-04-03", "2025-13-01")
+        assert code == cli.EXIT_OK and result["imported"] == 3 and result["rejected"] == 1
+        code, stats = self.run(capsys, "stats", "pmr")
+        assert stats == [{"habit_name": "PMR", "habit_interval": "Daily", "cur_streak": 3, "max_streak": 3,
+                          "checks": 3, "repetitions": 3, "first_check": "2025-04-01", "last_check": "2025-04-03",
+                          "streak_deadline": "2025-04-04", "next_due": "2025-04-04", "quantity": None, "unit": None}]
+        code, table = self.run(capsys, "list", "--tsv")
+        lines = table.splitlines()
+        assert lines[0].split("\t")[:3] == ["habit_name", "habit_type", "habit_interval"]
+        assert len(lines) == 1 + 6 and any(line.startswith("PMR\t") for line in lines)
+
+    def test_export_and_import(self, capsys, monkeypatch):
+        # The exported history can be imported by another user
+        self.run(capsys, "backfill", "Yoga", "2025-04-01", "2025-04-02")
+        path = str(self.tmp_path / "history.jsonl.gz")
+        code, result = self.run(capsys, "export", path)
+        assert result == {"path": path, "format": "jsonl", "compressed": True, "rows": 2}
+        db = sqlite3.connect(self.path)
+        db.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test4567', 'otheruser', 'x')")
+        db.commit()
+        other = sessions.create_session(db.cursor(), db, "test4567")
+        db.close()
+        monkeypatch.setenv("HABIT_SESSION_TOKEN", other)
+        code, result = self.run(capsys, "import", path)
+        assert code == cli.EXIT_OK and result["imported"] == 2 and result["habits"] == ["Yoga"]
+
+    def test_failed_import(self, capsys):
+        # An import error is reported on stderr with a non-zero exit code instead of an empty result
+        path = self.tmp_path / "broken.csv.gz"
+        path.write_bytes(b"no gzip data")
+        assert cli.main(["--db", self.path, "import", str(path)]) == cli.EXIT_FAILED
+        captured = capsys.readouterr()
+        assert captured.out == "" and "An error occurred while importing" in captured.err
+
+    def test_schema_version(self, capsys, monkeypatch):
+        # The tables are only migrated if the database is older than the program
+        calls = []
+        monkeypatch.setattr(cli, "create_tables", lambda cur, db: calls.append(1))
+        self.run(capsys, "list")
+        assert calls == []
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA user_version = 0")
+        db.close()
+        self.run(capsys, "list")
+        assert calls == [1]
+
+    def test_check_fast_path(self, capsys):
+        # A check-in does not load pandas
+        modules_path = os.path.dirname(cli.__file__)
+        script = (f"import sys; sys.path.insert(0, {modules_path!r}); "
+                  f"import cli; cli.main(['--db', {self.path!r}, 'check', 'PMR']); "
+                  "print('pandas' in sys.modules)")
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                env=os.environ.copy(), check=True).stdout.splitlines()
+        assert json.loads(output[0])["status"] == "checked"
+        assert output[1] == "False"
+        code, result = self.run(capsys, "check", "Yoga")
+        assert code == cli.EXIT_OK and result["status"] == "checked"
+
+    @pytest.mark.benchmark
+    def test_check_latency(self, capsys):
+        # A check-in takes less than 100 ms (without the start of the interpreter)
+        start = time.perf_counter()
+        assert self.run(capsys, "check", "Yoga")[0] == cli.EXIT_OK
+        assert time.perf_counter() - start < 0.1
@@ -79,3 +79,126 @@ class TestCounter:
         result = self.cur.fetchone()
         # 2.2 Check if reset worked
         assert result[0] == 0
+
+    def test_record_check_weekly_periods(self):
+        # Test that a weekly habit can be checked on Sunday and again on Monday (new calendar week)
+        from datetime import datetime
+        from counter_manager import record_check
+        self.cur.execute("INSERT INTO habits (user_id, habit_name, habit_interval, is_custom) VALUES (?, ?, 'Weekly', 1)",
+                         ("test0123", "WeeklyHabit"))
+        self.db.commit()
+        sunday = datetime(2025, 4, 6, 18, 0)
+        assert record_check(self.cur, self.db, "test0123", "WeeklyHabit", sunday)["streak"] == 1
+        # Same week --> duplicate
+        assert record_check(self.cur, self.db, "test0123", "WeeklyHabit", datetime(2025, 4, 5, 9, 0))["status"] == "duplicate"
+        # Monday --> next week, streak continues
+        result = record_check(self.cur, self.db, "test0123", "WeeklyHabit", datetime(2025, 4, 7, 9, 0))
+        assert result["status"] == "checked" and result["streak"] == 2
+        # A skipped week breaks the streak
+        result = record_check(self.cur, self.db, "test0123", "WeeklyHabit", datetime(2025, 4, 22, 9, 0))
+        assert result["broken"] and result["streak"] == 1
+        self.cur.execute("SELECT max_streak, cur_streak FROM habits WHERE user_id = ? AND habit_name = ?",
+                         ("test0123", "WeeklyHabit"))
+        assert self.cur.fetchone() == (2, 1)
+
+    def test_record_check_flexible_interval(self):
+        # Test a habit with 2 checks per week and the rebuild of its streak from the history
+        from datetime import datetime
+        from counter_manager import record_check, recompute_streaks
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom)
+                         VALUES (?, ?, '2x per week', 'W2', 1)""", ("test0123", "TwiceAWeek"))
+        self.db.commit()
+        days = [datetime(2025, 4, day, 8, 0) for day in (7, 9, 10, 15, 17, 21)]
+        results = [record_check(self.cur, self.db, "test0123", "TwiceAWeek", day) for day in days]
+        assert [r["status"] for r in results] == ["checked", "checked", "duplicate", "checked", "checked", "checked"]
+        assert [r["streak"] for r in results] == [0, 1, 1, 1, 2, 2]
+        self.cur.execute("""SELECT cur_streak, max_streak, period_count, streak_deadline FROM habits
+                         WHERE user_id = ? AND habit_name = ?""", ("test0123", "TwiceAWeek"))
+        state = self.cur.fetchone()
+        assert state == (2, 2, 1, "2025-04-27")
+        # The rebuild from the history reproduces the state of the check-ins
+        self.cur.execute("SELECT habit_streak FROM counter WHERE habit_name = 'TwiceAWeek' ORDER BY check_date")
+        history = self.cur.fetchall()
+        recompute_streaks(self.cur, self.db, "test0123", "TwiceAWeek")
+        self.cur.execute("""SELECT cur_streak, max_streak, period_count, streak_deadline FROM habits
+                         WHERE user_id = ? AND habit_name = ?""", ("test0123", "TwiceAWeek"))
+        assert self.cur.fetchone() == state
+        self.cur.execute("SELECT habit_streak FROM counter WHERE habit_name = 'TwiceAWeek' ORDER BY check_date")
+        assert self.cur.fetchall() == history
+
+    def test_record_check_streak_freeze(self):
+        # Test that a missed day uses a streak freeze and the rebuild gives the same state
+        from datetime import datetime
+        from counter_manager import record_check, recompute_streaks
+        self.cur.execute("UPDATE habits SET freeze_allowance = 1 WHERE user_id = ? AND habit_name = ?",
+                         ("test0123", "TestHabit"))
+        self.db.commit()
+        results = [record_check(self.cur, self.db, "test0123", "TestHabit", datetime(2025, 4, day, 8, 0))
+                   for day in (1, 2, 4, 6)]
+        assert [(r["streak"], r["freezes_used"], r["broken"]) for r in results] == [
+            (1, 0, False), (2, 0, False), (3, 1, False), (1, 0, True)]
+        query = """SELECT cur_streak, max_streak, freeze_tokens, freeze_month, streak_deadline FROM habits
+                WHERE user_id = 'test0123' AND habit_name = 'TestHabit'"""
+        self.cur.execute(query)
+        state = self.cur.fetchone()
+        self.cur.execute("SELECT habit_streak FROM counter WHERE habit_name = 'TestHabit' ORDER BY check_date")
+        history = self.cur.fetchall()
+        recompute_streaks(self.cur, self.db, "test0123", "TestHabit")
+        self.cur.execute(query)
+        assert self.cur.fetchone() == state
+        self.cur.execute("SELECT habit_streak FROM counter WHERE habit_name = 'TestHabit' ORDER BY check_date")
+        assert self.cur.fetchall() == history
+
+    def test_record_check_failure_is_rolled_back(self):
+        # A failing counter insert rolls back the whole check-in (no streak state, no outbox event)
+        from datetime import datetime
+        from counter_manager import record_check
+        self.cur.execute("""CREATE TRIGGER fail_check BEFORE INSERT ON counter
+                         BEGIN SELECT RAISE(ABORT, 'disk full'); END""")
+        self.db.commit()
+        result = record_check(self.cur, self.db, "test0123", "TestHabit", datetime(2025, 4, 1, 8, 0))
+        assert result["status"] == "error"
+        self.cur.execute("SELECT cur_streak, last_check FROM habits WHERE habit_name = 'TestHabit'")
+        assert self.cur.fetchone() in ((None, None), (0, None))
+        self.cur.execute("SELECT COUNT(*) FROM outbox")
+        assert self.cur.fetchone()[0] == 0
+
+    def test_record_check_same_day_parity(self):
+        # A habit with several checks per period counts a day once: the rebuild reproduces the live state
+        from datetime import datetime
+        from counter_manager import record_check, recompute_streaks
+        for code, label in (("W3", "3x per week"), ("M2", "2x per month")):
+            self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom)
+                             VALUES ('test0123', ?, ?, ?, 1)""", (code, label, code))
+            self.db.commit()
+            results = [record_check(self.cur, self.db, "test0123", code, datetime(2025, 4, day, hour, 0))
+                       for day, hour in ((1, 8), (1, 12), (1, 20), (2, 8))]
+            assert [r["status"] for r in results] == ["checked", "duplicate", "duplicate", "checked"]
+            query = """SELECT h.cur_streak, h.period_count, h.max_streak, SUM(c.habit_rep) FROM habits AS h
+                    JOIN counter AS c ON c.user_id = h.user_id AND c.habit_name = h.habit_name
+                    WHERE h.user_id = 'test0123' AND h.habit_name = ?"""
+            self.cur.execute(query, (code,))
+            live = self.cur.fetchone()
+            assert live[1] == live[3] == 2
+            recompute_streaks(self.cur, self.db, "test0123", code)
+            self.cur.execute(query, (code,))
+            assert self.cur.fetchone() == live
+
+    def test_reset_streak_parity(self, monkeypatch):
+        # A manual reset is kept in the history: the rebuild starts a new streak after it, like the next check-in
+        from datetime import datetime
+        from counter_manager import record_check, recompute_streaks
+        for day in (1, 2):
+            record_check(self.cur, self.db, "test0123", "TestHabit", datetime(2025, 4, day, 8, 0))
+        monkeypatch.setattr("builtins.input", lambda prompt: "y" if "type 'Y'" in prompt else "TestHabit")
+        Counter(self.db, "test0123").reset_streak()
+        assert record_check(self.cur, self.db, "test0123", "TestHabit", datetime(2025, 4, 3, 8, 0))["streak"] == 1
+        query = """SELECT cur_streak, max_streak, (SELECT GROUP_CONCAT(habit_streak) FROM (SELECT habit_streak
+                FROM counter WHERE user_id = 'test0123' AND habit_name = 'TestHabit' ORDER BY check_date))
+                FROM habits WHERE user_id = 'test0123' AND habit_name = 'TestHabit'"""
+        self.cur.execute(query)
+        live = self.cur.fetchone()
+        assert live == (1, 2, "1,0,1")
+        assert recompute_streaks(self.cur, self.db, "test0123", "TestHabit") == 1
+        self.cur.execute(query)
+        assert self.cur.fetchone() == live
@@ -0,0 +1,165 @@
+"""
+Test file for the daemon.py and db_pool.py modules
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import pytest
+import passwords
+import sessions
+import daemon
+from db import create_tables
+from habit_manager import create_predef_habits
+from passwords import hash_password
+
+class TestDaemon:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path, monkeypatch):
+        # Setup: database with the predefined habits, a user with a password and a session
+        monkeypatch.setenv("HABIT_SESSION_SECRET", "test-secret")
+        monkeypatch.setattr(passwords, "CURRENT_PARAMS", ("scrypt", 2 ** 10, 8, 1))
+        self.path = str(tmp_path / "test_daemon.db")
+        self.socket_path = str(tmp_path / "habit.sock")
+        db = sqlite3.connect(self.path)
+        cur = db.cursor()
+        create_tables(cur, db)
+        create_predef_habits(cur, db)
+        cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', ?)",
+                    (hash_password("pa$$word123"),))
+        db.commit()
+        self.token = sessions.create_session(cur, db, "test0123")
+        db.close()
+        yield
+
+    def serve(self, scenario, **options):
+        # Run a scenario (coroutine function with the daemon) against a started daemon and shut it down
+        async def run():
+            server = daemon.HabitDaemon(self.path, self.socket_path, **options)
+            await server.start()
+            try:
+                return await scenario(server)
+            finally:
+                await server.shutdown()
+        return asyncio.run(run())
+
+    def test_protocol(self):
+        # Authentication, check-in, stats, due habits and errors over one connection
+        async def scenario(server):
+            client = await daemon.DaemonClient(self.socket_path).connect()
+            try:
+                responses = [await client.request("stats")]
+                responses.append(await client.request("auth", token=self.token))
+                responses.append(await client.request("check", habit="yoga"))
+                responses.append(await client.request("check", habit="Yoga"))
+                responses.append(await client.request("stats", habit="Yoga"))
+                responses.append(await client.request("due"))
+                responses.append(await client.request("check", habit="Unknown"))
+                responses.append(await client.request("jump"))
+                responses.append(await client.request("server_stats"))
+                return responses
+            finally:
+                await client.close()
+
+        unauth, auth, check, duplicate, stats, due, unknown, invalid, server_stats = self.serve(scenario)
+        assert not unauth["ok"] and "Not authenticated" in unauth["error"]
+        assert auth["result"] == {"user_id": "test0123"}
+        assert check["ok"] and check["result"]["status"] == "checked" and check["ms"] > 0
+        assert duplicate["result"]["status"] == "duplicate"
+        assert stats["result"][0]["habit_name"] == "Yoga" and stats["result"][0]["checks"] == 1
+        assert "Yoga" not in [entry["habit_name"] for entry in due["result"]]
+        assert unknown["error"] == "Habit 'Unknown' not found."
+        assert invalid["error"] == "Unknown operation 'jump'."
+        assert server_stats["result"]["check"]["requests"] == 3 and server_stats["result"]["check"]["errors"] == 1
+
+    def test_login_and_sync_call(self):
+        # Login with password over the socket; a single request without asyncio
+        async def scenario(server):
+            client = await daemon.DaemonClient(self.socket_path).connect()
+            try:
+                failed = await client.request("login", identifier="testuser", password="wrong")
+                login = await client.request("login", identifier="testuser", password="pa$$word123")
+            finally:
+                await client.close()
+            ping = await asyncio.to_thread(daemon.call, "ping", self.socket_path, token=login["result"]["token"])
+            return failed, login, ping
+
+        failed, login, ping = self.serve(scenario)
+        assert failed["error"] == "Login failed."
+        assert login["result"]["user_id"] == "test0123"
+        assert ping["result"] == "pong"
+
+    def test_graceful_shutdown(self):
+        # Idle clients are disconnected, the socket file is removed
+        async def scenario(server):
+            client = await daemon.DaemonClient(self.socket_path).connect()
+            await client.request("auth", token=self.token)
+            return client
+
+        client = self.serve(scenario)
+        assert not os.path.exists(self.socket_path)
+        assert client.reader.at_eof()
+
+    def test_late_request(self, monkeypatch):
+        # A request that timed out keeps its place until it is done, the next request waits for its outcome
+        release = threading.Event()
+        monkeypatch.setitem(daemon.OPERATIONS, "slow", lambda server, db, user_id, request: release.wait(5))
+
+        async def scenario(server):
+            client = await daemon.DaemonClient(self.socket_path).connect()
+            try:
+                await client.request("auth", token=self.token)
+                timed_out = await client.request("slow")
+                held = server.pending.locked()
+                asyncio.get_running_loop().call_later(0.1, release.set)
+                ping = await client.request("ping")
+                return timed_out, held, ping, await client.request("server_stats")
+            finally:
+                await client.close()
+
+        timed_out, held, ping, server_stats = self.serve(scenario, max_pending=1, request_timeout=0.2)
+        assert not timed_out["ok"] and timed_out["running"] and "still running" in timed_out["error"]
+        assert held
+        assert ping["result"] == "pong"
+        assert server_stats["result"]["late"] == {"running": 0, "completed": 1, "failed": 0}
+
+    def test_load(self):
+        # Concurrent clients are served by the bounded thread pool without errors
+        async def scenario(server):
+            checks = await daemon.load_test(self.socket_path, self.token, requests=50, concurrency=5,
+                                            op="check", habit="PMR")
+            stats = await daemon.load_test(self.socket_path, self.token, requests=1000, concurrency=20)
+            return checks, stats, server.server_stats()
+
+        checks, stats, server_stats = self.serve(scenario, workers=4, max_pending=8)
+        assert checks["requests"] == 50 and checks["errors"] == 0
+        assert stats["requests"] == 1000 and stats["errors"] == 0
+        assert stats["p50_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+        assert server_stats["auth"]["requests"] == 25
+
+    @pytest.mark.benchmark
+    def test_load_benchmark(self):
+        # The daemon answers more than 200 requests per second
+        async def scenario(server):
+            return await daemon.load_test(self.socket_path, self.token, requests=1000, concurrency=20)
+
+        stats = self.serve(scenario, workers=4, max_pending=8)
+        assert stats["errors"] == 0 and stats["requests_per_second"] > 200
+
+    def test_reminders(self):
+        # A daemon with reminders loads the current streaks and reschedules its check-ins
+        from reminders import ReminderScheduler
+        scheduler = ReminderScheduler(lambda reminder: None)
+
+        async def scenario(server):
+            client = await daemon.DaemonClient(self.socket_path).connect()
+            try:
+                await client.request("auth", token=self.token)
+                await client.request("check", habit="Yoga")
+                return len(scheduler), scheduler.thread is not None
+            finally:
+                await client.close()
+
+        assert self.serve(scenario, reminders=scheduler) == (1, True)
+        assert scheduler.thread is None
@@ -91,3 +91,79 @@ class TestDB:
         )
         count = self.cur.fetchone()[0]
         assert count == 1 # Make sure, no second entry was inserted (only update of 1st entry intended)
+
+    def test_calendar_bitmap(self):
+        # Test that add_counter maintains the calendar bitmap and rebuild_calendar reproduces it
+        db.create_tables(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES (?, ?, ?)",
+                         ("test0123", "testuser", "pa$$word123"))
+        self.cur.execute(
+            """INSERT INTO habits (user_id, habit_name, habit_def, habit_type, habit_date, habit_interval, is_custom) 
+               VALUES (?, ?, ?, ?, date('now'), ?, 1)""",
+            ("test0123", "TestHabit", "desc", "type", "Daily")
+        )
+        self.db.commit()
+        for day in ["2024-01-01", "2024-01-02", "2024-12-31", "2025-01-01"]:
+            db.add_counter(self.cur, self.db, "test0123", "TestHabit", day, "12:00:00", 1, 1)
+        self.cur.execute("SELECT year, days FROM habit_calendar ORDER BY year")
+        bitmaps = dict(self.cur.fetchall())
+        # 2024 is a leap year: 31st of December is day index 365
+        assert int.from_bytes(bitmaps[2024], "little") == (1 << 0) | (1 << 1) | (1 << 365)
+        assert int.from_bytes(bitmaps[2025], "little") == 1
+        
+        # Rebuilding from the counter table results in the same bitmaps
+        db.rebuild_calendar(self.cur, self.db)
+        self.cur.execute("SELECT year, days FROM habit_calendar ORDER BY year")
+        assert dict(self.cur.fetchall()) == bitmaps
+
+    def test_upgrade_existing_database(self):
+        # Test that create_tables upgrades a database of an older program version
+        self.cur.execute("CREATE TABLE user (user_id TEXT PRIMARY KEY, user_name TEXT NOT NULL, user_pwd TEXT NOT NULL)")
+        self.cur.execute("""CREATE TABLE habits (user_id TEXT, habit_name TEXT NOT NULL, habit_def TEXT, habit_type TEXT,
+                         habit_date TEXT, habit_interval TEXT, is_custom BOOLEAN DEFAULT 1, max_streak INTEGER DEFAULT 0,
+                         PRIMARY KEY (user_id, habit_name))""")
+        self.cur.execute("""CREATE TABLE counter (user_id TEXT, habit_name TEXT, check_date TEXT, check_time TEXT,
+                         habit_rep INTEGER DEFAULT 0, habit_streak INTEGER DEFAULT 0,
+                         PRIMARY KEY (user_id, habit_name, check_date, check_time), UNIQUE (user_id, habit_name, check_date))""")
+        self.cur.execute("INSERT INTO user VALUES ('test0123', 'testuser', 'pa$$word123')")
+        self.cur.execute("INSERT INTO habits (user_id, habit_name, habit_interval, max_streak) VALUES ('test0123', 'TestHabit', 'Daily', 2)")
+        self.cur.executemany("INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak) VALUES ('test0123', 'TestHabit', ?, '12:00:00', 1, ?)",
+                             [("2025-04-01", 1), ("2025-04-02", 2)])
+        self.db.commit()
+        
+        db.create_tables(self.cur, self.db)
+        # The streak state and the calendar bitmap are filled from the history
+        self.cur.execute("SELECT cur_streak, last_check FROM habits WHERE user_id = 'test0123'")
+        assert self.cur.fetchone() == (2, "2025-04-02")
+        self.cur.execute("SELECT COUNT(*) FROM habit_calendar")
+        assert self.cur.fetchone()[0] == 1
+        # The period keys and the last period are backfilled
+        self.cur.execute("SELECT COUNT(*) FROM counter WHERE period_key IS NULL")
+        assert self.cur.fetchone()[0] == 0
+        self.cur.execute("SELECT last_period FROM habits WHERE user_id = 'test0123'")
+        assert self.cur.fetchone()[0] == datetime.date(2025, 4, 2).toordinal()
+        # The login ID of existing users is their user ID
+        self.cur.execute("SELECT login_id FROM user WHERE user_id = 'test0123'")
+        assert self.cur.fetchone()[0] == "test0123"
+
+    def test_data_version(self):
+        # Single changes increment the data version per row, a paused bulk change once per transaction
+        db.create_tables(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'x')")
+        self.cur.execute("INSERT INTO habits (user_id, habit_name, habit_interval) VALUES ('test0123', 'TestHabit', 'Daily')")
+        self.db.commit()
+        self.cur.execute("SELECT data_version FROM user WHERE user_id = 'test0123'")
+        assert self.cur.fetchone()[0] == 1
+        db.pause_data_version(self.cur, ["test0123"])
+        self.cur.executemany("INSERT INTO counter (user_id, habit_name, check_date) VALUES ('test0123', 'TestHabit', ?)",
+                             [(f"2025-04-{day:02d}",) for day in range(1, 31)])
+        self.cur.execute("UPDATE habits SET cur_streak = 30 WHERE user_id = 'test0123'")
+        db.resume_data_version(self.cur)
+        self.db.commit()
+        self.cur.execute("SELECT data_version FROM user WHERE user_id = 'test0123'")
+        assert self.cur.fetchone()[0] == 2
+        self.cur.execute("SELECT COUNT(*) FROM data_version_pause")
+        assert self.cur.fetchone()[0] == 0
+        self.cur.execute("DELETE FROM counter WHERE check_date = '2025-04-01'")
+        self.cur.execute("SELECT data_version FROM user WHERE user_id = 'test0123'")
+        assert self.cur.fetchone()[0] == 3
@@ -0,0 +1,83 @@
+"""
+Test file for the due.py module
+"""
+
+import sqlite3
+import time
+import pytest
+from datetime import date, datetime
+import due
+from db import create_tables
+from counter_manager import record_check
+
+class TestDue:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path):
+        # Setup: a user with the daily habit 'Yoga', the habit 'Jogging' 3x per week and the unchecked 'Reading'
+        self.db = sqlite3.connect(str(tmp_path / "test_due.db"))
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'pa$$word123')")
+        for habit_name, label, code in [("Yoga", "Daily", "D"), ("Jogging", "3x per week", "W3"), ("Reading", "Weekly", "W")]:
+            self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom)
+                             VALUES ('test0123', ?, ?, ?, 1)""", (habit_name, label, code))
+        self.db.commit()
+        yield
+        self.db.close()
+
+    def test_due_habits_of_user(self):
+        # Yoga was checked yesterday (streak at risk), Jogging once this week, Reading never
+        record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, 8, 8, 0))
+        record_check(self.cur, self.db, "test0123", "Jogging", datetime(2025, 4, 8, 8, 0))
+        entries = due.get_due_habits(self.cur, "test0123", date(2025, 4, 9))
+        assert [(e["habit_name"], e["status"], e["checks_left"]) for e in entries] == [
+            ("Yoga", "at risk", 1), ("Jogging", "due", 2), ("Reading", "due", 1)]
+        assert entries[0]["deadline"] == "2025-04-09"
+        assert entries[1]["period_end"] == date(2025, 4, 13)
+
+        # Checked habits are no longer due
+        record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, 9, 8, 0))
+        record_check(self.cur, self.db, "test0123", "Reading", datetime(2025, 4, 9, 8, 0))
+        entries = due.get_due_habits(self.cur, "test0123", date(2025, 4, 9))
+        assert [e["habit_name"] for e in entries] == ["Jogging"]
+        # In the next week all habits are due again; the weekly streak is at risk within its last days
+        entries = due.get_due_habits(self.cur, "test0123", date(2025, 4, 14))
+        assert [(e["habit_name"], e["status"]) for e in entries] == [
+            ("Jogging", "due"), ("Reading", "due"), ("Yoga", "due")]
+        entries = due.get_due_habits(self.cur, "test0123", date(2025, 4, 14), risk_days=6)
+        assert [(e["habit_name"], e["deadline"]) for e in entries][0] == ("Reading", "2025-04-20")
+
+    def test_index_range_scan(self):
+        # The sweep over all users is answered by the due index and does not read the counter table
+        query, params = due.due_query(today=date(2025, 4, 9))
+        self.cur.execute("EXPLAIN QUERY PLAN " + query, params)
+        plan = " ".join(row[3] for row in self.cur.fetchall())
+        assert "idx_habits_due" in plan
+        assert "counter" not in plan
+
+    def insert_users(self, count):
+        # Users with the habit 'Yoga' due today and the habit 'Reading' due tomorrow
+        rows = [(f"user{i:06d}", habit_name, "Daily", "D", i % 5, "2025-04-09", next_due)
+                for i in range(count)
+                for habit_name, next_due in [("Yoga", "2025-04-09"), ("Reading", "2025-04-10")]]
+        self.cur.executemany("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, cur_streak,
+                             streak_deadline, next_due) VALUES (?, ?, ?, ?, ?, ?, ?)""", rows)
+        self.db.commit()
+
+    def test_sweep_all_users(self):
+        # All users owe Yoga; the test user additionally owes its three unchecked habits
+        self.insert_users(1000)
+        result = due.sweep_due(self.cur, date(2025, 4, 9))
+        assert len(result) == 1001
+        assert all(entry["habit_name"] == "Yoga" for entry in result["user000001"])
+        assert result["user000001"][0]["status"] == "at risk" and result["user000000"][0]["status"] == "due"
+
+    @pytest.mark.benchmark
+    def test_sweep_benchmark(self):
+        # Benchmark target: the due habits of 100,000 users in a few seconds
+        self.insert_users(100_000)
+        start = time.perf_counter()
+        result = due.sweep_due(self.cur, date(2025, 4, 9))
+        seconds = time.perf_counter() - start
+        assert len(result) == 100_001
+        assert seconds < 5
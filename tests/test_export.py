@@ -0,0 +1,67 @@
+"""
+Test file for the export.py module
+"""
+
+import csv
+import gzip
+import json
+import tracemalloc
+import pytest
+import export
+
+@pytest.mark.usefixtures("sample_data")
+class TestExport:
+    @pytest.fixture(autouse=True)
+    def setup_db(self, db_and_cursor):
+        # Provide database and cursor for each test
+        self.db, self.cur = db_and_cursor
+
+    def test_iter_history_filters(self):
+        # Sample data: 3 daily habits * 28 days + 3 weekly habits * 4 weeks = 96 records
+        assert sum(1 for _ in export.iter_history(self.cur, "test0123", batch_size=10)) == 96
+        rows = list(export.iter_history(self.cur, "test0123", habit_name="PMR",
+                                        start_date="2025-04-10", end_date="2025-04-19"))
+        assert len(rows) == 10
+        assert all(row[1] == "PMR" for row in rows)
+        weekly = list(export.iter_history(self.cur, "test0123", interval="Weekly"))
+        assert len(weekly) == 12
+
+    def test_export_csv_gzip(self, tmp_path):
+        # Test the export into a gzip-compressed CSV file
+        path = tmp_path / "export.csv.gz"
+        count = export.export_history(self.cur, "test0123", str(path), "csv", compress=True)
+        assert count == 96
+        with gzip.open(path, "rt", newline="") as file:
+            rows = list(csv.reader(file))
+        assert rows[0] == export.EXPORT_COLUMNS
+        assert len(rows) == 97
+
+    def test_export_jsonl(self, tmp_path):
+        # Test the export into a JSON Lines file
+        path = tmp_path / "export.jsonl"
+        export.export_history(self.cur, "test0123", str(path), "jsonl", habit_name="Jogging")
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert len(records) == 4
+        assert records[-1]["habit_streak"] == 4 and records[-1]["habit_interval"] == "Weekly"
+
+    def test_export_unknown_format(self, tmp_path):
+        with pytest.raises(ValueError):
+            export.export_history(self.cur, "test0123", str(tmp_path / "export.xml"), "xml")
+
+    def test_export_memory_is_flat(self, tmp_path):
+        # The peak memory of the export must not grow with the length of the history
+        def peak_for(path):
+            tracemalloc.start()
+            export.export_history(self.cur, "test0123", str(path), "jsonl", batch_size=500)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak
+
+        small = peak_for(tmp_path / "small.jsonl")
+        # Add about 20.000 records of history
+        rows = [("test0123", "PMR", f"{year}-{month:02d}-{day:02d}", "18:00:00", 1, 1)
+                for year in range(1970, 2025) for month in range(1, 13) for day in range(1, 29)]
+        self.cur.executemany("INSERT OR IGNORE INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.db.commit()
+        large = peak_for(tmp_path / "large.jsonl")
+        assert large < small + 512 * 1024
@@ -0,0 +1,94 @@
+"""
+Test file for the goal_manager.py module
+"""
+
+import sqlite3
+import pytest
+from datetime import date, datetime
+from db import create_tables
+from counter_manager import increment_counter, record_check
+import goal_manager
+
+class TestGoal:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path):
+        # Setup: a user with a daily habit 'Yoga' and a quantity-tracked habit 'Jogging'
+        self.db = sqlite3.connect(str(tmp_path / "test_goal.db"))
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'pa$$word123')")
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom)
+                         VALUES ('test0123', 'Yoga', 'Daily', 'D', 1)""")
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom, unit)
+                         VALUES ('test0123', 'Jogging', 'Daily', 'D', 1, 'km')""")
+        self.db.commit()
+        yield
+        self.db.close()
+
+    def test_progress_is_updated_at_check_in(self):
+        # A count goal starting with two checks in the history and a streak goal
+        for day in (1, 2):
+            record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, day, 8, 0))
+        count_id = goal_manager.create_goal(self.cur, self.db, "test0123", "Yoga", "count", 5, "2025-04-01", "2025-04-30")
+        streak_id = goal_manager.create_goal(self.cur, self.db, "test0123", "Yoga", "streak", 4, "2025-04-01")
+        goals = {g["goal_id"]: g for g in goal_manager.get_goals(self.cur, "test0123", date(2025, 4, 2))}
+        assert goals[count_id]["progress"] == 2 and goals[streak_id]["progress"] == 2
+        # 2 checks per 2 days --> 3 remaining checks in 3 days
+        assert goals[count_id]["projected"] == date(2025, 4, 5)
+        assert goals[streak_id]["projected"] == date(2025, 4, 4)
+
+        for day in (3, 4, 6):
+            record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, day, 8, 0))
+        goals = {g["goal_id"]: g for g in goal_manager.get_goals(self.cur, "test0123", date(2025, 4, 6))}
+        assert goals[count_id]["percent"] == 100 and goals[count_id]["status"] == "Completed"
+        assert goals[count_id]["projected"] == date(2025, 4, 6)
+        assert goals[streak_id]["status"] == "Completed" and goals[streak_id]["projected"] == date(2025, 4, 4)
+
+    def test_quantity_goal(self):
+        # A quantity goal adds the measured km of every check-in
+        goal_id = goal_manager.create_goal(self.cur, self.db, "test0123", "Jogging", "quantity", 20, "2025-04-01", "2025-04-07")
+        for day, km in [(1, 5), (2, 4.5)]:
+            record_check(self.cur, self.db, "test0123", "Jogging", datetime(2025, 4, day, 8, 0), quantity=km)
+        goal = goal_manager.get_goals(self.cur, "test0123", date(2025, 4, 2))[0]
+        assert goal["goal_id"] == goal_id and goal["progress"] == 9.5 and goal["percent"] == 47.5
+        # 4.75 km per day --> the goal is reached on the 5th of April
+        assert goal["projected"] == date(2025, 4, 5) and goal["status"] == "On track"
+        df = goal_manager.show_goals(self.cur, "test0123", date(2025, 4, 2))
+        assert list(df["Goal"]) == ["Quantity 20 km"]
+
+    def test_invalid_goal(self):
+        # Unknown goal types are rejected
+        with pytest.raises(ValueError):
+            goal_manager.create_goal(self.cur, self.db, "test0123", "Yoga", "weight", 5)
+
+    def test_refresh_matches_check_ins(self):
+        # Check-ins and the refresh from the history count one check per day, also after a repetition reset
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom, unit)
+                         VALUES ('test0123', 'Rowing', '3x per week', 'W3', 1, 'km')""")
+        self.db.commit()
+        count_id = goal_manager.create_goal(self.cur, self.db, "test0123", "Rowing", "count", 10, "2025-04-01")
+        quantity_id = goal_manager.create_goal(self.cur, self.db, "test0123", "Rowing", "quantity", 50, "2025-04-01")
+        for day, hour, km in [(7, 8, 3), (7, 12, 4), (7, 20, 5), (8, 8, 6), (10, 8, 2)]:
+            record_check(self.cur, self.db, "test0123", "Rowing", datetime(2025, 4, day, hour, 0), quantity=km)
+        query = "SELECT goal_id, progress FROM goals WHERE habit_name = 'Rowing' ORDER BY goal_id"
+        self.cur.execute(query)
+        live = self.cur.fetchall()
+        assert live == [(count_id, 3), (quantity_id, 11)]
+        self.cur.execute("UPDATE counter SET habit_rep = 0 WHERE habit_name = 'Rowing'")
+        goal_manager.refresh_goals(self.cur, "test0123", "Rowing")
+        self.cur.execute(query)
+        assert self.cur.fetchall() == live
+
+    def test_check_after_manual_increment(self, monkeypatch):
+        # A check-in on the day of a manual counter increment does not count the day twice
+        today = date.today().isoformat()
+        count_id = goal_manager.create_goal(self.cur, self.db, "test0123", "Yoga", "count", 5, today)
+        monkeypatch.setattr("builtins.input", lambda prompt: "Yoga")
+        increment_counter(self.cur, self.db, "Yoga", "test0123", manual=True)
+        record_check(self.cur, self.db, "test0123", "Yoga")
+        query = "SELECT progress FROM goals WHERE goal_id = ?"
+        self.cur.execute(query, (count_id,))
+        assert self.cur.fetchone()[0] == 1
+        goal_manager.refresh_goals(self.cur, "test0123", "Yoga")
+        self.cur.execute(query, (count_id,))
+        assert self.cur.fetchone()[0] == 1
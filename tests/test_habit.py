@@ -81,6 +81,22 @@ class TestHabit:
         # 5. Database is now empty where "DeleteHabit" was
         assert count == 0 
 
+    def test_remove_custom_habit_with_history(self):
+        # The check-ins, calendar bitmaps, rollups and goals of a deleted habit are deleted with it
+        from habit_manager import remove_custom_habit
+        self.cur.execute("INSERT INTO habits (user_id, habit_name, habit_interval, is_custom) VALUES ('test0123', 'Run', 'Daily', 1)")
+        self.cur.execute("INSERT INTO counter (user_id, habit_name, check_date, quantity) VALUES ('test0123', 'Run', '2025-04-01', 5)")
+        self.cur.execute("INSERT INTO habit_calendar VALUES ('test0123', 'Run', 2025, x'00')")
+        self.cur.execute("INSERT INTO measure_rollup (user_id, habit_name, grain, bucket, n, total) VALUES ('test0123', 'Run', 'D', 1, 1, 5)")
+        self.cur.execute("""INSERT INTO goals (user_id, habit_name, goal_type, target, start_date)
+                         VALUES ('test0123', 'Run', 'count', 10, '2025-04-01')""")
+        self.db.commit()
+        assert remove_custom_habit(self.cur, self.db, "test0123", "Run")
+        assert not remove_custom_habit(self.cur, self.db, "test0123", "Run")
+        for table in ("habits", "counter", "habit_calendar", "measure_rollup", "goals"):
+            self.cur.execute(f"SELECT COUNT(*) FROM {table} WHERE user_id = 'test0123'")
+            assert self.cur.fetchone()[0] == 0
+
     def test_edit_habit(self, monkeypatch):
         # Test change of periodicity (daily vs. weekly)
         # 1. Create a custom habit "EditHabit" with monkeypatch
@@ -122,3 +138,40 @@ class TestHabit:
         result = self.cur.fetchone()
         # 5. Interval should now be changed to "weekly"
         assert result is not None and result[0] == "Weekly"
+
+    def test_set_week_start(self, monkeypatch):
+        # Sunday and Monday are two weeks for weeks starting on Monday but one week for weeks starting on Sunday
+        from counter_manager import record_check
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom)
+                         VALUES ('test0123', 'Review', 'Weekly', 'W', 1)""")
+        self.db.commit()
+        for day in (6, 7):
+            record_check(self.cur, self.db, "test0123", "Review", datetime(2025, 4, day, 9, 0))
+        self.cur.execute("SELECT cur_streak FROM habits WHERE habit_name = 'Review'")
+        assert self.cur.fetchone()[0] == 2
+        inputs = iter(["Someday", "sunday"])
+        monkeypatch.setattr("builtins.input", lambda prompt: next(inputs))
+        Habit(self.db, "test0123", "", "", "", None, "").set_week_start()
+        self.cur.execute("SELECT week_start, cur_streak FROM habits WHERE habit_name = 'Review'")
+        assert self.cur.fetchone() == (6, 1)
+        self.cur.execute("SELECT COUNT(DISTINCT period_key) FROM counter WHERE habit_name = 'Review'")
+        assert self.cur.fetchone()[0] == 1
+        # A day outside 0-6 is rejected
+        with pytest.raises(ValueError):
+            from habit_manager import set_week_start
+            set_week_start(self.cur, self.db, "test0123", 7)
+
+    def test_week_start_of_new_habits(self):
+        # Habits that are created or bound after the setting get the first day of the week of the user
+        from habit_manager import add_custom_habit, create_predef_habits, ensure_user_habit, set_week_start
+        from periods import Interval
+        create_predef_habits(self.cur, self.db)
+        set_week_start(self.cur, self.db, "test0123", 6)
+        add_custom_habit(self.cur, self.db, "test0123", "Review", Interval("W"), "Cognitive", "")
+        ensure_user_habit(self.cur, "test0123", "Yoga")
+        self.db.commit()
+        self.cur.execute("SELECT habit_name, week_start FROM habits WHERE user_id = 'test0123' ORDER BY habit_name")
+        assert self.cur.fetchall() == [("Review", 6), ("Yoga", 6)]
+        # Predefined habits and users without the setting keep the default
+        self.cur.execute("SELECT COUNT(*) FROM habits WHERE user_id IS NULL AND week_start IS NOT NULL")
+        assert self.cur.fetchone()[0] == 0
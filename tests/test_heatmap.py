@@ -0,0 +1,36 @@
+"""
+Test file for the heatmap.py module
+"""
+
+from datetime import date
+import heatmap
+
+class TestHeatmap:
+    def test_bitmap_from_dates(self):
+        # Test that every date sets exactly one bit in the bitmap of its year
+        bitmaps = heatmap.bitmap_from_dates(["2025-01-01", "2025-01-03", "2025-12-31", "2026-01-01"])
+        assert set(bitmaps) == {2025, 2026}
+        assert len(bitmaps[2025]) == heatmap.BITMAP_SIZE
+        assert heatmap.popcount(bitmaps[2025]) == 3
+        assert heatmap.popcount(bitmaps[2026]) == 1
+
+    def test_streaks(self):
+        # Test longest and current run, also over the turn of the year
+        dates = ["2024-12-30", "2024-12-31", "2025-01-01", "2025-01-05", "2025-01-06"]
+        bits, first = heatmap.join_years(heatmap.bitmap_from_dates(dates))
+        assert first == 2024
+        assert heatmap.longest_run(bits) == 3
+        today = (date(2025, 1, 6) - date(2024, 1, 1)).days
+        assert heatmap.current_run(bits, today) == 2
+
+    def test_render_heatmap(self):
+        # Test that the rendered heatmap has a title, a month header, 7 weekdays and a legend
+        counts = [0] * 365
+        counts[0] = 2
+        text = heatmap.render_heatmap(counts, 2025)
+        lines = text.splitlines()
+        assert lines[0] == "Heatmap 2025"
+        assert lines[1].split()[0] == "Jan"
+        assert len(lines) == 10
+        # 1st of January 2025 was a Wednesday
+        assert lines[4].startswith("Wed █")
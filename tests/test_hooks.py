@@ -0,0 +1,74 @@
+"""
+Test file for the hooks.py module
+"""
+
+import sqlite3
+import threading
+import time
+import pytest
+from datetime import datetime
+import hooks
+from db import create_tables
+from counter import Counter
+from counter_manager import record_check
+
+class TestHooks:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path):
+        # Setup: a user with the daily habit 'Yoga' and an empty hook registry of the program
+        self.db = sqlite3.connect(str(tmp_path / "test_hooks.db"))
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'pa$$word123')")
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom)
+                         VALUES ('test0123', 'Yoga', 'Daily', 'D', 1)""")
+        self.db.commit()
+        hooks.registry = hooks.HookRegistry()
+        yield
+        hooks.registry.shutdown()
+        self.db.close()
+
+    def test_sync_hooks_of_check_and_reset(self, monkeypatch):
+        # Sync handlers get the events after the commit of the check-in and the reset
+        events = []
+        hooks.register("check", events.append)
+        hooks.register("reset_streak", events.append)
+        record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, 8, 8, 0))
+        monkeypatch.setattr("builtins.input", lambda prompt: "y" if "type 'Y'" in prompt else "Yoga")
+        Counter(self.db, "test0123").reset_streak()
+        assert [(e["event"], e["habit_name"], e.get("streak")) for e in events] == [
+            ("check", "Yoga", 1), ("reset_streak", "Yoga", None)]
+        # A duplicate check-in does not call the hooks
+        record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, 8, 9, 0))
+        assert len(events) == 2
+
+    def test_async_hooks_do_not_delay_check_in(self):
+        # A slow async handler runs in the thread pool, the check-in returns while the handler still runs
+        release, finished = threading.Event(), threading.Event()
+        def slow(event):
+            release.wait(5)
+            time.sleep(0.05)
+            finished.set()
+        hooks.register("check", slow, mode="async")
+        record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, 8, 8, 0))
+        assert not finished.is_set()
+        release.set()
+        assert finished.wait(5)
+        hooks.registry.shutdown()
+        stats = hooks.registry.stats()
+        assert stats[0]["name"] == "slow" and stats[0]["calls"] == 1 and stats[0]["max_ms"] >= 50
+
+    def test_failure_isolation(self):
+        # A failing handler is counted and does not stop the other handlers or the check-in
+        calls = []
+        def failing(event):
+            raise RuntimeError("handler failed")
+        hooks.register("check", failing)
+        hooks.register("check", calls.append, name="collect")
+        result = record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, 8, 8, 0))
+        assert result["status"] == "checked" and len(calls) == 1
+        assert [(s["name"], s["failures"]) for s in hooks.registry.stats()] == [("failing", 1), ("collect", 0)]
+        # Unknown events are rejected at registration, hooks can be removed by name
+        with pytest.raises(ValueError):
+            hooks.register("delete", calls.append)
+        assert hooks.unregister("check", "failing") and not hooks.unregister("check", "failing")
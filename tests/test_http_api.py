@@ -0,0 +1,196 @@
+"""
+Test file for the http_api.py module
+"""
+
+import asyncio
+import sqlite3
+import pytest
+import passwords
+import sessions
+import http_api
+from datetime import date, timedelta
+from db import create_tables
+from habit_manager import create_predef_habits
+from passwords import hash_password
+
+class TestHttpApi:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path, monkeypatch):
+        # Setup: database with the predefined habits, a user with a password and a session
+        monkeypatch.setenv("HABIT_SESSION_SECRET", "test-secret")
+        monkeypatch.setattr(passwords, "CURRENT_PARAMS", ("scrypt", 2 ** 10, 8, 1))
+        self.path = str(tmp_path / "test_http_api.db")
+        db = sqlite3.connect(self.path)
+        cur = db.cursor()
+        create_tables(cur, db)
+        create_predef_habits(cur, db)
+        cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', ?)",
+                    (hash_password("pa$$word123"),))
+        db.commit()
+        self.token = sessions.create_session(cur, db, "test0123")
+        db.close()
+        yield
+
+    def serve(self, scenario, **options):
+        # Run a scenario (coroutine function with the server and a keep-alive client) and shut the server down
+        async def run():
+            server = http_api.HttpApi(self.path, port=0, **options)
+            await server.start()
+            client = await http_api.HttpClient(server.host, server.port, self.token).connect()
+            try:
+                return await scenario(server, client)
+            finally:
+                await client.close()
+                await server.shutdown()
+        return asyncio.run(run())
+
+    def test_habit_crud_and_check(self):
+        # All requests are answered on one keep-alive connection
+        async def scenario(server, client):
+            return [
+                await client.request("POST", "/habits", {"name": "cold shower", "interval": "W2", "type": "Physical"}),
+                await client.request("POST", "/habits", {"name": "Cold Shower"}),
+                await client.request("POST", "/habits", {"name": "Reading", "interval": "X"}),
+                await client.request("PATCH", "/habits/cold shower", {"interval": "D", "description": "Every morning"}),
+                await client.request("POST", "/habits/Cold Shower/check"),
+                await client.request("POST", "/habits/Cold Shower/check"),
+                await client.request("GET", "/streaks"),
+                await client.request("GET", "/stats?habit=cold shower"),
+                await client.request("DELETE", "/habits/Cold Shower"),
+                await client.request("GET", "/habits/Cold Shower"),
+                await client.request("PUT", "/habits"),
+                await client.request("GET", "/nothing"),
+            ]
+
+        (created, duplicate, invalid, patched, checked, again, streaks, stats,
+         deleted, missing, not_allowed, unknown) = self.serve(scenario)
+        assert created[0] == 201 and created[2]["habit_interval"] == "2x per week"
+        assert created[1]["connection"] == "keep-alive"
+        assert duplicate[0] == 409 and invalid[0] == 400
+        assert patched[0] == 200 and patched[2]["habit_interval"] == "Daily"
+        assert checked[0] == 201 and checked[2]["status"] == "checked"
+        assert again[0] == 200 and again[2]["status"] == "duplicate"
+        assert {"habit_name": "Cold Shower", "cur_streak": 1}.items() <= streaks[2][0].items()
+        assert stats[2][0]["checks"] == 1
+        assert deleted[0] == 204 and missing[0] == 404
+        assert not_allowed[0] == 405 and "GET" in not_allowed[1]["allow"]
+        assert unknown[0] == 404
+
+    def test_authentication(self):
+        # Requests without a valid bearer token are rejected, a login returns a new token
+        async def scenario(server, client):
+            client.token = None
+            anonymous = await client.request("GET", "/habits")
+            failed = await client.request("POST", "/login", {"identifier": "testuser", "password": "wrong"})
+            login = await client.request("POST", "/login", {"identifier": "testuser", "password": "pa$$word123"})
+            client.token = login[2]["token"]
+            return anonymous, failed, login, await client.request("GET", "/due")
+
+        anonymous, failed, login, due = self.serve(scenario)
+        assert anonymous[0] == 401 and anonymous[1]["www-authenticate"] == "Bearer"
+        assert failed[0] == 401
+        assert login[2]["user_id"] == "test0123"
+        assert due[0] == 200
+
+    def test_etag(self):
+        # Unchanged data is answered with 304, a check-in changes the data version and the ETag
+        async def scenario(server, client):
+            first = await client.request("GET", "/stats")
+            etag = first[1]["etag"]
+            cached = await client.request("GET", "/stats", headers={"If-None-Match": etag})
+            await client.request("POST", "/habits/Yoga/check")
+            changed = await client.request("GET", "/stats", headers={"If-None-Match": etag})
+            return first, cached, changed
+
+        first, cached, changed = self.serve(scenario)
+        assert first[0] == 200 and first[1]["etag"].startswith('W/"') and first[1]["vary"] == "Authorization"
+        assert cached[0] == 304 and cached[2] == b""
+        assert changed[0] == 200 and changed[1]["etag"] != first[1]["etag"]
+        assert changed[2][0]["habit_name"] == "Yoga"
+
+    def test_etag_per_user(self):
+        # Users with the same data version get different ETags
+        db = sqlite3.connect(self.path)
+        db.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test4567', 'otheruser', 'x')")
+        db.commit()
+        other = sessions.create_session(db.cursor(), db, "test4567")
+        db.close()
+
+        async def scenario(server, client):
+            own = await client.request("GET", "/streaks")
+            client.token = other
+            return own, await client.request("GET", "/streaks", headers={"If-None-Match": own[1]["etag"]})
+
+        own, foreign = self.serve(scenario)
+        assert foreign[0] == 200 and foreign[1]["etag"] != own[1]["etag"]
+
+    def test_chunked_export(self):
+        # The history is streamed in chunks of EXPORT_BATCH rows (CSV with header line and JSON Lines)
+        db = sqlite3.connect(self.path)
+        db.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom)
+                   VALUES ('test0123', 'Yoga', 'Daily', 'D', 0)""")
+        db.executemany("INSERT INTO counter (user_id, habit_name, check_date, habit_rep) VALUES ('test0123', 'Yoga', ?, 1)",
+                       [(str(date(2000, 1, 1) + timedelta(days=n)),) for n in range(2500)])
+        db.commit()
+        db.close()
+
+        async def scenario(server, client):
+            csv_export = await client.request("GET", "/export?format=csv")
+            jsonl_export = await client.request("GET", "/export?format=jsonl&from=2005-01-01")
+            invalid = await client.request("GET", "/export?format=xml")
+            return csv_export, jsonl_export, invalid, await client.request("GET", "/server_stats")
+
+        csv_export, jsonl_export, invalid, server_stats = self.serve(scenario)
+        assert csv_export[1]["transfer-encoding"] == "chunked"
+        lines = csv_export[2].decode().splitlines()
+        assert lines[0].startswith("user_id,habit_name") and len(lines) == 2501
+        assert len(jsonl_export[2].decode().splitlines()) == 2500 - (date(2005, 1, 1) - date(2000, 1, 1)).days
+        assert invalid[0] == 400
+        assert server_stats[2]["GET /export"]["requests"] == 3
+
+    def test_export_limit(self, monkeypatch):
+        # Exports beyond MAX_EXPORTS are answered with 503
+        monkeypatch.setattr(http_api, "MAX_EXPORTS", 0)
+
+        async def scenario(server, client):
+            return await client.request("GET", "/export")
+
+        busy = self.serve(scenario)
+        assert busy[0] == 503 and busy[1]["retry-after"] == "5"
+
+    def test_connection_close_and_shutdown(self):
+        # 'Connection: close' ends the connection, idle keep-alive connections end with the shutdown
+        async def scenario(server, client):
+            closing = await http_api.HttpClient(server.host, server.port, self.token).connect()
+            response = await closing.request("GET", "/streaks", headers={"Connection": "close"})
+            at_eof = await closing.reader.read() == b""
+            await closing.close()
+            idle = await http_api.HttpClient(server.host, server.port, self.token).connect()
+            await idle.request("GET", "/streaks")
+            return response, at_eof, idle
+
+        response, at_eof, idle = self.serve(scenario)
+        assert response[1]["connection"] == "close" and at_eof
+        assert idle.reader.at_eof()
+
+    def test_load(self):
+        # Concurrent keep-alive clients without errors; conditional requests are answered with 304
+        async def scenario(server, client):
+            plain = await http_api.load_test(server.host, server.port, self.token, requests=1000, concurrency=20)
+            conditional = await http_api.load_test(server.host, server.port, self.token, requests=500,
+                                                   concurrency=10, conditional=True)
+            return plain, conditional
+
+        plain, conditional = self.serve(scenario, workers=4, max_pending=8)
+        assert plain["requests"] == 1000 and plain["errors"] == 0 and plain["not_modified"] == 0
+        assert plain["p50_ms"] <= plain["p99_ms"] <= plain["max_ms"]
+        assert conditional["errors"] == 0 and conditional["not_modified"] == 490
+
+    @pytest.mark.benchmark
+    def test_load_benchmark(self):
+        # The server answers more than 200 requests per second
+        async def scenario(server, client):
+            return await http_api.load_test(server.host, server.port, self.token, requests=1000, concurrency=20)
+
+        plain = self.serve(scenario, workers=4, max_pending=8)
+        assert plain["errors"] == 0 and plain["requests_per_second"] > 200
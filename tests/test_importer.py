@@ -0,0 +1,89 @@
+"""
+Test file for the importer.py module
+"""
+
+import csv
+import pytest
+import export
+import importer
+
+@pytest.mark.usefixtures("sample_data")
+class TestImporter:
+    @pytest.fixture(autouse=True)
+    def setup_db(self, db_and_cursor):
+        # Provide database and cursor for each test
+        self.db, self.cur = db_and_cursor
+
+    def write_csv(self, path, rows):
+        # Helper to write an import file
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["habit_name", "check_date", "check_time", "habit_rep"])
+            writer.writerows(rows)
+
+    def test_import_csv_with_rejected_rows(self, tmp_path):
+        # Test the import of valid records and the report of invalid ones
+        path = tmp_path / "history.csv"
+        report = tmp_path / "rejected.csv"
+        self.write_csv(path, [
+            ("pmr", "2025-03-29", "07:00:00", 1),      # valid (case-insensitive habit name)
+            ("PMR", "2025-03-30", "", ""),             # valid (defaults for time and repetitions)
+            ("PMR", "2025-03-31", "07:00:00", 1),      # valid
+            ("Skydiving", "2025-03-31", "", 1),        # unknown habit
+            ("PMR", "2025-02-30", "", 1),              # invalid date
+            ("PMR", "2025-03-28", "", "many"),         # invalid repetitions
+        ])
+        result = importer.import_history(self.cur, self.db, "test0123", str(path), rejected_path=str(report))
+        assert result["imported"] == 3
+        assert result["rejected"] == 3
+        assert result["habits"] == ["PMR"]
+        assert [row[1] for row in result["rejected_rows"]] == ["unknown habit", "invalid date", "invalid repetitions"]
+        assert len(report.read_text().splitlines()) == 4
+
+        # The 3 imported days directly precede the 28 sample days --> streaks are recomputed
+        self.cur.execute("SELECT habit_streak FROM counter WHERE user_id = ? AND habit_name = ? AND check_date = ?",
+                         ("test0123", "PMR", "2025-04-28"))
+        assert self.cur.fetchone()[0] == 31
+        self.cur.execute("SELECT max_streak FROM habits WHERE user_id = ? AND habit_name = ?", ("test0123", "PMR"))
+        assert self.cur.fetchone()[0] == 31
+        # The calendar bitmaps contain the imported days as well
+        self.cur.execute("SELECT days FROM habit_calendar WHERE user_id = ? AND habit_name = ? AND year = 2025",
+                         ("test0123", "PMR"))
+        assert bin(int.from_bytes(self.cur.fetchone()[0], "little")).count("1") == 31
+
+    def test_import_exported_jsonl(self, tmp_path):
+        # Re-importing an export (twice) neither duplicates records nor adds repetitions
+        path = tmp_path / "export.jsonl.gz"
+        export.export_history(self.cur, "test0123", str(path), "jsonl", compress=True, habit_name="Jogging")
+        for _ in range(2):
+            result = importer.import_history(self.cur, self.db, "test0123", str(path))
+            assert result["imported"] == 4 and result["rejected"] == 0
+        self.cur.execute("SELECT COUNT(*), SUM(habit_rep), MAX(habit_streak) FROM counter WHERE habit_name = 'Jogging'")
+        assert self.cur.fetchone() == (4, 4, 4)
+
+    def test_failed_import_is_rolled_back(self):
+        # An error after the first chunks leaves neither check-ins nor stale streaks behind
+        def records():
+            for day in range(1, 6):
+                yield day, {"habit_name": "Yoga", "check_date": f"2025-03-{day:02d}"}
+            raise OSError("connection to the source lost")
+
+        self.cur.execute("SELECT COUNT(*), MAX(habit_streak) FROM counter WHERE habit_name = 'Yoga'")
+        before = self.cur.fetchone()
+        result = importer.import_history(self.cur, self.db, "test0123", chunk_size=2, records=records())
+        assert result["imported"] == 0 and result["habits"] == []
+        assert result["error"] == "An error occurred while importing 'the records': connection to the source lost"
+        self.cur.execute("SELECT COUNT(*), MAX(habit_streak) FROM counter WHERE habit_name = 'Yoga'")
+        assert self.cur.fetchone() == before
+
+    @pytest.mark.benchmark
+    def test_import_benchmark(self, tmp_path):
+        # Benchmark target: at least 1 million rows per minute
+        path = tmp_path / "benchmark.csv"
+        rows = [(habit, f"{year}-{month:02d}-{day:02d}", "18:00:00", 1)
+                for habit in ["Yoga", "Journaling"] for year in range(1900, 2025)
+                for month in range(1, 13) for day in range(1, 29)]
+        self.write_csv(path, rows)
+        result = importer.import_history(self.cur, self.db, "test0123", str(path))
+        assert result["imported"] == len(rows)
+        assert result["rows_per_minute"] >= importer.BENCHMARK_ROWS_PER_MINUTE
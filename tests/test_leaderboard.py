@@ -0,0 +1,68 @@
+"""
+Test file for the leaderboard.py module
+"""
+
+import sqlite3
+import pytest
+from datetime import date
+import leaderboard
+from db import create_tables
+from counter_manager import increment_streak
+
+class TestLeaderboard:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path):
+        # Setup: 5 users with the longest PMR streaks 9, 7, 7, 7, 3 and one Yoga streak of 8
+        self.db = sqlite3.connect(str(tmp_path / "test_leaderboard.db"))
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        streaks = {"user0001": 9, "user0002": 7, "user0003": 7, "user0004": 7, "user0005": 3}
+        for user_id, streak in streaks.items():
+            self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES (?, ?, ?)",
+                             (user_id, f"name_{user_id}", "pa$$word123"))
+            self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, is_custom, max_streak)
+                             VALUES (?, 'PMR', 'Daily', 0, ?)""", (user_id, streak))
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, is_custom, max_streak)
+                         VALUES ('user0005', 'Yoga', 'Daily', 0, 8)""")
+        self.db.commit()
+        yield
+        self.db.close()
+
+    def test_ranks_with_ties(self):
+        # Ties share a rank, the next rank skips the tied positions
+        entries, cursor = leaderboard.get_leaderboard(self.cur, "PMR", limit=10)
+        assert [(e["rank"], e["user_id"], e["streak"]) for e in entries] == [
+            (1, "user0001", 9), (2, "user0002", 7), (2, "user0003", 7), (2, "user0004", 7), (5, "user0005", 3)]
+        assert cursor is None
+
+    def test_pagination(self):
+        # Pages of 2 entries give the same ranking as one page, also within a tie group
+        pages, cursor = [], None
+        while True:
+            entries, cursor = leaderboard.get_leaderboard(self.cur, "PMR", limit=2, after=cursor)
+            pages += [(e["rank"], e["user_id"]) for e in entries]
+            if cursor is None:
+                break
+        assert pages == [(1, "user0001"), (2, "user0002"), (2, "user0003"), (2, "user0004"), (5, "user0005")]
+        # Global leaderboard over all habits: Yoga (8) is ranked second
+        entries, cursor = leaderboard.get_leaderboard(self.cur, None, limit=2)
+        assert [(e["rank"], e["habit_name"]) for e in entries] == [(1, "PMR"), (2, "Yoga")]
+        entries, _ = leaderboard.get_leaderboard(self.cur, None, limit=2, after=cursor)
+        assert [e["rank"] for e in entries] == [3, 3]
+
+    def test_index_range_scan(self):
+        # The top-k read uses the leaderboard index and does not sort all users
+        for habit_name, metric, index in [("PMR", "max", "idx_habits_max_streak"),
+                                          ("PMR", "current", "idx_habits_cur_streak"),
+                                          (None, "max", "idx_habits_max_streak_all")]:
+            query, params = leaderboard.page_query(habit_name, leaderboard.METRICS[metric], 10, today=date.today())
+            self.cur.execute("EXPLAIN QUERY PLAN " + query, params)
+            plan = " ".join(row[3] for row in self.cur.fetchall())
+            assert index in plan
+            assert "TEMP B-TREE" not in plan
+
+    def test_current_streak_state(self):
+        # The current streak is maintained on every increment of the streak
+        increment_streak(self.cur, self.db, "PMR", "user0002", manual=False)
+        entries, _ = leaderboard.get_leaderboard(self.cur, "PMR", metric="current", today=date.today())
+        assert [(e["user_id"], e["streak"]) for e in entries] == [("user0002", 1)]
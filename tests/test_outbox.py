@@ -0,0 +1,113 @@
+"""
+Test file for the outbox.py module and the outbox table of db.py
+"""
+
+import sqlite3
+import pytest
+from datetime import datetime, timedelta
+from db import create_tables
+from counter_manager import record_check
+from outbox import OutboxWorker, claim_events, purge_outbox
+from reminders import SimulatedClock
+
+class TestOutbox:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path):
+        # Setup: a user with the daily habit 'Yoga' and a worker with a simulated clock and a collecting sink
+        self.path = str(tmp_path / "test_outbox.db")
+        self.db = sqlite3.connect(self.path)
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'pa$$word123')")
+        self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom)
+                         VALUES ('test0123', 'Yoga', 'Daily', 'D', 1)""")
+        self.db.commit()
+        self.clock = SimulatedClock(datetime(2025, 4, 8, 9, 0))
+        self.sent = []
+        self.worker = OutboxWorker(self.path, self.sent.append, batch_size=3, clock=self.clock)
+        yield
+        self.worker.stop()
+        self.db.close()
+
+    def test_events_in_check_in_transaction(self):
+        # Every check-in writes a 'check' event, the 7th day of the streak a 'milestone' event
+        for day in range(1, 8):
+            record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, day, 8, 0))
+        # A rejected check-in writes no event
+        record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, 7, 9, 0))
+        self.cur.execute("SELECT event_type, COUNT(*) FROM outbox GROUP BY event_type ORDER BY event_type")
+        assert self.cur.fetchall() == [("check", 7), ("milestone", 1)]
+
+        # The worker delivers the events in batches in the order of their creation
+        assert self.worker.run_once() == {"delivered": 3, "failed": 0}
+        while self.worker.run_once()["delivered"]:
+            pass
+        assert [e["event_type"] for e in self.sent] == ["check"] * 7 + ["milestone"]
+        assert self.sent[-1]["payload"] == {"habit_name": "Yoga", "streak": 7}
+        self.cur.execute("SELECT COUNT(*) FROM outbox WHERE status = 'done'")
+        assert self.cur.fetchone()[0] == 8
+
+    def test_retry_with_backoff(self):
+        # A failing sink reschedules the event with exponential backoff until max_attempts
+        record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, 8, 8, 0))
+        def failing(event):
+            raise OSError("sink not reachable")
+        worker = OutboxWorker(self.path, failing, max_attempts=3, clock=self.clock)
+        assert worker.run_once() == {"delivered": 0, "failed": 1}
+        # The next attempt is available after 2 seconds, the third one after 4 more seconds
+        assert worker.run_once() == {"delivered": 0, "failed": 0}
+        self.clock.advance(seconds=2)
+        assert worker.run_once()["failed"] == 1
+        self.clock.advance(seconds=4)
+        assert worker.run_once()["failed"] == 1
+        self.cur.execute("SELECT status, attempts, last_error FROM outbox")
+        assert self.cur.fetchone() == ("failed", 3, "sink not reachable")
+        worker.stop()
+
+    def test_failed_retention_of_worker(self):
+        # The worker purges failed events after its own failed_retention
+        record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, 8, 8, 0))
+        def failing(event):
+            raise OSError("sink not reachable")
+        worker = OutboxWorker(self.path, failing, max_attempts=1, failed_retention=timedelta(days=2),
+                              purge_every=1, clock=self.clock)
+        assert worker.run_once()["failed"] == 1
+        self.clock.advance(days=1)
+        worker.run_once()
+        self.cur.execute("SELECT status FROM outbox")
+        assert self.cur.fetchone() == ("failed",)
+        self.clock.advance(days=1, minutes=1)
+        worker.run_once()
+        self.cur.execute("SELECT COUNT(*) FROM outbox")
+        assert self.cur.fetchone()[0] == 0
+        worker.stop()
+
+    def test_lease_and_purge(self):
+        # Events claimed by a worker that crashed are claimed again after the lease expired
+        record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, 8, 8, 0))
+        assert len(claim_events(self.cur, self.db, self.clock.now())) == 1
+        assert self.worker.run_once()["delivered"] == 0
+        self.clock.advance(minutes=5)
+        assert self.worker.run_once()["delivered"] == 1
+
+        # Done events are deleted after the retention period
+        assert purge_outbox(self.cur, self.db, self.clock.now() + timedelta(days=6)) == 0
+        assert purge_outbox(self.cur, self.db, self.clock.now() + timedelta(days=7, seconds=1), batch_size=1) == 1
+        self.cur.execute("SELECT COUNT(*) FROM outbox")
+        assert self.cur.fetchone()[0] == 0
+
+    def test_concurrent_claims_are_disjoint(self):
+        # Two workers claim different events; an expired lease makes the events available again
+        for day in range(1, 5):
+            record_check(self.cur, self.db, "test0123", "Yoga", datetime(2025, 4, day, 8, 0))
+        other = sqlite3.connect(self.path)
+        try:
+            now = self.clock.now()
+            first = claim_events(self.cur, self.db, now, batch_size=2)
+            second = claim_events(other.cursor(), other, now, batch_size=3)
+            assert [e["event_id"] for e in first] == [1, 2] and [e["event_id"] for e in second] == [3, 4]
+            assert claim_events(self.cur, self.db, now) == []
+            reclaimed = claim_events(other.cursor(), other, now + timedelta(minutes=6))
+            assert [(e["event_id"], e["attempts"]) for e in reclaimed] == [(1, 2), (2, 2), (3, 2), (4, 2)]
+        finally:
+            other.close()
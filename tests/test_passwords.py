@@ -0,0 +1,54 @@
+"""
+Test file for the passwords.py module and the password verification of user_manager.py
+"""
+
+import sqlite3
+import pytest
+import passwords
+from db import create_tables
+from user_manager import verify_login, benchmark_login
+
+class TestPasswords:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path, monkeypatch):
+        # Setup: cheap KDF parameters for the tests and a user with a legacy plaintext password
+        monkeypatch.setattr(passwords, "CURRENT_PARAMS", ("scrypt", 2 ** 10, 8, 1))
+        self.db = sqlite3.connect(str(tmp_path / "test_passwords.db"))
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'pa$$word123')")
+        self.db.commit()
+        yield
+        self.db.close()
+
+    def test_hash_and_verify(self):
+        # Hashes are salted and store their parameters
+        first, second = passwords.hash_password("pa$$word123"), passwords.hash_password("pa$$word123")
+        assert first != second and first.startswith("scrypt$1024$8$1$")
+        assert passwords.verify_password("pa$$word123", first)
+        assert not passwords.verify_password("pa$$word124", first)
+        # PBKDF2 hashes are verified with their own parameters
+        pbkdf2 = passwords.hash_password("pa$$word123", ("pbkdf2_sha256", 1000))
+        assert passwords.verify_password("pa$$word123", pbkdf2)
+        assert passwords.needs_rehash(pbkdf2) and not passwords.needs_rehash(first)
+        # Stronger parameters make existing hashes outdated
+        assert passwords.needs_rehash(first, ("scrypt", 2 ** 11, 8, 1))
+
+    def test_legacy_password_is_rehashed_at_login(self):
+        # A plaintext password is verified once and replaced by its hash
+        assert verify_login(self.cur, self.db, "testuser", "wrong") is None
+        assert verify_login(self.cur, self.db, "testuser", "pa$$word123") == "test0123"
+        self.cur.execute("SELECT user_pwd FROM user WHERE user_id = 'test0123'")
+        stored = self.cur.fetchone()[0]
+        assert stored.startswith("scrypt$") and "pa$$word123" not in stored
+        assert verify_login(self.cur, self.db, "test0123", "pa$$word123") == "test0123"
+
+    def test_calibration_and_login_benchmark(self):
+        # The calibration doubles the cost until the target time is reached
+        params = passwords.calibrate(target_ms=5)
+        assert params[0] == "scrypt" and params[1] >= 2 ** 10
+        assert passwords.calibrate(target_ms=5, scheme="pbkdf2_sha256")[0] == "pbkdf2_sha256"
+        # Login latency with the calibrated parameters
+        passwords.CURRENT_PARAMS = params
+        result = benchmark_login(self.cur, self.db, "testuser", "pa$$word123", runs=20)
+        assert result["runs"] == 20 and 0 < result["p50_ms"] <= result["p99_ms"] <= result["max_ms"]
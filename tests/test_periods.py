@@ -0,0 +1,71 @@
+"""
+Test file for periods.py module
+"""
+
+from datetime import date
+from periods import Interval, parse_interval, period_key, week_period, check_step
+
+
+class TestPeriods:
+    def test_week_period(self):
+        # Test that the week starts on the configured weekday
+        sunday, monday = date(2025, 4, 6), date(2025, 4, 7)
+        # Weeks starting on Monday: Sunday and Monday are in adjacent weeks
+        assert week_period(monday, 0) == week_period(sunday, 0) + 1
+        # Weeks starting on Sunday: Sunday and Monday are in the same week
+        assert week_period(monday, 6) == week_period(sunday, 6)
+
+    def test_period_key(self):
+        # Test the period keys of daily and weekly habits (labels and codes)
+        assert period_key("2025-04-02", "Daily") == period_key("2025-04-01", "D") + 1
+        assert period_key("2025-04-07", "Weekly", 0) == period_key("2025-04-13", "W", 0)
+
+    def test_interval_codes(self):
+        # Test the compact codes and the labels of all interval kinds
+        assert [parse_interval(code).label for code in ["D", "D3", "W", "W3", "M", "M2", "S21"]] == [
+            "Daily", "Every 3 days", "Weekly", "3x per week", "Monthly", "2x per month", "Mon, Wed, Fri"]
+        assert Interval("S", 21).code == "S21" and Interval("W").code == "W"
+
+    def test_period_of(self):
+        # Every 3 days: 3 consecutive days share a period
+        every3 = parse_interval("D3")
+        keys = [every3.period_of(date(2025, 4, day)) for day in range(1, 8)]
+        assert len(set(keys)) == 3 and every3.period_end(keys[0]) >= date(2025, 4, 1)
+        # Monthly: April and May are consecutive, the period ends on the last day of the month
+        monthly = parse_interval("M")
+        assert monthly.is_consecutive(monthly.period_of("2025-04-30"), monthly.period_of("2025-05-01"))
+        assert monthly.period_end(monthly.period_of("2025-02-10")) == date(2025, 2, 28)
+        # Mon, Wed, Fri: a check on Tuesday belongs to Monday, Friday follows Wednesday
+        weekdays = parse_interval("S21")
+        assert weekdays.period_of("2025-04-08") == weekdays.period_of("2025-04-07")
+        assert weekdays.is_consecutive(weekdays.period_of("2025-04-09"), weekdays.period_of("2025-04-11"))
+        assert weekdays.is_consecutive(weekdays.period_of("2025-04-11"), weekdays.period_of("2025-04-14"))
+        assert weekdays.period_end(weekdays.period_of("2025-04-11")) == date(2025, 4, 13)
+
+    def test_advance(self):
+        # Test the streak step of a habit with 2 checks per week
+        twice = parse_interval("W2", 0)
+        week = twice.period_of("2025-04-07")
+        assert twice.advance(None, 0, 0, week) == ("checked", 1, 0, 0)
+        assert twice.advance(week, 1, 0, week) == ("checked", 2, 1, 0)
+        assert twice.advance(week, 2, 1, week) == ("duplicate", 2, 1, 0)
+        # Completed week --> streak continues, incomplete week --> streak broken
+        assert twice.advance(week, 2, 1, week + 1) == ("checked", 1, 1, 0)
+        assert twice.advance(week, 1, 0, week + 1) == ("broken", 1, 0, 0)
+        # Deadline: end of the following week if the week was completed
+        assert twice.deadline(week, 2) == "2025-04-20"
+        assert twice.deadline(week, 1) == "2025-04-13"
+
+    def test_check_step_freezes(self):
+        # Test that missed days are bridged with the freeze tokens of the month
+        daily = parse_interval("D")
+        state = (None, 0, 0, 0, None)
+        statuses = []
+        for day in ["2025-04-01", "2025-04-02", "2025-04-04", "2025-04-07", "2025-04-10", "2025-05-02"]:
+            status, state, used = check_step(daily, 2, state, day)
+            statuses.append((status, state[2], used))
+        # 1 missed day (1 token), 2 missed days (only 1 token left --> broken), refill in May (2 tokens)
+        assert statuses == [("checked", 1, 0), ("checked", 2, 0), ("frozen", 3, 1), ("broken", 1, 0),
+                            ("broken", 1, 0), ("broken", 1, 0)]
+        status, state, used = check_step(daily, 2, state, "2025-05-04")
+        assert (status, state[2], used, state[3]) == ("frozen", 2, 1, 1)
@@ -0,0 +1,85 @@
+"""
+Test file for the purger.py module and the account deletion of user_manager.py
+"""
+
+import sqlite3
+import pytest
+import pwinput
+from datetime import date, timedelta
+import due
+import leaderboard
+import purger
+from db import create_tables
+from user import User
+from user_manager import verify_login
+
+class TestPurger:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path):
+        # Setup: two users with the habit 'Yoga'; 'test0123' has a history of 12,000 check-ins
+        self.path = str(tmp_path / "test_purger.db")
+        self.db = sqlite3.connect(self.path)
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        for user_id, user_name in [("test0123", "testuser"), ("test4567", "otheruser")]:
+            self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES (?, ?, 'pa$$word123')",
+                             (user_id, user_name))
+            self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, max_streak,
+                             cur_streak, streak_deadline) VALUES (?, 'Yoga', 'Daily', 'D', 5, 5, '2025-04-09')""",
+                             (user_id,))
+        start = date(1990, 1, 1)
+        self.cur.executemany("""INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak)
+                             VALUES ('test0123', 'Yoga', ?, '08:00:00', 1, 1)""",
+                             [((start + timedelta(days=day)).isoformat(),) for day in range(12000)])
+        self.cur.execute("""INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak)
+                         VALUES ('test4567', 'Yoga', '2025-04-08', '08:00:00', 1, 1)""")
+        self.db.commit()
+        yield
+        self.db.close()
+
+    def delete_account(self, monkeypatch):
+        # Account deletion in the profile menu (option 4) with password and user ID confirmation
+        inputs = iter(["4", "Y", "test0123"])
+        monkeypatch.setattr("builtins.input", lambda prompt: next(inputs))
+        monkeypatch.setattr(pwinput, "pwinput", lambda prompt: "pa$$word123")
+        with pytest.raises(SystemExit):
+            User(self.db, user_name="testuser", user_id="test0123").change_profile()
+
+    def test_deleted_account_is_hidden(self, monkeypatch):
+        # The account is marked only, its history still exists but it is hidden from login and analytics
+        self.delete_account(monkeypatch)
+        self.cur.execute("SELECT COUNT(*) FROM counter WHERE user_id = 'test0123'")
+        assert self.cur.fetchone()[0] == 12000
+        assert verify_login(self.cur, self.db, "testuser", "pa$$word123") is None
+        entries, _ = leaderboard.get_leaderboard(self.cur, "Yoga")
+        assert [e["user_id"] for e in entries] == ["test4567"]
+        assert list(due.sweep_due(self.cur, date(2025, 4, 9))) == ["test4567"]
+
+    def test_purge_in_batches(self, monkeypatch):
+        # The purger deletes the history in batches and reports its progress
+        self.delete_account(monkeypatch)
+        reports = []
+        result = purger.purge_deleted_users(self.cur, self.db, batch_size=5000, progress=reports.append)
+        assert result == {"test0123": 12000 + 2}
+        assert [r["deleted"] for r in reports if r["table"] == "counter"] == [5000, 10000, 12000]
+        assert reports[-1]["done"]
+        self.cur.execute("SELECT user_id FROM user")
+        assert self.cur.fetchall() == [("test4567",)]
+        self.cur.execute("SELECT DISTINCT user_id FROM counter")
+        assert self.cur.fetchall() == [("test4567",)]
+        # Nothing left to purge
+        assert purger.purge_deleted_users(self.cur, self.db) == {}
+
+    def test_background_purger(self, monkeypatch):
+        # The background thread purges the account on its own connection
+        self.delete_account(monkeypatch)
+        worker = purger.AccountPurger(self.path, interval=0.05, batch_size=1000, pause=0)
+        worker.start()
+        for _ in range(100):
+            self.cur.execute("SELECT COUNT(*) FROM user WHERE user_id = 'test0123'")
+            if self.cur.fetchone()[0] == 0:
+                break
+            worker.stopped.wait(0.05)
+        worker.stop()
+        self.cur.execute("SELECT COUNT(*) FROM counter WHERE user_id = 'test0123'")
+        assert self.cur.fetchone()[0] == 0
@@ -0,0 +1,108 @@
+"""
+Test file for the ratelimit.py module and the rate limited login of user_manager.py
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import pytest
+import passwords
+import ratelimit
+from db import create_tables
+from user_manager import verify_login
+
+class FakeClock:
+    """Clock for the tests: the time only moves when it is advanced"""
+
+    def __init__(self):
+        self.current = 1_000_000.0
+
+    def __call__(self):
+        return self.current
+
+class TestRateLimit:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path, monkeypatch):
+        # Setup: a limiter with a fake clock in place of the module limiter and a user with a password
+        monkeypatch.setattr(passwords, "CURRENT_PARAMS", ("scrypt", 2 ** 10, 8, 1))
+        self.clock = FakeClock()
+        self.limiter = ratelimit.LoginRateLimiter(capacity=3, refill_seconds=10, clock=self.clock)
+        monkeypatch.setattr(ratelimit, "limiter", self.limiter)
+        self.path = str(tmp_path / "limits.json")
+        self.db = sqlite3.connect(str(tmp_path / "test_ratelimit.db"))
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'pa$$word123')")
+        self.db.commit()
+        yield
+        self.db.close()
+
+    def test_token_bucket(self):
+        # Three attempts in a row, then one attempt per refill interval; keys are independent
+        assert [self.limiter.allow("testuser", "cli") for _ in range(4)] == [True, True, True, False]
+        assert self.limiter.retry_after("testuser", "cli") == pytest.approx(10)
+        assert self.limiter.allow("TestUser ", "script") and self.limiter.allow("otheruser", "cli")
+        self.clock.current += 10
+        assert self.limiter.allow("testuser", "cli") and not self.limiter.allow("testuser", "cli")
+
+    def test_login_is_limited_before_the_database(self):
+        # Wrong passwords empty the bucket, then even the right password is refused without a query
+        for _ in range(3):
+            assert verify_login(self.cur, self.db, "testuser", "wrong") is None
+        self.db.close()  # A database access would raise an error now
+        assert verify_login(self.cur, self.db, "testuser", "pa$$word123") is None
+        self.db = sqlite3.connect(":memory:")
+
+    def test_success_refills_the_bucket(self):
+        # A successful login resets the failures of its key
+        assert verify_login(self.cur, self.db, "testuser", "wrong") is None
+        assert verify_login(self.cur, self.db, "testuser", "pa$$word123") == "test0123"
+        assert "local:testuser" not in self.limiter.buckets
+
+    def test_bounded_and_persistent(self):
+        # Only max_keys buckets are kept without forgetting exhausted ones: other keys share the overflow bucket
+        limiter = ratelimit.LoginRateLimiter(capacity=1, max_keys=100, path=self.path, clock=self.clock)
+        for number in range(1000):
+            limiter.allow(f"user{number}", "script")
+        assert len(limiter.buckets) == 101 and "script:*" in limiter.buckets
+        assert not limiter.allow("user50", "script") and not limiter.allow("user999", "script")
+        # The limits survive a restart through the JSON file
+        limiter.save()
+        restarted = ratelimit.LoginRateLimiter(capacity=1, max_keys=100, path=self.path, clock=self.clock)
+        assert not restarted.allow("user50", "script") and not restarted.allow("user998", "script")
+        # Refilled buckets are dropped and make room for new keys
+        self.clock.current += ratelimit.DEFAULT_REFILL_SECONDS
+        assert restarted.allow("user1000", "script") and "script:user1000" in restarted.buckets
+        assert len(restarted.buckets) <= 100
+
+    def test_concurrent_saves(self, tmp_path, monkeypatch, capsys):
+        # Two saves that write at the same time use temporary files of their own: both replace the file
+        limiter = ratelimit.LoginRateLimiter(capacity=1, path=self.path, clock=self.clock)
+        limiter.allow("testuser", "http")
+        barrier = threading.Barrier(2, timeout=5)
+        dump = json.dump
+        def dump_together(state, file):
+            barrier.wait()
+            dump(state, file)
+        monkeypatch.setattr(json, "dump", dump_together)
+        threads = [threading.Thread(target=limiter.save) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert "error" not in capsys.readouterr().out
+        assert list(ratelimit.LoginRateLimiter(path=self.path, clock=self.clock).buckets) == ["http:testuser"]
+        assert [path.name for path in tmp_path.iterdir() if path.suffix == ".tmp"] == []
+
+    @pytest.mark.benchmark
+    def test_check_costs_microseconds(self):
+        # The limiter check of a full, bounded limiter takes only a few microseconds
+        limiter = ratelimit.LoginRateLimiter(max_keys=10000)
+        for number in range(10000):
+            limiter.allow(f"user{number}", "script")
+        start = time.perf_counter()
+        for number in range(100000):
+            limiter.allow(f"user{number % 20000}", "script")
+        per_check_us = (time.perf_counter() - start) / 100000 * 1e6
+        assert per_check_us < 20
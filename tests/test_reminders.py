@@ -0,0 +1,185 @@
+"""
+Test file for the reminders.py module
+"""
+
+import json
+import socket
+import sqlite3
+import threading
+import time
+import pytest
+import hooks
+import reminders
+from datetime import date, datetime, timedelta
+from db import create_tables
+from counter_manager import record_check
+from reminders import ReminderScheduler, SimulatedClock, FileSink, SocketSink, fire_time
+
+class TestReminders:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path):
+        # Setup: a user with the daily habit 'Yoga' and the weekly habit 'Reading', a simulated clock
+        # and a sink that collects the reminders
+        self.db = sqlite3.connect(str(tmp_path / "test_reminders.db"))
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'pa$$word123')")
+        for habit_name, label, code in [("Yoga", "Daily", "D"), ("Reading", "Weekly", "W")]:
+            self.cur.execute("""INSERT INTO habits (user_id, habit_name, habit_interval, interval_code, is_custom)
+                             VALUES ('test0123', ?, ?, ?, 1)""", (habit_name, label, code))
+        self.db.commit()
+        self.clock = SimulatedClock(datetime(2025, 4, 8, 8, 0))
+        self.sent = []
+        self.scheduler = ReminderScheduler(self.sent.append, self.clock)
+        yield
+        self.db.close()
+
+    def check(self, habit_name):
+        # Check-in at the simulated time and reschedule the reminder incrementally
+        result = record_check(self.cur, self.db, "test0123", habit_name, self.clock.now())
+        self.scheduler.on_check("test0123", habit_name, result)
+        return result
+
+    def test_reminder_before_deadline(self):
+        # Yoga checked on Tuesday: the reminder fires on Wednesday at 20:00 (4 hours before the streak breaks)
+        self.check("Yoga")
+        assert self.scheduler.next_fire() == datetime(2025, 4, 9, 20, 0)
+        self.clock.advance(days=1, hours=11, minutes=59)
+        assert self.scheduler.run_pending() == 0
+        self.clock.advance(minutes=1)
+        assert self.scheduler.run_pending() == 1
+        assert self.sent[0]["habit_name"] == "Yoga" and self.sent[0]["deadline"] == "2025-04-09"
+        # A fired reminder is not repeated
+        self.clock.advance(hours=1)
+        assert self.scheduler.run_pending() == 0 and len(self.scheduler) == 0
+
+    def test_check_in_reschedules(self):
+        # A check-in before the reminder moves it to the next deadline, the outdated heap item is skipped
+        self.check("Yoga")
+        self.check("Reading")
+        self.clock.advance(days=1)
+        self.check("Yoga")
+        assert len(self.scheduler) == 2
+        self.clock.advance(days=1, hours=12)
+        assert self.scheduler.run_pending() == 1
+        assert (self.sent[0]["habit_name"], self.sent[0]["streak"]) == ("Yoga", 2)
+        # Reading (checked in the week of April 7th) is reminded on Sunday of the following week
+        assert self.scheduler.next_fire() == datetime(2025, 4, 20, 20, 0)
+
+    def test_load_and_missed_deadlines(self):
+        # The scheduler is filled from the streak deadlines of the habits table
+        self.check("Yoga")
+        self.check("Reading")
+        scheduler = ReminderScheduler(self.sent.append, SimulatedClock(datetime(2025, 4, 11, 8, 0)))
+        assert scheduler.load(self.cur) == 1
+        # A reminder whose deadline has passed is dropped instead of being sent
+        scheduler.schedule("test0123", "Yoga", "2025-04-09", 1)
+        assert scheduler.run_pending() == 0 and self.sent == []
+
+    def test_reload_after_reminder(self):
+        # A reload (as done periodically by serve) does not send a reminder of the same deadline again
+        self.check("Yoga")
+        self.scheduler.reload(self.cur)
+        self.clock.advance(days=1, hours=12)
+        assert self.scheduler.run_pending() == 1
+        self.clock.advance(minutes=5)
+        assert self.scheduler.reload(self.cur) == 0
+        self.clock.advance(hours=1)
+        assert self.scheduler.run_pending() == 0 and len(self.sent) == 1
+        # After the next check-in the new deadline is reminded again
+        self.check("Yoga")
+        self.scheduler.reload(self.cur)
+        assert self.scheduler.next_fire() == datetime(2025, 4, 10, 20, 0)
+
+    def test_sinks(self, tmp_path):
+        # File sink: one JSON line per reminder
+        path = tmp_path / "reminders.jsonl"
+        scheduler = ReminderScheduler(FileSink(str(path)), self.clock)
+        scheduler.schedule("test0123", "Yoga", date(2025, 4, 8), 3)
+        self.clock.advance(hours=12)
+        assert scheduler.run_pending() == 1
+        assert json.loads(path.read_text())["streak"] == 3
+
+        # Socket sink: JSON lines to a local TCP socket
+        server = socket.create_server(("127.0.0.1", 0))
+        sink = SocketSink(server.getsockname())
+        sink({"user_id": "test0123", "habit_name": "Yoga", "deadline": "2025-04-08", "streak": 3})
+        connection, _ = server.accept()
+        assert json.loads(connection.makefile().readline())["habit_name"] == "Yoga"
+        sink.close()
+        connection.close()
+        server.close()
+
+        # A failing sink is counted and does not stop the other reminders
+        def failing(reminder):
+            raise OSError("sink not reachable")
+        scheduler = ReminderScheduler(failing, self.clock)
+        scheduler.schedule("test0123", "Yoga", date(2025, 4, 8), 3)
+        scheduler.schedule("test0123", "Reading", date(2025, 4, 8), 1)
+        assert scheduler.run_pending() == 2 and scheduler.failures == 2
+
+    def test_hook_subscription(self):
+        # A subscribed scheduler is rescheduled by every check-in and cancelled by a streak reset
+        self.scheduler.subscribe()
+        try:
+            record_check(self.cur, self.db, "test0123", "Yoga", self.clock.now())
+            assert self.scheduler.next_fire() == datetime(2025, 4, 9, 20, 0)
+            hooks.emit("reset_streak", user_id="test0123", habit_name="Yoga")
+            assert len(self.scheduler) == 0
+        finally:
+            self.scheduler.unsubscribe()
+        record_check(self.cur, self.db, "test0123", "Reading", self.clock.now())
+        assert len(self.scheduler) == 0
+
+    def test_reminder_process(self, tmp_path):
+        # The reminder process loads the current streaks and reloads the check-ins of other processes
+        path = str(tmp_path / "test_reminders.db")
+        record_check(self.cur, self.db, "test0123", "Yoga")
+        scheduler = ReminderScheduler(self.sent.append)
+        stopped = threading.Event()
+        runner = threading.Thread(target=reminders.serve, args=(path, scheduler), kwargs={"reload": 0.05,
+                                                                                         "stopped": stopped})
+        runner.start()
+        try:
+            time.sleep(0.1)
+            assert len(scheduler) == 1
+            record_check(self.cur, self.db, "test0123", "Reading")
+            for _ in range(100):
+                if len(scheduler) == 2:
+                    break
+                time.sleep(0.02)
+            assert len(scheduler) == 2
+        finally:
+            stopped.set()
+            runner.join()
+        assert scheduler.thread is None
+
+    def test_make_sink(self, tmp_path):
+        # Sink targets of the command line
+        assert isinstance(reminders.make_sink("stdout"), reminders.StdoutSink)
+        assert isinstance(reminders.make_sink(str(tmp_path / "reminders.jsonl")), FileSink)
+        assert reminders.make_sink("127.0.0.1:9000").address == ("127.0.0.1", 9000)
+        assert reminders.make_sink("/tmp/reminders.sock").address == "/tmp/reminders.sock"
+
+    def test_updates_with_many_entries(self):
+        # Updates of many scheduled reminders keep one entry per habit and the earliest reminder on top
+        self.reschedule(10_000, 5_000)
+
+    @pytest.mark.benchmark
+    def test_update_benchmark(self):
+        # Benchmark target: updates below 1 millisecond with 1 million scheduled reminders
+        assert self.reschedule(1_000_000, 20_000) / 20_000 < 0.001
+
+    def reschedule(self, entries, updates):
+        # Schedule the entries, reschedule some of them and check the heap; returns the seconds of the updates
+        start_day = date(2025, 4, 8)
+        self.scheduler.schedule_many((f"user{i:07d}", "Yoga", start_day + timedelta(days=i % 30), 1)
+                                     for i in range(entries))
+        assert len(self.scheduler) == entries
+        start = time.perf_counter()
+        for i in range(updates):
+            self.scheduler.schedule(f"user{i * 37 % entries:07d}", "Yoga", start_day + timedelta(days=31), 2)
+        seconds = time.perf_counter() - start
+        assert len(self.scheduler) == entries
+        assert self.scheduler.next_fire() == fire_time(start_day)
+        return seconds
@@ -0,0 +1,80 @@
+"""
+Test file for the sessions.py module and the session revocation of user_manager.py
+"""
+
+import sqlite3
+import pytest
+import passwords
+import sessions
+from datetime import datetime, timedelta
+from db import create_tables
+from main import login_user_menu
+from user_manager import mark_user_deleted
+
+class TestSessions:
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, tmp_path, monkeypatch):
+        # Setup: a fixed secret, a session file in tmp_path and a user
+        monkeypatch.setenv("HABIT_SESSION_SECRET", "test-secret")
+        monkeypatch.delenv("HABIT_SESSION_TOKEN", raising=False)
+        monkeypatch.setattr(passwords, "CURRENT_PARAMS", ("scrypt", 2 ** 10, 8, 1))
+        self.token_file = str(tmp_path / "session")
+        self.db = sqlite3.connect(str(tmp_path / "test_sessions.db"))
+        self.cur = self.db.cursor()
+        create_tables(self.cur, self.db)
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES ('test0123', 'testuser', 'pa$$word123')")
+        self.db.commit()
+        self.now = datetime(2025, 4, 8, 12, 0, 0)
+        yield
+        self.db.close()
+
+    def test_valid_session(self):
+        # A new token is valid until its expiry, only its hash is stored
+        token = sessions.create_session(self.cur, self.db, "test0123", now=self.now)
+        assert sessions.validate_session(self.cur, token, now=self.now) == "test0123"
+        self.cur.execute("SELECT token_hash FROM sessions")
+        assert self.cur.fetchone()[0] == sessions.token_hash(token) != token
+        assert sessions.validate_session(self.cur, token, now=self.now + timedelta(days=8)) is None
+        # The session file keeps the token for the next program run
+        sessions.save_token(token, self.token_file)
+        assert sessions.load_token(self.token_file) == token
+        sessions.clear_token(self.token_file)
+        assert sessions.load_token(self.token_file) is None
+
+    def test_forged_tokens_are_rejected(self):
+        # Modified expiry, another secret or garbage fail the signature check
+        token = sessions.create_session(self.cur, self.db, "test0123", now=self.now)
+        random_part, expires, signature = token.split(".")
+        assert sessions.validate_session(self.cur, f"{random_part}.{int(expires) + 1}.{signature}", now=self.now) is None
+        assert sessions.validate_session(self.cur, token, now=self.now, secret=b"other") is None
+        assert sessions.validate_session(self.cur, "garbage", now=self.now) is None
+        assert sessions.validate_session(self.cur, None, now=self.now) is None
+
+    def test_revocation(self):
+        # Log out revokes one session, a password change or account deletion all sessions
+        first = sessions.create_session(self.cur, self.db, "test0123", now=self.now)
+        second = sessions.create_session(self.cur, self.db, "test0123", now=self.now)
+        assert sessions.revoke_session(self.cur, self.db, first, now=self.now)
+        assert sessions.validate_session(self.cur, first, now=self.now) is None
+        assert sessions.validate_session(self.cur, second, now=self.now) == "test0123"
+        assert sessions.revoke_user_sessions(self.cur, self.db, "test0123", now=self.now) == 1
+        assert sessions.validate_session(self.cur, second, now=self.now) is None
+        third = sessions.create_session(self.cur, self.db, "test0123", now=self.now)
+        mark_user_deleted(self.cur, self.db, "test0123")
+        assert sessions.validate_session(self.cur, third, now=self.now) is None
+
+    def test_sweep_expired_sessions(self):
+        # Expired sessions are deleted in batches, valid ones stay
+        for day in range(25):
+            sessions.create_session(self.cur, self.db, "test0123", ttl=timedelta(days=1), now=self.now - timedelta(days=day))
+        token = sessions.create_session(self.cur, self.db, "test0123", now=self.now)
+        assert sessions.sweep_sessions(self.cur, self.db, now=self.now + timedelta(days=1), batch_size=10) == 25
+        assert sessions.validate_session(self.cur, token, now=self.now) == "test0123"
+
+    def test_login_menu_shows_login_id(self, monkeypatch, capsys):
+        # A valid session skips the login and greets the user with the login ID instead of the internal ID
+        self.cur.execute("UPDATE user SET login_id = 'new45678' WHERE user_id = 'test0123'")
+        self.db.commit()
+        monkeypatch.setenv("HABIT_SESSION_TOKEN", sessions.create_session(self.cur, self.db, "test0123"))
+        assert login_user_menu(self.cur, self.db) == "test0123"
+        assert "logged in as 'new45678'" in capsys.readouterr().out
@@ -7,6 +7,7 @@ import pytest
 import pwinput
 from db import create_tables
 from user import User
+from user_manager import verify_login
 
 class TestUser:
     @pytest.fixture(autouse=True)
@@ -65,6 +66,29 @@ class TestUser:
         # New username should be "newuser" now
         assert result is not None and result[0] == "newuser"
 
+    def test_change_user_id(self, monkeypatch):
+        # Test that a change of the user ID only changes the login ID of the user row
+        # 1. Insert a test user with a habit and a check-in
+        self.cur.execute("INSERT INTO user (user_id, user_name, user_pwd) VALUES (?, ?, ?)",
+                         ("test0123", "olduser", "pa$$word123"))
+        self.cur.execute("INSERT INTO habits (user_id, habit_name, habit_interval) VALUES ('test0123', 'TestHabit', 'Daily')")
+        self.cur.execute("""INSERT INTO counter (user_id, habit_name, check_date, check_time, habit_rep, habit_streak)
+                         VALUES ('test0123', 'TestHabit', '2025-04-01', '12:00:00', 1, 1)""")
+        self.db.commit()
+        # 2. Simulate the menu option "3" and the inputs of the new ID "JoDo0824"
+        inputs = iter(["3", "Jo", "Do", "08", "24", "Y", "5"])
+        monkeypatch.setattr("builtins.input", lambda prompt: next(inputs))
+        user_instance = User(self.db, user_name="olduser", user_id="test0123")
+        user_instance.change_profile()
+        # 3. The internal key and the history stay unchanged, the user logs in with the new ID
+        assert user_instance.user_id == "test0123" and user_instance.login_id == "JoDo0824"
+        self.cur.execute("SELECT user_id, login_id FROM user")
+        assert self.cur.fetchall() == [("test0123", "JoDo0824")]
+        self.cur.execute("SELECT COUNT(*) FROM counter WHERE user_id = 'test0123'")
+        assert self.cur.fetchone()[0] == 1
+        assert verify_login(self.cur, self.db, "JoDo0824", "pa$$word123") == "test0123"
+        assert verify_login(self.cur, self.db, "test0123", "pa$$word123") is None
+
     def test_user_auth(self, monkeypatch):
         # Testing user authentication for login when username and password are valid
         # 1. Insert a test user for authentication